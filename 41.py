@@ -10,6 +10,9 @@ import time
 import numpy as np
 from PIL import Image
 
+from rolling_window import RollingWindow
+from stage_metrics import StageMetrics
+
 # --- CONFIGURATION ---
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
@@ -27,8 +30,11 @@ mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 
 # Hand position history for tracking movement
-left_hand_history = []
-right_hand_history = []
+left_hand_history = RollingWindow(HISTORY_SIZE)
+right_hand_history = RollingWindow(HISTORY_SIZE)
+
+# Per-stage timing, summarized on exit
+stage_metrics = StageMetrics()
 
 # Two hands detection timing
 two_hands_detected_time = None
@@ -144,10 +150,13 @@ with mp_hands.Hands(
 ) as hands:
 
     while cap.isOpened():
+        started = time.perf_counter()
         success, frame = cap.read()
         if not success:
             print("⚠️ Ignoring empty camera frame.")
             continue
+        captured = time.perf_counter()
+        stage_metrics.observe("capture", captured - started)
 
         # Flip for mirror view
         frame = cv2.flip(frame, 1)
@@ -157,7 +166,10 @@ with mp_hands.Hands(
         image_rgb.flags.writeable = False
 
         # Process hands
+        converted = time.perf_counter()
         results = hands.process(image_rgb)
+        stage_metrics.observe("color", converted - captured)
+        stage_metrics.observe("hands", time.perf_counter() - converted)
 
         # Draw hand landmarks
         image_rgb.flags.writeable = True
@@ -215,13 +227,18 @@ with mp_hands.Hands(
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
         # Display frame
+        display_started = time.perf_counter()
         cv2.imshow('Two Hands Detector', frame_bgr)
 
         # Exit on 'q'
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        key = cv2.waitKey(1) & 0xFF
+        stage_metrics.observe("display", time.perf_counter() - display_started)
+        if key == ord('q'):
             break
 
 # Cleanup
+for line in stage_metrics.report():
+    print(f"⏱️  {line}")
 print("👋 Shutting down...")
 cap.release()
 cv2.destroyAllWindows()
@@ -0,0 +1,161 @@
+"""
+Lazily decoded GIF animations backed by a shared, byte-budgeted LRU frame cache
+Nothing is decoded until an animation is first shown; a background thread then
+decodes a few frames ahead of the playhead. Old frames are evicted once the
+cache exceeds its byte budget and are decoded again if playback comes back to them.
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image
+
+DEFAULT_CACHE_BYTES = 128 * 1024 * 1024
+DEFAULT_PREFETCH_FRAMES = 8
+
+
+class FrameCache:
+    """Thread-safe LRU of decoded frames, bounded by total bytes rather than count"""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._frames
+
+    def put(self, key, frame):
+        with self._lock:
+            old = self._frames.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._frames[key] = frame
+            self._bytes += frame.nbytes
+            # Always keep the newest frame, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._frames) > 1:
+                _, evicted = self._frames.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "frames": len(self._frames),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class LazyAnimation:
+    """GIF frames decoded on demand, indexable like a list of BGR arrays
+
+    len() grows as frames are discovered until the first full pass reaches
+    the end of the GIF (total is None until then), so callers should step
+    through indices in order and only wrap once total is known. Indexing never
+    waits once a frame has been shown: a frame still being decoded is
+    replaced by the last one returned.
+    """
+
+    def __init__(self, path, size, cache, prefetch_frames=DEFAULT_PREFETCH_FRAMES):
+        self.path = path
+        self.size = size
+        self.cache = cache
+        self.prefetch_frames = prefetch_frames
+        self.durations = []  # ms per frame, filled in as frames are decoded
+        self._total = None
+        self._decoded = 0  # frames discovered so far
+        self._playhead = 0
+        self._last = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @property
+    def total(self):
+        """Frame count once the end of the GIF has been reached, else None"""
+        with self._cond:
+            return self._total
+
+    def __len__(self):
+        with self._cond:
+            return self._total if self._total is not None else max(self._decoded, 1)
+
+    def __getitem__(self, index):
+        key = (self.path, index)
+        frame = self.cache.get(key)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._prefetch_loop, daemon=True)
+                self._thread.start()
+            if self._playhead != index or frame is None:
+                self._playhead = index
+                self._cond.notify_all()
+            if frame is None and self._last is None:
+                # First frame of a newly shown animation: wait for the decoder
+                while frame is None and self._thread.is_alive():
+                    self._cond.wait(0.1)
+                    frame = self.cache.get(key)
+            if frame is None:
+                return self._last if self._last is not None else self._blank()
+            self._last = frame
+            return frame
+
+    def _blank(self):
+        return np.zeros((self.size[1], self.size[0], 3), dtype=np.uint8)
+
+    def _wanted(self):
+        """First frame in the prefetch window that is not cached, or None"""
+        for offset in range(self.prefetch_frames):
+            index = self._playhead + offset
+            if self._total is not None:
+                index %= self._total
+            if (self.path, index) not in self.cache:
+                return index
+        return None
+
+    def _prefetch_loop(self):
+        gif = Image.open(self.path)
+        while True:
+            with self._cond:
+                index = self._wanted()
+                while index is None:
+                    self._cond.wait()
+                    index = self._wanted()
+            try:
+                gif.seek(index)
+            except EOFError:
+                with self._cond:
+                    # The playhead may have run past the end while frames were still decoding
+                    self._total = gif.n_frames
+                    self._playhead %= max(self._total, 1)
+                    self._cond.notify_all()
+                continue
+            frame = cv2.cvtColor(np.array(gif.convert('RGB')), cv2.COLOR_RGB2BGR)
+            frame = cv2.resize(frame, self.size)
+            frame.flags.writeable = False
+            self.cache.put((self.path, index), frame)
+            with self._cond:
+                if index >= self._decoded:
+                    self._decoded = index + 1
+                    self.durations.append(gif.info.get("duration", 100) or 100)
+                self._cond.notify_all()
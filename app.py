@@ -6,8 +6,7 @@ Real-time gesture detection with webcam streaming
 Author: Aditya Punjani
 """
 
-from flask import Flask, render_template, Response, jsonify, request
-from collections import deque
+from flask import Flask, render_template, Response, jsonify, request, g
 import threading
 import cv2
 import mediapipe as mp
@@ -18,51 +17,150 @@ import os
 import time
 import base64
 from io import BytesIO
+import uuid
+import weakref
+
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+except ImportError:
+    Sock = None
+
+from gesture_features import extract_features
+from gesture_rules import GestureEngine, WEB_RULE_NAMES, update_stable_gesture
+from inference_pool import InferenceScheduler, InferenceQueueFull, ModelWorker
+from process_workers import ProcessModelWorker
+from latest_slot import LatestSlot
+from session_state import GestureSession, SessionStore, SqliteSessionBackend
+from asset_cache import AssetCache, ORIGINAL
+from motion_gate import MotionGate
+from hand_roi import HandRoiTracker
+from stage_metrics import StageMetrics
+from gesture_registry import GestureRegistry
+from frame_preprocess import FramePreprocessor
+from jpeg_encoder import JpegEncoder
+from broadcast_hub import BroadcastHub
+# Model settings and factory live in a side-effect-free module that process workers can import
+from web_models import MIN_DETECTION_CONFIDENCE, MIN_TRACKING_CONFIDENCE, create_models
 
 app = Flask(__name__)
+# WebSocket gesture stream (/ws/gesture) is available when flask-sock is installed
+sock = Sock(app) if Sock is not None else None
 
 # --- CONFIGURATION ---
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
-# Slightly relaxed to improve recall, while smoothing handles stability later
-MIN_DETECTION_CONFIDENCE = 0.6
-MIN_TRACKING_CONFIDENCE = 0.6
 GESTURE_STABILITY_FRAMES = 3
 GESTURE_COOLDOWN_FRAMES = 5
 HAND_HISTORY_SIZE = 8
 # Smoothing for analyze_frame
 ANALYZE_HISTORY_SIZE = 5
+# Rules from gesture_rules.GESTURE_RULES to evaluate, in their table priority order
+GESTURE_RULES = [r for r in os.environ.get("GESTURE_RULES", ",".join(WEB_RULE_NAMES)).split(",") if r]
+# Inference pool for analyze_frame (overridable from the environment)
+INFERENCE_POOL_SIZE = int(os.environ.get("INFERENCE_POOL_SIZE", min(4, os.cpu_count() or 1)))
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get("INFERENCE_BATCH_WAIT_MS", 10))
+INFERENCE_MAX_QUEUE_DEPTH = int(os.environ.get("INFERENCE_MAX_QUEUE_DEPTH", 64))
+# Longest a request waits for its frame's result before falling back to the default gesture
+INFERENCE_TIMEOUT_SECONDS = float(os.environ.get("INFERENCE_TIMEOUT_SECONDS", 30))
+# "thread" shares the GIL with Flask; "process" runs each model pair in its own OS process
+INFERENCE_WORKER_MODE = os.environ.get("INFERENCE_WORKER_MODE", "thread")
+# A session keeps its model instance (and MediaPipe tracking) until idle this long
+INFERENCE_PIN_IDLE_SECONDS = float(os.environ.get("INFERENCE_PIN_IDLE_SECONDS", 10))
+# Model instances with no work for this long are closed and recreated on demand
+INFERENCE_INSTANCE_IDLE_SECONDS = float(os.environ.get("INFERENCE_INSTANCE_IDLE_SECONDS", 300))
+# Per-client gesture state: idle sessions expire after the TTL, oldest evicted past the cap
+SESSION_MAX_COUNT = int(os.environ.get("SESSION_MAX_COUNT", 1000))
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", 300))
+# Set to a SQLite file path so several worker processes share session state
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH", "")
+SESSION_COOKIE = "s7h_session"
+# Emotion assets are served from memory; set ASSET_CACHE_DIR to reuse an ahead-of-time build
+# (python asset_cache.py images .asset_cache) and e.g. ASSET_REENCODE_FORMATS=webp,avif
+ASSET_CACHE_DIR = os.environ.get("ASSET_CACHE_DIR", "")
+ASSET_REENCODE_FORMATS = [f for f in os.environ.get("ASSET_REENCODE_FORMATS", "").split(",") if f]
+ASSET_MAX_AGE = 86400
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4"
+# Longest /current_gesture?wait= long-poll
+LONG_POLL_MAX_SECONDS = float(os.environ.get("LONG_POLL_MAX_SECONDS", 30))
+# /video_feed re-runs the models only on motion, between these rates (capture/stream stay at full rate)
+MOTION_THRESHOLD = float(os.environ.get("MOTION_THRESHOLD", 0.02))
+INFERENCE_MIN_HZ = float(os.environ.get("INFERENCE_MIN_HZ", 2))
+INFERENCE_MAX_HZ = float(os.environ.get("INFERENCE_MAX_HZ", 15))
+# Widest frame the models see: uploads are decoded/downscaled to ANALYZE_MAX_WIDTH, /video_feed's
+# full-frame pass runs at STREAM_INFERENCE_WIDTH (hand crops still come from the full frame); 0 = native
+ANALYZE_MAX_WIDTH = int(os.environ.get("ANALYZE_MAX_WIDTH", 640))
+STREAM_INFERENCE_WIDTH = int(os.environ.get("STREAM_INFERENCE_WIDTH", 320))
+# /video_feed JPEG policy: quality ceiling, downscale width (0 = native), optional per-frame
+# byte budget that quality adapts to (0 = off), and "auto" | "turbojpeg" | "opencv"
+STREAM_JPEG_QUALITY = int(os.environ.get("STREAM_JPEG_QUALITY", 80))
+STREAM_MIN_JPEG_QUALITY = int(os.environ.get("STREAM_MIN_JPEG_QUALITY", 50))
+STREAM_MAX_WIDTH = int(os.environ.get("STREAM_MAX_WIDTH", 640))
+STREAM_TARGET_KB = float(os.environ.get("STREAM_TARGET_KB", 0))
+STREAM_JPEG_BACKEND = os.environ.get("STREAM_JPEG_BACKEND", "auto")
+# The shared camera producer keeps running this long after the last /video_feed viewer leaves
+STREAM_IDLE_SECONDS = float(os.environ.get("STREAM_IDLE_SECONDS", 5))
+
+# Raw YUV layouts accepted by /analyze_frame_binary (X-Frame-Format header)
+RAW_YUV_PLANAR = {"i420": cv2.COLOR_YUV2RGB_I420, "nv12": cv2.COLOR_YUV2RGB_NV12, "nv21": cv2.COLOR_YUV2RGB_NV21}
+RAW_YUV_PACKED = {"yuyv": cv2.COLOR_YUV2RGB_YUYV, "uyvy": cv2.COLOR_YUV2RGB_UYVY}
 
 # Initialize MediaPipe
-mp_pose = mp.solutions.pose
 mp_face_mesh = mp.solutions.face_mesh
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
 
-# Global variables
-current_gesture = "SMILE"
-gesture_history = []
-gesture_change_cooldown = 0
-left_hand_y_history = []
-right_hand_y_history = []
-tongue_x_history = []
-analyze_gesture_history = deque(maxlen=ANALYZE_HISTORY_SIZE)
-
-# Persistent MediaPipe models for /analyze_frame (thread-safe via lock)
-_mp_models_lock = threading.Lock()
-_mp_hands_model = mp.solutions.hands.Hands(
-    min_detection_confidence=MIN_DETECTION_CONFIDENCE,
-    min_tracking_confidence=MIN_TRACKING_CONFIDENCE,
-    max_num_hands=2
+# Gesture rules compiled once into a single pass; sessions carry the per-client motion histories
+gesture_engine = GestureEngine(enabled=GESTURE_RULES)
+# Name/description/image of every gesture, with its /current_gesture JSON pre-serialized
+gesture_registry = GestureRegistry()
+
+# Per-session gesture state (smoothing windows, wave tracks, cooldowns)
+session_options = {
+    "hand_history_size": HAND_HISTORY_SIZE,
+    "stability_frames": GESTURE_STABILITY_FRAMES,
+    "analyze_history_size": ANALYZE_HISTORY_SIZE,
+}
+session_store = SessionStore(
+    max_sessions=SESSION_MAX_COUNT,
+    ttl_seconds=SESSION_TTL_SECONDS,
+    backend=SqliteSessionBackend(SESSION_STORE_PATH) if SESSION_STORE_PATH else None,
+    session_options=session_options
 )
-_mp_face_model = mp.solutions.face_mesh.FaceMesh(
-    max_num_faces=1,
-    min_detection_confidence=MIN_DETECTION_CONFIDENCE,
-    min_tracking_confidence=MIN_TRACKING_CONFIDENCE
+# Gesture state of the camera itself; /video_feed viewers' sessions mirror it
+video_session = GestureSession("video_feed", **session_options)
+
+# Reduced-scale JPEG decode, downscaling and color conversion. The /video_feed producer reuses
+# per-thread buffers; frames for the inference pool get fresh arrays, since a request that times
+# out moves on while its frame may still be queued and a reused buffer would change under the models
+analyze_preprocessor = FramePreprocessor(ANALYZE_MAX_WIDTH, reuse_buffers=False)
+stream_preprocessor = FramePreprocessor(STREAM_INFERENCE_WIDTH)
+
+# Per-stage latency histograms (capture, decode, color, models, rules, composite, encode, send)
+stage_metrics = StageMetrics()
+
+# Pool of MediaPipe model workers for /analyze_frame; frames arriving within
+# INFERENCE_BATCH_WAIT_MS of each other are dispatched together
+inference_scheduler = InferenceScheduler(
+    create_models,
+    pool_size=INFERENCE_POOL_SIZE,
+    max_batch_wait=INFERENCE_BATCH_WAIT_MS / 1000.0,
+    max_queue_depth=INFERENCE_MAX_QUEUE_DEPTH,
+    worker_class=ProcessModelWorker if INFERENCE_WORKER_MODE == "process" else ModelWorker,
+    pin_idle_seconds=INFERENCE_PIN_IDLE_SECONDS,
+    instance_idle_seconds=INFERENCE_INSTANCE_IDLE_SECONDS,
+    stage_metrics=stage_metrics
 )
+# Evicted sessions give up their model pin right away
+session_store.add_eviction_listener(inference_scheduler.release_session)
+
+# Motion gates and JPEG encoders of the running /video_feed producer, for /inference_stats
+video_gates = weakref.WeakSet()
+video_encoders = weakref.WeakSet()
 
 # Load images
 emotion_images = {}
+asset_cache = AssetCache("images", reencode_formats=ASSET_REENCODE_FORMATS, cache_dir=ASSET_CACHE_DIR or None)
 
 def load_images():
     """Load all emotion images and GIFs"""
@@ -109,340 +207,296 @@ def load_images():
                 emotion_images[key] = cv2.resize(frame_cv, (400, 400))
             except:
                 pass
-
-# Helper functions
-def calculate_angle(p1, p2, p3):
-    """Calculate angle between three points"""
-    import math
-    radians = math.atan2(p3.y - p2.y, p3.x - p2.x) - math.atan2(p1.y - p2.y, p1.x - p2.x)
-    angle = abs(radians * 180.0 / math.pi)
-    if angle > 180.0:
-        angle = 360 - angle
-    return angle
-
-def calculate_distance(p1, p2):
-    """Calculate Euclidean distance between two points"""
-    return ((p1.x - p2.x)**2 + (p1.y - p2.y)**2)**0.5
-
-def is_finger_extended(tip, pip, mcp, wrist):
-    """Check if a finger is extended"""
-    vertical_extension = tip.y < mcp.y - 0.05
-    angle = calculate_angle(mcp, pip, tip)
-    is_straight = angle > 140
-    tip_to_wrist = calculate_distance(tip, wrist)
-    mcp_to_wrist = calculate_distance(mcp, wrist)
-    is_extended_distance = tip_to_wrist > mcp_to_wrist * 1.1
-    return vertical_extension and (is_straight or is_extended_distance)
-
-def is_finger_curled(tip, pip, mcp, wrist):
-    """Check if a finger is curled"""
-    tip_below_mcp = tip.y >= mcp.y - 0.02
-    angle = calculate_angle(mcp, pip, tip)
-    is_bent = angle < 120
-    tip_to_wrist = calculate_distance(tip, wrist)
-    mcp_to_wrist = calculate_distance(mcp, wrist)
-    is_close = tip_to_wrist < mcp_to_wrist * 1.2
-    return tip_below_mcp or (is_bent and is_close)
-
-def get_finger_states(hand_landmarks):
-    """Get the state of all fingers"""
-    thumb_tip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP]
-    thumb_ip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_IP]
-    thumb_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_MCP]
-    
-    index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-    index_pip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP]
-    index_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP]
-    
-    middle_tip = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-    middle_pip = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_PIP]
-    middle_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
-    
-    ring_tip = hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_TIP]
-    ring_pip = hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_PIP]
-    ring_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_MCP]
-    
-    pinky_tip = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP]
-    pinky_pip = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_PIP]
-    pinky_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_MCP]
-    
-    wrist = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
-    
-    states = {
-        'thumb_extended': thumb_tip.y < thumb_ip.y and thumb_tip.y < wrist.y - 0.05,
-        'index_extended': is_finger_extended(index_tip, index_pip, index_mcp, wrist),
-        'middle_extended': is_finger_extended(middle_tip, middle_pip, middle_mcp, wrist),
-        'ring_extended': is_finger_extended(ring_tip, ring_pip, ring_mcp, wrist),
-        'pinky_extended': is_finger_extended(pinky_tip, pinky_pip, pinky_mcp, wrist),
-        'index_curled': is_finger_curled(index_tip, index_pip, index_mcp, wrist),
-        'middle_curled': is_finger_curled(middle_tip, middle_pip, middle_mcp, wrist),
-        'ring_curled': is_finger_curled(ring_tip, ring_pip, ring_mcp, wrist),
-        'pinky_curled': is_finger_curled(pinky_tip, pinky_pip, pinky_mcp, wrist),
-    }
     
-    return states
+    # Every frame of every asset, pre-encoded per size variant for serve_image.
+    # Built in the background; serve_image falls back to disk until it is ready.
+    filenames = list(static_images.values()) + list(gif_images.values())
+    threading.Thread(target=asset_cache.build, args=(filenames,), name="asset-cache", daemon=True).start()
 
-def detect_gesture(results_hands, results_face):
-    """Detect gesture from MediaPipe results"""
-    global left_hand_y_history, right_hand_y_history
-    
-    detected_state = "SMILE"
-    
-    # 1. Thumbs up
-    if results_hands.multi_hand_landmarks:
-        for hand_landmarks in results_hands.multi_hand_landmarks:
-            finger_states = get_finger_states(hand_landmarks)
-            thumb_tip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP]
-            wrist = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
-            
-            thumb_up = finger_states['thumb_extended'] and thumb_tip.y < wrist.y - 0.1
-            all_fingers_curled = (finger_states['index_curled'] and 
-                                 finger_states['middle_curled'] and 
-                                 finger_states['ring_curled'] and 
-                                 finger_states['pinky_curled'])
-            
-            if thumb_up and all_fingers_curled:
-                detected_state = "THUMBS_UP"
-                break
-    
-    # 2. Wave motion (two hands)
-    if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-        if len(results_hands.multi_hand_landmarks) >= 2:
-            hand1_states = get_finger_states(results_hands.multi_hand_landmarks[0])
-            hand2_states = get_finger_states(results_hands.multi_hand_landmarks[1])
-            
-            hand1_open = (hand1_states['index_extended'] and hand1_states['middle_extended'] and 
-                         hand1_states['ring_extended'] and hand1_states['pinky_extended'])
-            hand2_open = (hand2_states['index_extended'] and hand2_states['middle_extended'] and 
-                         hand2_states['ring_extended'] and hand2_states['pinky_extended'])
-            
-            if hand1_open and hand2_open:
-                wrist1 = results_hands.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.WRIST]
-                wrist2 = results_hands.multi_hand_landmarks[1].landmark[mp_hands.HandLandmark.WRIST]
-                
-                if wrist1.x < wrist2.x:
-                    left_wrist, right_wrist = wrist1, wrist2
-                else:
-                    left_wrist, right_wrist = wrist2, wrist1
-                
-                left_hand_y_history.append(left_wrist.y)
-                right_hand_y_history.append(right_wrist.y)
-                
-                if len(left_hand_y_history) > HAND_HISTORY_SIZE:
-                    left_hand_y_history.pop(0)
-                if len(right_hand_y_history) > HAND_HISTORY_SIZE:
-                    right_hand_y_history.pop(0)
-                
-                if len(left_hand_y_history) >= HAND_HISTORY_SIZE:
-                    left_y_range = max(left_hand_y_history) - min(left_hand_y_history)
-                    right_y_range = max(right_hand_y_history) - min(right_hand_y_history)
-                    
-                    if left_y_range > 0.06 and right_y_range > 0.06:
-                        detected_state = "VICTORY"
-            else:
-                left_hand_y_history.clear()
-                right_hand_y_history.clear()
-    
-    # 3. Peace sign
-    if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-        for hand_landmarks in results_hands.multi_hand_landmarks:
-            finger_states = get_finger_states(hand_landmarks)
-            index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-            middle_tip = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-            
-            peace_fingers = (finger_states['index_extended'] and finger_states['middle_extended'])
-            other_fingers_down = (finger_states['ring_curled'] and finger_states['pinky_curled'])
-            fingers_spread = calculate_distance(index_tip, middle_tip) > 0.05
-            
-            if peace_fingers and other_fingers_down and fingers_spread:
-                detected_state = "PEACE"
-                break
-    
-    # 4. Open palm (single hand)
-    if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-        if len(results_hands.multi_hand_landmarks) == 1:
-            hand_landmarks = results_hands.multi_hand_landmarks[0]
-            finger_states = get_finger_states(hand_landmarks)
-            index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-            pinky_tip = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP]
-            
-            all_extended = (finger_states['index_extended'] and finger_states['middle_extended'] and 
-                          finger_states['ring_extended'] and finger_states['pinky_extended'])
-            fingers_spread = calculate_distance(index_tip, pinky_tip) > 0.15
-            
-            if all_extended and fingers_spread:
-                detected_state = "OPEN_PALM"
-    
-    # 5. Fist
-    if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-        for hand_landmarks in results_hands.multi_hand_landmarks:
-            finger_states = get_finger_states(hand_landmarks)
-            
-            all_curled = (finger_states['index_curled'] and finger_states['middle_curled'] and 
-                        finger_states['ring_curled'] and finger_states['pinky_curled'])
-            thumb_not_extended = not finger_states['thumb_extended']
-            
-            if all_curled and thumb_not_extended:
-                detected_state = "FIST"
-                break
-    
-    # 6. Pointing
-    if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-        for hand_landmarks in results_hands.multi_hand_landmarks:
-            finger_states = get_finger_states(hand_landmarks)
-            
-            index_only = (finger_states['index_extended'] and finger_states['middle_curled'] and 
-                        finger_states['ring_curled'] and finger_states['pinky_curled'])
-            
-            if index_only:
-                detected_state = "MONKEY_FINGER_RAISE"
-                break
-    
-    # 7. Yawning
-    if detected_state == "SMILE" and results_face.multi_face_landmarks:
-        face_landmarks = results_face.multi_face_landmarks[0]
-        upper_lip = face_landmarks.landmark[13]
-        lower_lip = face_landmarks.landmark[14]
-        mouth_left = face_landmarks.landmark[61]
-        mouth_right = face_landmarks.landmark[291]
-        
-        mouth_height = calculate_distance(upper_lip, lower_lip)
-        mouth_width = calculate_distance(mouth_left, mouth_right)
-        mouth_aspect_ratio = mouth_height / (mouth_width + 0.001)
-        
-        if mouth_aspect_ratio > 0.5:
-            detected_state = "YAWN"
-    
-    return detected_state
+def session_id_from(headers, args, cookies):
+    """The client's session id from header, query or cookie (None if absent or invalid)"""
+    session_id = headers.get('X-Session-Id') or args.get('session') or cookies.get(SESSION_COOKIE)
+    if not session_id or len(session_id) > 64:
+        return None
+    return session_id
 
-def analyze_image_bgr(image_bgr):
-    """Run MediaPipe on a single BGR image and return detected gesture string"""
-    image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+def get_session():
+    """Resolve the calling client's GestureSession from header, query or cookie"""
+    session_id = session_id_from(request.headers, request.args, request.cookies)
+    if session_id is None:
+        session_id = uuid.uuid4().hex
+        g.new_session_id = session_id
+    return session_store.get(session_id)
+
+@app.after_request
+def set_session_cookie(response):
+    """Hand newly created session ids back to the browser"""
+    session_id = g.pop('new_session_id', None)
+    if session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response
+
+def detect_gesture(features, session):
+    """Detect gesture from the frame's extracted landmark features"""
+    return gesture_engine.evaluate(features, session)
+
+def analyze_image_rgb(image_rgb, session):
+    """Run MediaPipe on a single RGB image and return detected gesture string"""
+    future = inference_scheduler.submit(image_rgb, session.session_id)
     try:
-        with _mp_models_lock:
-            results_hands = _mp_hands_model.process(image_rgb)
-            results_face = _mp_face_model.process(image_rgb)
+        features = future.result(timeout=INFERENCE_TIMEOUT_SECONDS)
     except Exception:
-        # On any internal error, fallback to default gesture
+        # On any internal error or timeout, fallback to default gesture
         return "SMILE"
-    return detect_gesture(results_hands, results_face)
+    return finish_analysis(features, session)
+
+def finish_analysis(features, session):
+    """Run the gesture rules on inferred features and count the frame for the session's stats"""
+    with session.lock:
+        started = time.perf_counter()
+        detected = detect_gesture(features, session)
+        stage_metrics.observe("rules", time.perf_counter() - started)
+        session.record_frame(features)
+        return detected
 
-def generate_frames():
-    """Generate video frames with gesture detection"""
-    global current_gesture, gesture_history, gesture_change_cooldown
+def analyze_image_bgr(image_bgr, session):
+    """Run MediaPipe on a single BGR image and return detected gesture string"""
+    return analyze_image_rgb(bgr_to_rgb(image_bgr), session)
+
+def bgr_to_rgb(image_bgr, preprocessor=None):
+    """Downscaling and color conversion for the models, timed as the color stage"""
+    started = time.perf_counter()
+    image_rgb = (preprocessor or analyze_preprocessor).to_rgb(image_bgr)
+    stage_metrics.observe("color", time.perf_counter() - started)
+    return image_rgb
+
+def decode_image(buffer, preprocessor=None):
+    """Decode an encoded image body to BGR (None if invalid), timed as the decode stage"""
+    started = time.perf_counter()
+    img_bgr = (preprocessor or analyze_preprocessor).decode(buffer)
+    stage_metrics.observe("decode", time.perf_counter() - started)
+    return img_bgr
+
+def decode_raw_frame(buffer, mimetype, headers):
+    """Turn an unencoded frame body into an RGB array, or None if it doesn't fit"""
+    try:
+        width = int(headers.get('X-Frame-Width', 0))
+        height = int(headers.get('X-Frame-Height', 0))
+    except ValueError:
+        return None
+    if width <= 0 or height <= 0:
+        return None
     
+    if mimetype == 'application/x-raw-rgb':
+        if buffer.size != width * height * 3:
+            return None
+        return buffer.reshape(height, width, 3)
+    if mimetype == 'application/x-raw-rgba':
+        if buffer.size != width * height * 4:
+            return None
+        return cv2.cvtColor(buffer.reshape(height, width, 4), cv2.COLOR_RGBA2RGB)
+    if mimetype == 'application/x-raw-yuv':
+        yuv_format = headers.get('X-Frame-Format', 'i420').lower()
+        if yuv_format in RAW_YUV_PLANAR:
+            if buffer.size != width * height * 3 // 2:
+                return None
+            return cv2.cvtColor(buffer.reshape(height * 3 // 2, width), RAW_YUV_PLANAR[yuv_format])
+        if yuv_format in RAW_YUV_PACKED:
+            if buffer.size != width * height * 2:
+                return None
+            return cv2.cvtColor(buffer.reshape(height, width, 2), RAW_YUV_PACKED[yuv_format])
+    return None
+
+def update_analyze_gesture(session, detected):
+    """Smooth analyze_frame detections and publish the result as the session's gesture"""
+    with session.lock:
+        # Smoothing: majority vote over last N detections
+        history = session.analyze_gesture_history
+        history.append(detected)
+        if len(history) >= 2:
+            # Select most frequent
+            counts = {}
+            for gesture in history:
+                counts[gesture] = counts.get(gesture, 0) + 1
+            smoothed = max(counts.items(), key=lambda kv: kv[1])[0]
+        else:
+            smoothed = detected
+        if smoothed:
+            session.current_gesture = smoothed
+        session_store.save(session)
+
+def produce_frames():
+    """Capture, detect and encode each camera frame once; yields (chunk, gesture, detection stats)"""
     cap = cv2.VideoCapture(0)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+    gate = MotionGate(MOTION_THRESHOLD, INFERENCE_MIN_HZ, INFERENCE_MAX_HZ)
+    video_gates.add(gate)
+    encoder = JpegEncoder(STREAM_JPEG_QUALITY, STREAM_MIN_JPEG_QUALITY, STREAM_MAX_WIDTH,
+                          int(STREAM_TARGET_KB * 1024), STREAM_JPEG_BACKEND, stage_metrics)
+    video_encoders.add(encoder)
+    session = video_session
+    results_hands = None
+    pending = None  # (future JPEG, capture start, gesture, stats) of the frame still being encoded
     
-    with mp_hands.Hands(min_detection_confidence=MIN_DETECTION_CONFIDENCE, 
-                        min_tracking_confidence=MIN_TRACKING_CONFIDENCE, 
-                        max_num_hands=2) as hands, \
-         mp_face_mesh.FaceMesh(max_num_faces=1, 
-                              min_detection_confidence=MIN_DETECTION_CONFIDENCE,
-                              min_tracking_confidence=MIN_TRACKING_CONFIDENCE) as face_mesh:
+    # Released when the hub stops the producer (no viewers) as well as when capture fails
+    try:
+        with mp_hands.Hands(min_detection_confidence=MIN_DETECTION_CONFIDENCE, 
+                            min_tracking_confidence=MIN_TRACKING_CONFIDENCE, 
+                            max_num_hands=2) as hands, \
+             mp_hands.Hands(min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+                            min_tracking_confidence=MIN_TRACKING_CONFIDENCE,
+                            max_num_hands=2) as roi_hands, \
+             mp_face_mesh.FaceMesh(max_num_faces=1, 
+                                  min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+                                  min_tracking_confidence=MIN_TRACKING_CONFIDENCE) as face_mesh:
+            hand_tracker = HandRoiTracker(hands, roi_hands,
+                                          detect_size=stream_preprocessor.target_size(CAMERA_WIDTH, CAMERA_HEIGHT))
         
-        while True:
-            success, frame = cap.read()
-            if not success:
-                break
-            
-            frame = cv2.flip(frame, 1)
-            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            results_hands = hands.process(image_rgb)
-            results_face = face_mesh.process(image_rgb)
+            while True:
+                started = time.perf_counter()
+                success, frame = cap.read()
+                if not success:
+                    break
+                stage_metrics.observe("capture", time.perf_counter() - started)
             
-            # Detect gesture
-            detected_state = detect_gesture(results_hands, results_face)
-            
-            # Gesture stability
-            gesture_history.append(detected_state)
-            if len(gesture_history) > GESTURE_STABILITY_FRAMES:
-                gesture_history.pop(0)
-            
-            if gesture_change_cooldown > 0:
-                gesture_change_cooldown -= 1
-            else:
-                if len(gesture_history) == GESTURE_STABILITY_FRAMES:
-                    if all(g == detected_state for g in gesture_history):
-                        if detected_state != current_gesture:
-                            current_gesture = detected_state
-                            gesture_change_cooldown = GESTURE_COOLDOWN_FRAMES
+                frame = cv2.flip(frame, 1)
             
-            # Draw hand landmarks
-            if results_hands.multi_hand_landmarks:
-                for hand_landmarks in results_hands.multi_hand_landmarks:
-                    mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+                # While the scene is still, keep the last landmarks and gesture instead of re-running the models
+                features = None
+                if gate.should_infer(frame):
+                    t0 = time.perf_counter()
+                    image_rgb = stream_preprocessor.to_rgb(frame)
+                    t1 = time.perf_counter()
+                
+                    # Crops around last frame's hands; full frame periodically or when they are lost
+                    results_hands = hand_tracker.process(frame, image_rgb)
+                    t2 = time.perf_counter()
+                    results_face = face_mesh.process(image_rgb)
+                    t3 = time.perf_counter()
+                    stage_metrics.observe("color", t1 - t0)
+                    stage_metrics.observe("hands", t2 - t1)
+                    stage_metrics.observe("face", t3 - t2)
+                
+                    with session.lock:
+                        # Detect gesture
+                        features = extract_features(results_hands, results_face)
+                        detected_state = detect_gesture(features, session)
+                    
+                        # Gesture stability
+                        update_stable_gesture(session, detected_state, GESTURE_COOLDOWN_FRAMES)
+                    stage_metrics.observe("rules", time.perf_counter() - t3)
+                with session.lock:
+                    session.record_frame(features)
+                    current_gesture = session.current_gesture
+                    detection_stats = dict(session.detection_stats)
+                composite_started = time.perf_counter()
             
-            # Add gesture text
-            gesture_names = {
-                "THUMBS_UP": "👍 Thumbs Up",
-                "PEACE": "✌️ Peace Sign",
-                "OPEN_PALM": "👋 Open Palm",
-                "FIST": "✊ Fist",
-                "MONKEY_FINGER_MOUTH": "🤫 Shh",
-                "MONKEY_FINGER_RAISE": "☝️ Pointing",
-                "YAWN": "😮 Yawning",
-                "VICTORY": "🎉 Victory!",
-                "SMILE": "😊 Smiling"
-            }
+                # Draw hand landmarks
+                if results_hands is not None and results_hands.multi_hand_landmarks:
+                    for hand_landmarks in results_hands.multi_hand_landmarks:
+                        mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
             
-            text = gesture_names.get(current_gesture, current_gesture)
-            cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                # Add gesture text
+                text = gesture_registry.get(current_gesture).overlay
+                cv2.putText(frame, text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                cv2.putText(frame, f"Inference: {gate.inference_fps():.1f} fps", (10, CAMERA_HEIGHT - 15),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             
-            # Encode frame
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
+                stage_metrics.observe("composite", time.perf_counter() - composite_started)
             
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-    
-    cap.release()
+                # Encode on the encoder thread while the next frame is captured and inferred;
+                # the previous frame is published meanwhile, so the stream runs one frame behind
+                previous, pending = pending, (encoder.submit(frame), started, current_gesture, detection_stats)
+                if previous is not None:
+                    yield encoded_frame(*previous)
+        
+            if pending is not None:
+                yield encoded_frame(*pending)
+    finally:
+        encoder.close()
+        cap.release()
+
+def encoded_frame(future, started, gesture, detection_stats):
+    """Wait for an encoded frame and wrap it as a multipart chunk"""
+    frame = future.result()
+    stage_metrics.observe("end_to_end", time.perf_counter() - started)
+    chunk = (b'--frame\r\n'
+             b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+    return chunk, gesture, detection_stats
+
+# One producer captures, detects and encodes for every /video_feed viewer
+video_hub = BroadcastHub(produce_frames, STREAM_IDLE_SECONDS, name="video-feed")
+
+def follow_video_feed(session, gesture, detection_stats):
+    """Copy the camera's gesture into a viewer's session as a frame is sent to it"""
+    with session.lock:
+        changed = session.current_gesture != gesture
+        session.current_gesture = gesture
+        # FPS is what this viewer receives; hands and confidence come from the producer
+        session.record_frame()
+        session.detection_stats["hands"] = detection_stats["hands"]
+        session.detection_stats["confidence"] = detection_stats["confidence"]
+        if changed:
+            session_store.save(session)
+
+def generate_frames(session, max_fps=0):
+    """Stream the shared camera feed to one viewer and mirror its gesture into the viewer's session"""
+    for chunk, gesture, detection_stats in video_hub.subscribe(max_fps):
+        follow_video_feed(session, gesture, detection_stats)
+        sent_at = time.perf_counter()
+        yield chunk
+        # The generator resumes once the server has written the chunk
+        stage_metrics.observe("send", time.perf_counter() - sent_at)
 
 @app.route('/')
 def index():
     """Render main page"""
+    # Resolving the session here sets the cookie before the page opens its streams
+    get_session()
     return render_template('index.html')
 
 @app.route('/video_feed')
 def video_feed():
-    """Video streaming route"""
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    """Video streaming route; ?fps= caps this viewer's frame rate"""
+    max_fps = request.args.get('fps', 0, type=float)
+    return Response(generate_frames(get_session(), max_fps), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+def gesture_response(gesture):
+    """The gesture's pre-serialized JSON with its strong ETag (304 when the client already has it)"""
+    payload = gesture_registry.get(gesture)
+    response = Response(payload.body, mimetype='application/json')
+    response.set_etag(payload.etag)
+    # Per-session and changing: cache privately, but revalidate every poll
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def wait_for_gesture_change(session, known_etag, timeout):
+    """Long-poll: block until the session's gesture no longer matches known_etag, or timeout"""
+    changed = threading.Event()
+    listener = lambda gesture: changed.set()
+    session.add_gesture_listener(listener)
+    try:
+        if gesture_registry.get(session.current_gesture).etag == known_etag:
+            changed.wait(timeout)
+    finally:
+        session.remove_gesture_listener(listener)
 
 @app.route('/current_gesture')
 def get_current_gesture():
-    """Get current gesture as JSON"""
-    gesture_info = {
-        "THUMBS_UP": {"name": "👍 Thumbs Up", "description": "Success!", "image": "thumbsup.png"},
-        "PEACE": {"name": "✌️ Peace Sign", "description": "Cheering!", "image": "cheer.webp"},
-        "OPEN_PALM": {"name": "👋 Open Palm", "description": "Waving!", "image": "princess.gif"},
-        "FIST": {"name": "✊ Fist", "description": "Power!", "image": "hog.jpeg"},
-        "MONKEY_FINGER_MOUTH": {"name": "🤫 Shh Monkey", "description": "Finger to lips — shhh.", "image": "monkey_finger_mouth.jpeg"},
-        "MONKEY_FINGER_RAISE": {"name": "☝️ Pointing", "description": "Look up!", "image": "monkey_finger_raise.jpg"},
-        "YAWN": {"name": "😮 Yawning", "description": "Tired!", "image": "yawn.jpg"},
-        "CRYING": {"name": "😢 Goblin Tears", "description": "Covering face — crying emote.", "image": "goblin_crying.gif"},
-        "KISSING": {"name": "💋 Kissing", "description": "Love!", "image": "princess_kissing.gif"},
-        "DANCING": {"name": "🕺 Dancing", "description": "Party!", "image": "pig-dance-clash-royale.gif"},
-        "TONGUE_OUT": {"name": "👅 Tongue Out Chaos", "description": "Mouth open + tongue movement.", "image": "monkey_mouth.gif"},
-        "CLAPPING": {"name": "👏 Clapping", "description": "Applause!", "image": "did-unc-snap-unc.gif"},
-        "VICTORY": {"name": "🎉 Victory", "description": "Celebration!", "image": "67.gif"},
-        "SMILE": {"name": "😊 Smiling", "description": "Happy!", "image": "smile.jpg"}
-    }
-    
-    info = gesture_info.get(current_gesture, {"name": current_gesture, "description": "", "image": "smile.jpg"})
-    
-    return jsonify({
-        "gesture": current_gesture,
-        "name": info["name"],
-        "description": info["description"],
-        "image": info["image"]
-    })
+    """Get current gesture as JSON; with ?wait=N and If-None-Match, answer once it changes (or 304 after N s)"""
+    session = get_session()
+    wait = min(request.args.get('wait', 0, type=float), LONG_POLL_MAX_SECONDS)
+    if wait > 0 and request.if_none_match:
+        known_etag = gesture_registry.get(session.current_gesture).etag
+        if request.if_none_match.contains(known_etag):
+            wait_for_gesture_change(session, known_etag, wait)
+    return gesture_response(session.current_gesture)
 
 @app.route('/analyze_frame', methods=['POST'])
 def analyze_frame():
     """Analyze a single frame posted from the browser and return gesture JSON"""
-    global current_gesture
     try:
         payload = request.get_json(silent=True) or {}
         data_url = payload.get('image')
@@ -453,34 +507,175 @@ def analyze_frame():
             base64_data = data_url.split(',', 1)[1]
         else:
             base64_data = data_url
-        img_bytes = base64.b64decode(base64_data)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img_bgr = decode_image(np.frombuffer(base64.b64decode(base64_data), np.uint8))
         if img_bgr is None:
             return jsonify({"error": "Invalid image"}), 400
-        detected = analyze_image_bgr(img_bgr)
-        # Smoothing: majority vote over last N detections
-        analyze_gesture_history.append(detected)
-        if len(analyze_gesture_history) >= 2:
-            # Select most frequent
-            counts = {}
-            for g in analyze_gesture_history:
-                counts[g] = counts.get(g, 0) + 1
-            smoothed = max(counts.items(), key=lambda kv: kv[1])[0]
-        else:
-            smoothed = detected
-        if smoothed:
-            current_gesture = smoothed
+        session = get_session()
+        try:
+            detected = analyze_image_bgr(img_bgr, session)
+        except InferenceQueueFull:
+            return jsonify({"error": "Server busy"}), 503
+        update_analyze_gesture(session, detected)
         # reuse the same mapping as current_gesture
-        return get_current_gesture()
+        return gesture_response(session.current_gesture)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/analyze_frame_binary', methods=['POST'])
+def analyze_frame_binary():
+    """Fast path: analyze a raw binary frame body and return gesture JSON
+    
+    Accepts an encoded image (image/jpeg, image/png, image/webp or
+    application/octet-stream) or an unencoded frame (application/x-raw-rgb,
+    application/x-raw-rgba or application/x-raw-yuv) described by the
+    X-Frame-Width, X-Frame-Height and, for YUV, X-Frame-Format headers.
+    """
+    try:
+        # Body bytes are viewed in place; no base64 or JSON copy
+        buffer = np.frombuffer(request.get_data(cache=False), np.uint8)
+        if buffer.size == 0:
+            return jsonify({"error": "Missing image"}), 400
+        mimetype = request.mimetype
+        session = get_session()
+        try:
+            if mimetype.startswith('application/x-raw-'):
+                started = time.perf_counter()
+                image_rgb = decode_raw_frame(buffer, mimetype, request.headers)
+                if image_rgb is None:
+                    return jsonify({"error": "Invalid frame"}), 400
+                image_rgb = analyze_preprocessor.fit_rgb(image_rgb)
+                stage_metrics.observe("decode", time.perf_counter() - started)
+                detected = analyze_image_rgb(image_rgb, session)
+            else:
+                img_bgr = decode_image(buffer)
+                if img_bgr is None:
+                    return jsonify({"error": "Invalid image"}), 400
+                detected = analyze_image_bgr(img_bgr, session)
+        except InferenceQueueFull:
+            return jsonify({"error": "Server busy"}), 503
+        update_analyze_gesture(session, detected)
+        return gesture_response(session.current_gesture)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def gesture_stream(ws):
+    """Persistent gesture channel: binary frames up, stable gesture changes down
+    
+    A reader thread drains incoming frames into a LatestSlot, so while one
+    frame is being analyzed any newer frames replace each other and only the
+    freshest is processed next. A message is sent only when the gesture changes.
+    """
+    session = get_session()
+    frames = LatestSlot()
+    
+    def receive_frames():
+        try:
+            while True:
+                message = ws.receive()
+                if isinstance(message, (bytes, bytearray)):
+                    frames.put(message)
+        except ConnectionClosed:
+            pass
+        finally:
+            frames.close()
+    
+    threading.Thread(target=receive_frames, name="ws-receive", daemon=True).start()
+    
+    try:
+        last_sent = session.current_gesture
+        ws.send(gesture_registry.get(last_sent).text)
+        while True:
+            message = frames.get()
+            if message is None:
+                break
+            img_bgr = decode_image(np.frombuffer(message, np.uint8))
+            if img_bgr is None:
+                continue
+            try:
+                detected = analyze_image_bgr(img_bgr, session)
+            except InferenceQueueFull:
+                # Overloaded: drop this frame, the client keeps streaming newer ones
+                continue
+            update_analyze_gesture(session, detected)
+            if session.current_gesture != last_sent:
+                last_sent = session.current_gesture
+                ws.send(gesture_registry.get(last_sent).text)
+    except ConnectionClosed:
+        pass
+    finally:
+        frames.close()
+
+if sock is not None:
+    sock.route('/ws/gesture')(gesture_stream)
+
+@app.route('/inference_stats')
+def inference_stats():
+    """Queue depth, batch size, queue-wait and service-time metrics for analyze_frame"""
+    return jsonify(inference_stats_payload())
+
+def inference_stats_payload():
+    metrics = inference_scheduler.metrics()
+    # Motion gating of each open /video_feed stream, incl. its effective inference FPS
+    metrics["video_feeds"] = [gate.stats() for gate in list(video_gates)]
+    # JPEG backend, quality, bytes per frame and encode time of each open stream
+    metrics["video_encoders"] = [encoder.stats() for encoder in list(video_encoders)]
+    # Shared producer: viewers, frames published/delivered, frames slow viewers skipped
+    metrics["video_hub"] = video_hub.stats()
+    metrics["rules"] = gesture_engine.stats()
+    metrics["stages"] = stage_metrics.snapshot()
+    return metrics
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Per-stage latency quantiles and pool/session gauges in Prometheus text format"""
+    return Response(prometheus_text(), mimetype=PROMETHEUS_MIMETYPE)
+
+def prometheus_text():
+    pool = inference_scheduler.metrics()
+    sessions = session_store.metrics()
+    hub = video_hub.stats()
+    encoders = [encoder.stats() for encoder in list(video_encoders)]
+    frame_bytes = sum(e["mean_bytes"] for e in encoders) / len(encoders) if encoders else 0
+    gauges = [
+        ("s7h_inference_queue_depth", "Frames waiting for an inference worker", pool["queue_depth"]),
+        ("s7h_inference_rejected_total", "Frames rejected because the queue was full", pool["rejected"]),
+        ("s7h_active_sessions", "Gesture sessions held in memory", sessions["active_sessions"]),
+        ("s7h_stream_viewers", "Open /video_feed streams", hub["subscribers"]),
+        ("s7h_stream_skipped_frames_total", "Frames slow /video_feed viewers skipped", hub["skipped"]),
+        ("s7h_stream_jpeg_bytes", "Average JPEG size per /video_feed frame across open streams", round(frame_bytes)),
+    ]
+    lines = [stage_metrics.prometheus().rstrip("\n")]
+    for name, help_text, value in gauges:
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines += [f"# HELP {name} {help_text}.", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+@app.route('/detection_stats')
+def detection_stats():
+    """This session's hand confidence, hands and FPS, plus end-to-end latency, for the stats card"""
+    return jsonify(detection_stats_payload(get_session()))
+
+def detection_stats_payload(session):
+    with session.lock:
+        stats = dict(session.detection_stats)
+    stages = stage_metrics.snapshot()
+    latency = stages.get("end_to_end") or stages.get("queue_wait") or {}
+    stats["latency_ms"] = latency.get("p50_ms")
+    return stats
+
 @app.route('/images/<path:filename>')
 def serve_image(filename):
-    """Serve images from the images folder"""
-    from flask import send_from_directory
-    return send_from_directory('images', filename)
+    """Serve images from the in-memory asset cache (?size=400|thumb), else from disk"""
+    asset = asset_cache.get(filename, request.args.get('size', ORIGINAL), request.headers.get('Accept', ''))
+    if asset is None:
+        from flask import send_from_directory
+        return send_from_directory('images', filename, max_age=ASSET_MAX_AGE)
+    response = Response(asset.data, mimetype=asset.mimetype)
+    response.set_etag(asset.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = ASSET_MAX_AGE
+    response.vary.add('Accept')
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
     print("🚀 Starting Instagram Emoji Reaction Web App...")
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Async (ASGI) serving mode for the gesture web app
+Serves the same routes as app.py with Starlette on uvicorn, sharing its models,
+sessions, caches and camera hub. MJPEG viewers, WebSockets and requests waiting
+on inference are coroutines rather than threads. Frame decoding runs on a small
+executor, and inference is awaited on the pool's futures. One process can hold
+thousands of idle or streaming connections.
+
+    python asgi_app.py                          # or: uvicorn asgi_app:app --port 8080
+"""
+
+import asyncio
+import base64
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import numpy as np
+from flask import render_template
+
+try:
+    from starlette.applications import Starlette
+    from starlette.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
+    from starlette.routing import Mount, Route, WebSocketRoute
+    from starlette.staticfiles import StaticFiles
+    from starlette.websockets import WebSocketDisconnect
+    import uvicorn
+except ImportError:
+    Starlette = None
+
+import app as web
+from asset_cache import ORIGINAL
+from frame_preprocess import FramePreprocessor
+from inference_pool import InferenceQueueFull
+
+# --- CONFIGURATION ---
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", 8080))
+# Threads for JPEG/PNG decoding and color conversion; inference has its own pool
+DECODE_WORKERS = int(os.environ.get("ASGI_DECODE_WORKERS", min(4, os.cpu_count() or 1)))
+IMAGES_DIR = os.path.realpath("images")
+
+decode_executor = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="asgi-decode")
+# Decoded frames outlive the executor call (they wait for inference), so no per-thread buffer reuse
+preprocessor = FramePreprocessor(web.ANALYZE_MAX_WIDTH, reuse_buffers=False)
+index_html = None
+
+
+async def run_blocking(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(decode_executor, function, *args)
+
+
+async def session_call(function, *args):
+    """Session store work: off the event loop when it reads or writes the SQLite backend
+
+    Memory-only stores just take a dict lock and a session lock held for microseconds,
+    so they run inline rather than paying an executor hop on every request and frame.
+    """
+    if web.session_store.backend is not None:
+        return await run_blocking(function, *args)
+    return function(*args)
+
+
+async def get_session(connection):
+    """The client's GestureSession and, if it was just created, its new id for the cookie"""
+    session_id = web.session_id_from(connection.headers, connection.query_params, connection.cookies)
+    new_session_id = None
+    if session_id is None:
+        session_id = new_session_id = uuid.uuid4().hex
+    return await session_call(web.session_store.get, session_id), new_session_id
+
+
+def with_cookie(response, new_session_id):
+    if new_session_id:
+        response.set_cookie(web.SESSION_COOKIE, new_session_id, httponly=True, samesite="lax")
+    return response
+
+
+async def analyze_rgb(image_rgb, session):
+    """Async analyze_image_rgb: the request waits on the inference future without holding a thread"""
+    future = web.inference_scheduler.submit(image_rgb, session.session_id)
+    try:
+        # Shielded: timing out must not cancel the future the worker will still resolve
+        features = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), web.INFERENCE_TIMEOUT_SECONDS)
+    except Exception:
+        # On any internal error or timeout, fallback to default gesture
+        return "SMILE"
+    # Rule evaluation waits on the session lock: keep it off the event loop
+    return await run_blocking(web.finish_analysis, features, session)
+
+
+def decode_to_rgb(buffer):
+    image_bgr = web.decode_image(buffer, preprocessor)
+    return None if image_bgr is None else web.bgr_to_rgb(image_bgr, preprocessor)
+
+
+def decode_raw_to_rgb(buffer, mimetype, headers):
+    started = time.perf_counter()
+    image_rgb = web.decode_raw_frame(buffer, mimetype, headers)
+    if image_rgb is not None:
+        image_rgb = preprocessor.fit_rgb(image_rgb)
+    web.stage_metrics.observe("decode", time.perf_counter() - started)
+    return image_rgb
+
+
+# --- ROUTES ---
+
+async def index(request):
+    session, new_session_id = await get_session(request)
+    return with_cookie(HTMLResponse(index_html), new_session_id)
+
+
+async def video_feed(request):
+    session, new_session_id = await get_session(request)
+    try:
+        max_fps = float(request.query_params.get("fps", 0))
+    except ValueError:
+        max_fps = 0
+
+    async def frames():
+        async for chunk, gesture, detection_stats in web.video_hub.subscribe_async(max_fps):
+            await session_call(web.follow_video_feed, session, gesture, detection_stats)
+            sent_at = time.perf_counter()
+            yield chunk
+            web.stage_metrics.observe("send", time.perf_counter() - sent_at)
+
+    response = StreamingResponse(frames(), media_type="multipart/x-mixed-replace; boundary=frame")
+    return with_cookie(response, new_session_id)
+
+
+def if_none_match(request, etag):
+    header = request.headers.get("if-none-match", "")
+    return header.strip() == "*" or f'"{etag}"' in [tag.strip() for tag in header.split(",")]
+
+
+def gesture_response(request, gesture, new_session_id=None):
+    """Pre-serialized gesture JSON with a strong ETag, as in app.py (304 when the client has it)"""
+    payload = web.gesture_registry.get(gesture)
+    headers = {"ETag": f'"{payload.etag}"', "Cache-Control": "private, no-cache"}
+    if request.method in ("GET", "HEAD") and if_none_match(request, payload.etag):
+        return with_cookie(Response(status_code=304, headers=headers), new_session_id)
+    return with_cookie(Response(payload.body, media_type="application/json", headers=headers), new_session_id)
+
+
+async def current_gesture(request):
+    """?wait=N long-poll: a coroutine waits for the session's gesture listener, not a thread"""
+    session, new_session_id = await get_session(request)
+    try:
+        wait = min(float(request.query_params.get("wait", 0)), web.LONG_POLL_MAX_SECONDS)
+    except ValueError:
+        wait = 0
+    known_etag = web.gesture_registry.get(session.current_gesture).etag
+    if wait > 0 and if_none_match(request, known_etag):
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        listener = lambda gesture: loop.call_soon_threadsafe(changed.set)
+        session.add_gesture_listener(listener)
+        try:
+            if web.gesture_registry.get(session.current_gesture).etag == known_etag:
+                await asyncio.wait_for(changed.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            session.remove_gesture_listener(listener)
+    return gesture_response(request, session.current_gesture, new_session_id)
+
+
+async def analyze_frame(request):
+    session, new_session_id = await get_session(request)
+    try:
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = {}
+        data_url = payload.get("image") if isinstance(payload, dict) else None
+        if not data_url:
+            return JSONResponse({"error": "Missing image"}, status_code=400)
+        base64_data = data_url.split(",", 1)[1] if "," in data_url else data_url
+        image_rgb = await run_blocking(decode_to_rgb, np.frombuffer(base64.b64decode(base64_data), np.uint8))
+        if image_rgb is None:
+            return JSONResponse({"error": "Invalid image"}, status_code=400)
+        try:
+            detected = await analyze_rgb(image_rgb, session)
+        except InferenceQueueFull:
+            return JSONResponse({"error": "Server busy"}, status_code=503)
+        await session_call(web.update_analyze_gesture, session, detected)
+        return gesture_response(request, session.current_gesture, new_session_id)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def analyze_frame_binary(request):
+    session, new_session_id = await get_session(request)
+    try:
+        buffer = np.frombuffer(await request.body(), np.uint8)
+        if buffer.size == 0:
+            return JSONResponse({"error": "Missing image"}, status_code=400)
+        mimetype = request.headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        if mimetype.startswith("application/x-raw-"):
+            image_rgb = await run_blocking(decode_raw_to_rgb, buffer, mimetype, request.headers)
+            if image_rgb is None:
+                return JSONResponse({"error": "Invalid frame"}, status_code=400)
+        else:
+            image_rgb = await run_blocking(decode_to_rgb, buffer)
+            if image_rgb is None:
+                return JSONResponse({"error": "Invalid image"}, status_code=400)
+        try:
+            detected = await analyze_rgb(image_rgb, session)
+        except InferenceQueueFull:
+            return JSONResponse({"error": "Server busy"}, status_code=503)
+        await session_call(web.update_analyze_gesture, session, detected)
+        return gesture_response(request, session.current_gesture, new_session_id)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def gesture_stream(websocket):
+    """/ws/gesture: frames that arrive while one is analyzed replace each other, as in app.py"""
+    session, _ = await get_session(websocket)
+    await websocket.accept()
+    latest = None
+    closed = False
+    arrived = asyncio.Event()
+
+    async def receive_frames():
+        nonlocal latest, closed
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    latest = message["bytes"]
+                    arrived.set()
+        finally:
+            closed = True
+            arrived.set()
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        last_sent = session.current_gesture
+        await websocket.send_text(web.gesture_registry.get(last_sent).text)
+        while True:
+            await arrived.wait()
+            arrived.clear()
+            if closed:
+                break
+            message, latest = latest, None
+            if message is None:
+                continue
+            image_rgb = await run_blocking(decode_to_rgb, np.frombuffer(message, np.uint8))
+            if image_rgb is None:
+                continue
+            try:
+                detected = await analyze_rgb(image_rgb, session)
+            except InferenceQueueFull:
+                # Overloaded: drop this frame, the client keeps streaming newer ones
+                continue
+            await session_call(web.update_analyze_gesture, session, detected)
+            if session.current_gesture != last_sent:
+                last_sent = session.current_gesture
+                await websocket.send_text(web.gesture_registry.get(last_sent).text)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+
+async def inference_stats(request):
+    return JSONResponse(web.inference_stats_payload())
+
+
+async def prometheus_metrics(request):
+    return Response(web.prometheus_text(), headers={"Content-Type": web.PROMETHEUS_MIMETYPE})
+
+
+async def detection_stats(request):
+    session, new_session_id = await get_session(request)
+    return with_cookie(JSONResponse(web.detection_stats_payload(session)), new_session_id)
+
+
+async def serve_image(request):
+    """Same caching as app.py: in-memory variants with strong ETags, else the file from disk"""
+    filename = request.path_params["filename"]
+    cache_headers = {"Cache-Control": f"public, max-age={web.ASSET_MAX_AGE}"}
+    asset = web.asset_cache.get(filename, request.query_params.get("size", ORIGINAL),
+                                request.headers.get("accept", ""))
+    if asset is None:
+        path = os.path.realpath(os.path.join(IMAGES_DIR, filename))
+        if not path.startswith(IMAGES_DIR + os.sep) or not os.path.isfile(path):
+            return Response("Not Found", status_code=404)
+        return FileResponse(path, headers=cache_headers)
+    headers = dict(cache_headers, ETag=f'"{asset.etag}"', Vary="Accept")
+    if if_none_match(request, asset.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(asset.data, media_type=asset.mimetype, headers=headers)
+
+
+@asynccontextmanager
+async def lifespan(application):
+    global index_html
+    print("📂 Loading images...")
+    web.load_images()
+    # The page has no per-request content: render it once with Flask's templates and url_for
+    with web.app.test_request_context("/"):
+        index_html = render_template("index.html")
+    yield
+    decode_executor.shutdown(wait=False)
+
+
+def create_app():
+    return Starlette(
+        routes=[
+            Route("/", index),
+            Route("/video_feed", video_feed),
+            Route("/current_gesture", current_gesture),
+            Route("/analyze_frame", analyze_frame, methods=["POST"]),
+            Route("/analyze_frame_binary", analyze_frame_binary, methods=["POST"]),
+            WebSocketRoute("/ws/gesture", gesture_stream),
+            Route("/inference_stats", inference_stats),
+            Route("/metrics", prometheus_metrics),
+            Route("/detection_stats", detection_stats),
+            Route("/images/{filename:path}", serve_image),
+            Mount("/static", StaticFiles(directory="static"), name="static"),
+        ],
+        lifespan=lifespan,
+    )
+
+
+app = create_app() if Starlette is not None else None
+
+if __name__ == '__main__':
+    if Starlette is None:
+        raise SystemExit("❌ ASGI mode needs starlette and uvicorn: pip install starlette uvicorn")
+    print("🚀 Starting Instagram Emoji Reaction Web App (ASGI)...")
+    print(f"🌐 Open http://localhost:{PORT} in your browser")
+    uvicorn.run(app, host=HOST, port=PORT, log_level="warning")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Pre-decoded, pre-resized emotion asset cache for the web app
+Decodes every frame of every GIF once, re-encodes each asset at a few display
+sizes (optionally also as WebP/AVIF) and serves the bytes from memory with
+strong ETags. Can be built at startup or ahead of time into a cache directory:
+
+    python asset_cache.py [images_dir] [cache_dir]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+from io import BytesIO
+
+from PIL import Image, ImageSequence
+
+# Bounding boxes for each served size variant (aspect ratio is preserved)
+ASSET_VARIANTS = {"400": (400, 400), "thumb": (128, 128)}
+ORIGINAL = "original"
+
+# Pillow format name and mimetype per encoding
+FORMATS = {
+    "gif": ("GIF", "image/gif"),
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+    "avif": ("AVIF", "image/avif"),
+}
+SOURCE_FORMATS = {".gif": "gif", ".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp"}
+# Best first, when the client's Accept header allows it
+NEGOTIATED_FORMATS = ("avif", "webp")
+
+
+class CachedAsset:
+    """One encoded variant held in memory"""
+
+    __slots__ = ("data", "mimetype", "etag")
+
+    def __init__(self, data, mimetype):
+        self.data = data
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(data).hexdigest()[:20]
+
+
+def decode_frames(path):
+    """Decode every frame of an image/GIF into RGB(A) PIL images plus per-frame durations (ms)"""
+    with Image.open(path) as img:
+        frames = []
+        durations = []
+        for frame in ImageSequence.Iterator(img):
+            mode = "RGBA" if frame.mode == "RGBA" or "transparency" in frame.info else "RGB"
+            frames.append(frame.convert(mode))
+            durations.append(frame.info.get("duration", img.info.get("duration", 100)) or 100)
+    return frames, durations
+
+
+def fit_within(frame, box):
+    """Resize a frame to fit inside box, keeping its aspect ratio"""
+    scale = min(box[0] / frame.width, box[1] / frame.height)
+    size = (max(1, round(frame.width * scale)), max(1, round(frame.height * scale)))
+    return frame.resize(size, Image.LANCZOS)
+
+
+def encode_frames(frames, durations, fmt):
+    """Encode one or more frames as fmt; multi-frame only for animated formats"""
+    pil_format, _ = FORMATS[fmt]
+    out = BytesIO()
+    if fmt == "jpeg":
+        frames[0].convert("RGB").save(out, pil_format, quality=85, optimize=True, progressive=True)
+    elif len(frames) > 1 and fmt in ("gif", "webp", "avif"):
+        frames[0].save(out, pil_format, save_all=True, append_images=frames[1:],
+                       duration=durations, loop=0, **({"disposal": 2} if fmt == "gif" else {}))
+    else:
+        frames[0].save(out, pil_format, **({"quality": 80} if fmt in ("webp", "avif") else {}))
+    return out.getvalue()
+
+
+class AssetCache:
+    """In-memory store of encoded asset variants keyed by (filename, variant, format)"""
+
+    def __init__(self, images_dir="images", variants=None, reencode_formats=(), cache_dir=None):
+        self.images_dir = images_dir
+        self.variants = variants or ASSET_VARIANTS
+        self.reencode_formats = tuple(f for f in reencode_formats if f in FORMATS)
+        self.cache_dir = cache_dir
+        self._assets = {}
+        self._formats = {}  # filename -> source format
+        self._lock = threading.Lock()
+        self.ready = False
+
+    def _source_stamp(self, path):
+        """Identifies a source file and build settings; any change invalidates cached encodings"""
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size, sorted(self.variants.items()), list(self.reencode_formats)]
+
+    def build(self, filenames):
+        """Decode and encode every variant of filenames (loading fresh ones from cache_dir)"""
+        manifest = self._load_manifest()
+        for filename in filenames:
+            path = os.path.join(self.images_dir, filename)
+            fmt = SOURCE_FORMATS.get(os.path.splitext(filename)[1].lower())
+            if fmt is None or not os.path.exists(path):
+                continue
+            stamp = self._source_stamp(path)
+            entry = manifest.get(filename)
+            if entry is not None and entry["stamp"] == json.loads(json.dumps(stamp)) and self._load_entry(filename, entry):
+                self._formats[filename] = fmt
+                continue
+            try:
+                self._build_one(filename, path, fmt)
+            except Exception as e:
+                print(f"⚠️  Could not cache {filename}: {e}")
+                continue
+            manifest[filename] = self._save_entry(filename, stamp)
+        self._save_manifest(manifest)
+        self.ready = True
+
+    def _build_one(self, filename, path, fmt):
+        with open(path, "rb") as f:
+            original = f.read()
+        frames, durations = decode_frames(path)
+        assets = {(filename, ORIGINAL, fmt): CachedAsset(original, FORMATS[fmt][1])}
+        for variant, box in self.variants.items():
+            resized = [fit_within(frame, box) for frame in frames]
+            for out_fmt in dict.fromkeys((fmt,) + self.reencode_formats):
+                try:
+                    data = encode_frames(resized, durations, out_fmt)
+                except Exception:
+                    # Encoder not available in this Pillow build (e.g. AVIF); skip it
+                    continue
+                assets[(filename, variant, out_fmt)] = CachedAsset(data, FORMATS[out_fmt][1])
+        with self._lock:
+            self._assets.update(assets)
+            self._formats[filename] = fmt
+
+    def get(self, filename, variant=ORIGINAL, accept=""):
+        """Best cached encoding of filename/variant for this Accept header, or None"""
+        fmt = self._formats.get(filename)
+        if fmt is None:
+            return None
+        if variant not in self.variants:
+            variant = ORIGINAL
+        if variant != ORIGINAL:
+            for candidate in NEGOTIATED_FORMATS:
+                if candidate in self.reencode_formats and f"image/{candidate}" in accept:
+                    asset = self._assets.get((filename, variant, candidate))
+                    if asset is not None:
+                        return asset
+        return self._assets.get((filename, variant, fmt))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "assets": len(self._formats),
+                "encodings": len(self._assets),
+                "bytes": sum(len(a.data) for a in self._assets.values()),
+            }
+
+    # --- Ahead-of-time persistence ---
+
+    def _load_manifest(self):
+        if not self.cache_dir:
+            return {}
+        try:
+            with open(os.path.join(self.cache_dir, "manifest.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def _save_entry(self, filename, stamp):
+        entry = {"stamp": stamp, "files": []}
+        if not self.cache_dir:
+            return entry
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for (name, variant, fmt), asset in list(self._assets.items()):
+            if name != filename or variant == ORIGINAL:
+                continue
+            cache_name = f"{filename}.{variant}.{fmt}"
+            with open(os.path.join(self.cache_dir, cache_name), "wb") as f:
+                f.write(asset.data)
+            entry["files"].append([variant, fmt, cache_name])
+        return entry
+
+    def _load_entry(self, filename, entry):
+        fmt = SOURCE_FORMATS[os.path.splitext(filename)[1].lower()]
+        assets = {}
+        try:
+            with open(os.path.join(self.images_dir, filename), "rb") as f:
+                assets[(filename, ORIGINAL, fmt)] = CachedAsset(f.read(), FORMATS[fmt][1])
+            for variant, out_fmt, cache_name in entry["files"]:
+                with open(os.path.join(self.cache_dir, cache_name), "rb") as f:
+                    assets[(filename, variant, out_fmt)] = CachedAsset(f.read(), FORMATS[out_fmt][1])
+        except OSError:
+            return False
+        with self._lock:
+            self._assets.update(assets)
+        return True
+
+
+if __name__ == "__main__":
+    images_dir = sys.argv[1] if len(sys.argv) > 1 else "images"
+    cache_dir = sys.argv[2] if len(sys.argv) > 2 else ".asset_cache"
+    formats = [f for f in os.environ.get("ASSET_REENCODE_FORMATS", "webp").split(",") if f]
+    cache = AssetCache(images_dir, reencode_formats=formats, cache_dir=cache_dir)
+    print(f"📂 Building asset cache from {images_dir} into {cache_dir}...")
+    cache.build(sorted(os.listdir(images_dir)))
+    print(f"✅ {cache.stats()}")
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Offline batch gesture labeling over video files and image directories
+Each source (a video, or a directory of images read as consecutive frames in
+name order) is labeled by one worker process with its own Hands/FaceMesh pair
+and the shared gesture rule table. Per-frame gestures and landmarks stream to
+a part file per source, checkpointed every few hundred frames, so an interrupted
+run resumes where it stopped. Finished parts are merged into JSONL or Parquet.
+
+    python batch_label.py labels.jsonl recordings/*.mp4 frames_dir/ --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from gesture_features import extract_features
+from gesture_rules import GestureEngine, RuleState, RULE_NAMES, WEB_RULE_NAMES
+from model_planner import ModelPlanner
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# --- CONFIGURATION ---
+# Same model settings and (by default) rules as the web app, so offline labels match what it would detect
+MIN_DETECTION_CONFIDENCE = 0.6
+MIN_TRACKING_CONFIDENCE = 0.6
+HAND_HISTORY_SIZE = 8
+TONGUE_HISTORY_SIZE = 10
+CHECKPOINT_FRAMES = 300  # Flush labels and save resume state this often per source
+PROGRESS_SECONDS = 5.0
+IMAGE_SEQUENCE_FPS = 30.0  # Timestamps for image directories
+LANDMARK_DECIMALS = 5
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+# Spawn (not fork) so children never inherit MediaPipe graphs
+_context = mp.get_context("spawn")
+
+# Per-worker models and rules, created once by _init_worker
+_worker = {}
+
+
+# --- SOURCES ---
+
+def source_key(path):
+    """Stable file-name-safe id for a source, used for its part and checkpoint files"""
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+
+def image_paths(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def iter_frames(source, start=0):
+    """Yield (frame_index, timestamp_seconds, bgr_frame) from a video or image directory"""
+    if os.path.isdir(source):
+        for index, path in enumerate(image_paths(source)[start:], start):
+            frame = cv2.imread(path)
+            if frame is not None:
+                yield index, index / IMAGE_SEQUENCE_FPS, frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError(f"{source} could not be opened")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or IMAGE_SEQUENCE_FPS
+        # grab() without retrieve() skips already-labeled frames exactly, unlike seeking
+        for _ in range(start):
+            if not cap.grab():
+                return
+        index = start
+        while True:
+            success, frame = cap.read()
+            if not success:
+                return
+            yield index, index / fps, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+# --- WORKER ---
+
+def _init_worker(rules, progress):
+    import mediapipe
+
+    engine = GestureEngine(enabled=rules)
+    planner = ModelPlanner(engine.rules)
+    _worker["engine"] = engine
+    _worker["progress"] = progress
+    _worker["hands"] = mediapipe.solutions.hands.Hands(
+        min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+        min_tracking_confidence=MIN_TRACKING_CONFIDENCE,
+        max_num_hands=2
+    )
+    # Face landmarks are only worth computing when an enabled rule reads them
+    _worker["face_mesh"] = mediapipe.solutions.face_mesh.FaceMesh(
+        max_num_faces=1,
+        min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+        min_tracking_confidence=MIN_TRACKING_CONFIDENCE
+    ) if planner.uses_face else None
+
+
+def _landmark_list(array):
+    return None if array is None else np.round(array, LANDMARK_DECIMALS).tolist()
+
+
+def _save_checkpoint(path, checkpoint):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def label_source(task):
+    """Label every frame of one source into its part file; returns (source, frames, cpu_seconds)"""
+    source, part_path, checkpoint_path, checkpoint_frames = task
+    engine, progress = _worker["engine"], _worker["progress"]
+    hands, face_mesh = _worker["hands"], _worker["face_mesh"]
+
+    state = RuleState(HAND_HISTORY_SIZE, TONGUE_HISTORY_SIZE)
+    checkpoint = {"source": source, "frames": 0, "offset": 0, "done": False}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint["done"]:
+            return source, 0, 0.0
+        for name in ("left_hand_y_history", "right_hand_y_history", "tongue_x_history"):
+            getattr(state, name).extend(checkpoint.get(name, ()))
+
+    # A new source must not continue the previous source's MediaPipe track
+    hands.reset()
+    if face_mesh is not None:
+        face_mesh.reset()
+
+    started = time.process_time()
+    next_frame = checkpoint["frames"]
+    labeled = total = 0
+    with open(part_path, "a+b") as part:
+        # Drop labels written after the last checkpoint; they are recomputed
+        part.truncate(checkpoint["offset"])
+        part.seek(checkpoint["offset"])
+        for index, timestamp, frame in iter_frames(source, checkpoint["frames"]):
+            image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            image_rgb.flags.writeable = False
+            features = extract_features(hands.process(image_rgb),
+                                        face_mesh.process(image_rgb) if face_mesh is not None else None)
+            gesture = engine.evaluate(features, state)
+            record = {
+                "source": source,
+                "frame": index,
+                "time": round(timestamp, 4),
+                "gesture": gesture,
+                "rule": engine.last_rule,
+                "hands": _landmark_list(features.hands),
+                "face": _landmark_list(features.face),
+            }
+            part.write(json.dumps(record).encode("utf-8") + b"\n")
+            next_frame = index + 1
+            labeled += 1
+            total += 1
+
+            if next_frame % checkpoint_frames == 0:
+                part.flush()
+                checkpoint.update(frames=next_frame, offset=part.tell())
+                checkpoint.update({name: list(getattr(state, name)) for name in
+                                   ("left_hand_y_history", "right_hand_y_history", "tongue_x_history")})
+                _save_checkpoint(checkpoint_path, checkpoint)
+                progress.put(labeled)
+                labeled = 0
+        part.flush()
+        checkpoint.update(frames=next_frame, offset=part.tell(), done=True)
+    _save_checkpoint(checkpoint_path, checkpoint)
+    progress.put(labeled)
+    return source, total, time.process_time() - started
+
+
+# --- OUTPUT ---
+
+def parquet_schema():
+    point = pa.list_(pa.float32())
+    return pa.schema([
+        ("source", pa.string()),
+        ("frame", pa.int64()),
+        ("time", pa.float64()),
+        ("gesture", pa.string()),
+        ("rule", pa.string()),
+        ("hands", pa.list_(pa.list_(point))),
+        ("face", pa.list_(point)),
+    ])
+
+
+def merge_parts(part_paths, output_path, batch_rows=10000):
+    """Concatenate the per-source part files, in input order, into the final output"""
+    tmp_path = output_path + ".tmp"
+    if output_path.endswith(".parquet"):
+        schema = parquet_schema()
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for part_path in part_paths:
+                with open(part_path, "rb") as part:
+                    rows = []
+                    for line in part:
+                        rows.append(json.loads(line))
+                        if len(rows) >= batch_rows:
+                            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                            rows = []
+                    if rows:
+                        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    else:
+        with open(tmp_path, "wb") as out:
+            for part_path in part_paths:
+                with open(part_path, "rb") as part:
+                    shutil.copyfileobj(part, out)
+    os.replace(tmp_path, output_path)
+
+
+# --- DRIVER ---
+
+class ProgressReporter(threading.Thread):
+    """Sums frame counts reported by the workers and prints throughput periodically"""
+
+    def __init__(self, progress, workers, interval=PROGRESS_SECONDS):
+        super().__init__(daemon=True)
+        self.progress = progress
+        self.workers = workers
+        self.interval = interval
+        self.frames = 0
+        self.started = time.monotonic()
+        self._done = threading.Event()
+
+    def run(self):
+        last_report = self.started
+        while not self._done.is_set():
+            try:
+                self.frames += self.progress.get(timeout=0.5)
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if now - last_report >= self.interval:
+                last_report = now
+                print(f"⏱️  {self.frames} frames, {self.fps(now):.1f} FPS "
+                      f"({self.fps(now) / self.workers:.1f} per core)")
+
+    def fps(self, now=None):
+        elapsed = (now or time.monotonic()) - self.started
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        # Counts that arrived after the last poll
+        while True:
+            try:
+                self.frames += self.progress.get_nowait()
+            except queue.Empty:
+                break
+
+
+def collect_sources(inputs):
+    sources = []
+    for path in inputs:
+        if os.path.isdir(path) and not image_paths(path):
+            print(f"⚠️ Skipping {path}: no images")
+            continue
+        if not os.path.exists(path):
+            print(f"⚠️ Skipping {path}: not found")
+            continue
+        sources.append(path)
+    return sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Label gestures in video files and image directories")
+    parser.add_argument("output", help="labels file: .jsonl, or .parquet (needs pyarrow)")
+    parser.add_argument("inputs", nargs="+", help="video files and/or directories of frame images")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--rules", default=",".join(WEB_RULE_NAMES),
+                        help="comma-separated rule names (default: the web app's; see gesture_rules.RULE_NAMES)")
+    parser.add_argument("--checkpoint-frames", type=int, default=CHECKPOINT_FRAMES,
+                        help="frames between resume checkpoints")
+    parser.add_argument("--work-dir", help="part/checkpoint directory (default: <output>.work)")
+    parser.add_argument("--keep-work", action="store_true", help="keep part files after merging")
+    args = parser.parse_args(argv)
+
+    if args.output.endswith(".parquet") and pa is None:
+        parser.error("Parquet output needs pyarrow (pip install pyarrow)")
+    rules = [r for r in args.rules.split(",") if r]
+    unknown = set(rules) - set(RULE_NAMES)
+    if unknown:
+        parser.error(f"unknown rules: {', '.join(sorted(unknown))}")
+
+    sources = collect_sources(args.inputs)
+    if not sources:
+        parser.error("no readable inputs")
+    work_dir = args.work_dir or args.output + ".work"
+    os.makedirs(work_dir, exist_ok=True)
+    tasks = [
+        (source,
+         os.path.join(work_dir, source_key(source) + ".jsonl"),
+         os.path.join(work_dir, source_key(source) + ".ckpt"),
+         args.checkpoint_frames)
+        for source in sources
+    ]
+    workers = max(1, min(args.workers, len(tasks)))
+    print(f"🎬 Labeling {len(tasks)} source(s) with {workers} worker(s) into {args.output}")
+
+    progress = _context.Queue()
+    reporter = ProgressReporter(progress, workers)
+    reporter.start()
+    cpu_seconds = 0.0
+    failed = []
+    with _context.Pool(workers, initializer=_init_worker, initargs=(rules, progress)) as pool:
+        # Longest sources first keeps the pool busy until the end; one source per task
+        # because its frames must be labeled in order
+        ordered = sorted(tasks, key=lambda t: os.path.getsize(t[0]) if os.path.isfile(t[0]) else 0,
+                         reverse=True)
+        results = [pool.apply_async(label_source, (task,)) for task in ordered]
+        for task, result in zip(ordered, results):
+            try:
+                _, _, seconds = result.get()
+                cpu_seconds += seconds
+            except Exception as e:
+                failed.append(task[0])
+                print(f"❌ {task[0]}: {e}")
+    reporter.stop()
+    elapsed = time.monotonic() - reporter.started
+
+    if failed:
+        print(f"❌ {len(failed)} source(s) failed; rerun the same command to resume")
+        return 1
+    merge_parts([task[1] for task in tasks], args.output)
+    if not args.keep_work:
+        shutil.rmtree(work_dir)
+    frames = reporter.frames
+    print(f"✅ {frames} frames in {elapsed:.1f}s: {frames / elapsed:.1f} FPS, "
+          f"{frames / elapsed / workers:.1f} FPS per core"
+          + (f" ({frames / cpu_seconds:.1f} FPS per CPU-second in workers)" if cpu_seconds else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
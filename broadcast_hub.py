@@ -0,0 +1,170 @@
+"""
+One producer, many viewers: a latest-frame broadcast hub for MJPEG streams
+A single producer thread runs while anyone is subscribed, so the camera is opened
+and every frame captured, inferred and encoded once. Each subscriber takes the
+newest published frame whenever it is ready for one. A slow client skips frames
+instead of queueing them, and an optional per-client FPS cap paces it further.
+The producer stops once nobody has been subscribed for idle_seconds.
+subscribe_async() serves asyncio clients without a thread per connection.
+"""
+
+import asyncio
+import threading
+import time
+
+IDLE_SECONDS = 5.0  # Keep producing this long after the last viewer leaves (e.g. across a reload)
+WAIT_TIMEOUT = 1.0
+
+
+class BroadcastHub:
+    """Runs produce() on a background thread on demand and fans its latest item out to subscribers"""
+
+    def __init__(self, produce, idle_seconds=IDLE_SECONDS, name="broadcast"):
+        self.produce = produce  # Generator function; each item it yields is published
+        self.idle_seconds = idle_seconds
+        self.name = name
+        self._cond = threading.Condition()
+        self._item = None
+        self._seq = 0  # Sequence number of _item
+        self._ended_seq = -1  # _seq at which the last producer run ended
+        self._thread = None  # Current producer run
+        self._last_thread = None  # Most recent run, possibly still shutting down
+        self._subscribers = 0
+        self._idle_since = None
+        self._loop_events = {}  # Event loop -> asyncio.Event its async subscribers wait on
+        self.published = 0
+        self.delivered = 0
+        self.skipped = 0
+        self.producer_starts = 0
+
+    def subscribe(self, max_fps=0):
+        """Yield every newest item once, at most max_fps per second (0 = as fast as the client reads)"""
+        min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        last = self._add_subscriber()
+        next_due = 0.0
+        try:
+            while True:
+                if min_interval:
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_due = time.monotonic() + min_interval
+                with self._cond:
+                    while self._seq == last:
+                        self._cond.wait(WAIT_TIMEOUT)
+                    taken = self._take(last)
+                if taken is None:
+                    return
+                item, last = taken
+                yield item
+        finally:
+            self._remove_subscriber()
+
+    async def subscribe_async(self, max_fps=0):
+        """subscribe() for asyncio: waits on an event the producer sets from its thread"""
+        loop = asyncio.get_running_loop()
+        min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        last = self._add_subscriber()
+        next_due = 0.0
+        try:
+            while True:
+                if min_interval:
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    next_due = time.monotonic() + min_interval
+                while True:
+                    with self._cond:
+                        if self._seq != last:
+                            taken = self._take(last)
+                            break
+                        event = self._loop_events.get(loop)
+                        if event is None:
+                            event = self._loop_events[loop] = asyncio.Event()
+                    await event.wait()
+                if taken is None:
+                    return
+                item, last = taken
+                yield item
+        finally:
+            self._remove_subscriber()
+
+    def _add_subscriber(self):
+        with self._cond:
+            self._subscribers += 1
+            self._idle_since = None
+            if self._thread is None:
+                self._start()
+            return self._seq
+
+    def _remove_subscriber(self):
+        with self._cond:
+            self._subscribers -= 1
+            if not self._subscribers:
+                self._idle_since = time.monotonic()
+
+    def _take(self, last):
+        """(item, seq) newer than last, or None once the producer has ended; called under _cond"""
+        if self._seq == self._ended_seq:
+            return None
+        # Anything published while this client was busy is skipped
+        self.skipped += self._seq - last - 1
+        self.delivered += 1
+        return self._item, self._seq
+
+    def _publish(self, item, ended=False):
+        """Called under _cond"""
+        self._item = item
+        self._seq += 1
+        if ended:
+            self._ended_seq = self._seq
+        else:
+            self.published += 1
+        self._cond.notify_all()
+        # One wake-up per event loop, however many async subscribers it has
+        for loop, event in self._loop_events.items():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # Loop closed
+        self._loop_events = {}
+
+    def _start(self):
+        previous = self._last_thread
+        self._thread = self._last_thread = threading.Thread(
+            target=self._run, args=(previous,), name=self.name, daemon=True)
+        self.producer_starts += 1
+        self._thread.start()
+
+    def _run(self, previous):
+        if previous is not None:
+            # A run that is just stopping still holds the camera
+            previous.join()
+        items = self.produce()
+        try:
+            for item in items:
+                with self._cond:
+                    self._publish(item)
+                    idle = self._idle_since
+                    if not self._subscribers and idle is not None and time.monotonic() - idle >= self.idle_seconds:
+                        # A viewer arriving from now on starts a new run
+                        self._thread = None
+                        break
+        finally:
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    # The producer ran out (e.g. the camera failed): end every open stream
+                    self._thread = None
+                    self._publish(None, ended=True)
+            items.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self._thread is not None,
+                "subscribers": self._subscribers,
+                "published": self.published,
+                "delivered": self.delivered,
+                "skipped": self.skipped,
+                "producer_starts": self.producer_starts,
+            }
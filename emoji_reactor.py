@@ -10,14 +10,26 @@ Author: Aditya Punjani
 import cv2
 import mediapipe as mp
 import numpy as np
-from PIL import Image
 import pygame
-import os
+import threading
+from contextlib import ExitStack
+
+from gesture_features import extract_features, face_landmarks
+from gesture_rules import GestureEngine, RuleState, RULE_NAMES
+from model_planner import ModelPlanner
+from emotion_bundle import load_emotions, EMOTION_ASSETS, BUNDLE_PATH
+from animation_cache import FrameCache
+from latest_slot import LatestSlot
+from frame_pool import FramePool
+from frame_preprocess import FramePreprocessor
+from motion_gate import MotionGate
+from hand_roi import HandRoiTracker
+from landmark_recording import LandmarkRecording
+from stage_metrics import StageMetrics
 
 # --- SETUP AND INITIALIZATION ---
 
 # Initialize MediaPipe modules
-mp_pose = mp.solutions.pose
 mp_face_mesh = mp.solutions.face_mesh
 mp_hands = mp.solutions.hands
 mp_drawing = mp.solutions.drawing_utils
@@ -32,11 +44,22 @@ EMOJI_WINDOW_SIZE = (WINDOW_WIDTH, WINDOW_HEIGHT)
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 GIF_FPS = 20  # Target FPS for GIF animation (frames per second) - increased for smoother animations
+DISPLAY_FPS = 30  # Render rate of both windows, independent of inference rate
+# Models re-run only on motion, between these rates
+MOTION_THRESHOLD = 0.02  # Mean thumbnail difference (0-1) that counts as motion
+MIN_INFERENCE_HZ = 2  # Re-check a held pose at least this often
+MAX_INFERENCE_HZ = 15  # Never run the models more often than this
+FRAME_CACHE_MB = 128  # Memory budget for lazily decoded GIF frames (when no prebuilt bundle)
+# Save every inferred frame's landmarks and detected gesture for replay_bench.py (None = off)
+RECORD_LANDMARKS_PATH = None  # e.g. "session.npz"
 
 # Gesture stability settings
 GESTURE_STABILITY_FRAMES = 3  # Require gesture to be stable for this many frames
 GESTURE_COOLDOWN_FRAMES = 5  # Cooldown after gesture change
 
+# Gesture rules to evaluate; models needed only by rules removed from this set are never run
+ENABLED_RULES = set(RULE_NAMES)
+
 # Detection confidence thresholds
 MIN_DETECTION_CONFIDENCE = 0.7  # Increased for better accuracy
 MIN_TRACKING_CONFIDENCE = 0.7
@@ -80,55 +103,39 @@ def create_background_music():
     except:
         return None
 
-# Helper function to load GIF frames
-def load_gif_frames(gif_path):
-    gif = Image.open(gif_path)
-    frames = []
-    try:
-        while True:
-            frame = gif.convert('RGB')
-            frame_cv = cv2.cvtColor(np.array(frame), cv2.COLOR_RGB2BGR)
-            frame_resized = cv2.resize(frame_cv, EMOJI_WINDOW_SIZE)
-            frames.append(frame_resized)
-            gif.seek(gif.tell() + 1)
-    except EOFError:
-        pass
-    return frames
-
-# Helper function to load static images
-def load_static_image(image_path):
-    img = cv2.imread(image_path)
-    if img is None:
-        raise FileNotFoundError(f"{image_path} could not be loaded")
-    img_resized = cv2.resize(img, EMOJI_WINDOW_SIZE)
-    return img_resized
-
 # --- LOAD AND PREPARE IMAGES AND ANIMATIONS ---
 try:
-    # Load all images with emotion mappings
+    # Memory-map the prebuilt bundle (python emotion_bundle.py); if it's missing or stale,
+    # decode the still images now and each GIF lazily, when its gesture is first shown
     print("📂 Loading all emotion images...")
+    frame_cache = FrameCache(FRAME_CACHE_MB * 1024 * 1024)
+    emotion_frames, from_bundle = load_emotions(BUNDLE_PATH, EMOTION_ASSETS, EMOJI_WINDOW_SIZE, frame_cache)
+    if from_bundle:
+        print(f"📦 Mapped prebuilt bundle {BUNDLE_PATH}")
+    else:
+        print(f"⚠️  {BUNDLE_PATH} missing or stale, GIFs will decode on demand (rebuild with: python emotion_bundle.py)")
     
     # Static images
-    thumbsup_image = load_static_image("images/thumbsup.png")  # Thumbs up gesture
-    smile_image = load_static_image("images/smile.jpg")  # Happy/smiling
-    yawn_image = load_static_image("images/yawn.jpg")  # Tired/yawning
-    plain_image = load_static_image("images/plain.png")  # Neutral/default
-    job_image = load_static_image("images/job.jpg")  # Success/got job
-    nojob_image = load_static_image("images/nojob.webp")  # Sad/no job
-    cheer_image = load_static_image("images/cheer.webp")  # Cheering
-    air_image = load_static_image("images/air.jpg")  # Air/flying
-    hog_image = load_static_image("images/hog.jpeg")  # Hog rider
-    monkey_finger_mouth_image = load_static_image("images/monkey_finger_mouth.jpeg")  # Shh
-    monkey_finger_raise_image = load_static_image("images/monkey_finger_raise.jpg")  # Pointing
+    thumbsup_image = emotion_frames["THUMBS_UP"][0][0]  # Thumbs up gesture
+    smile_image = emotion_frames["SMILE"][0][0]  # Happy/smiling
+    yawn_image = emotion_frames["YAWN"][0][0]  # Tired/yawning
+    plain_image = emotion_frames["NEUTRAL"][0][0]  # Neutral/default
+    job_image = emotion_frames["JOB"][0][0]  # Success/got job
+    nojob_image = emotion_frames["NO_JOB"][0][0]  # Sad/no job
+    cheer_image = emotion_frames["PEACE"][0][0]  # Cheering
+    air_image = emotion_frames["AIR"][0][0]  # Air/flying
+    hog_image = emotion_frames["FIST"][0][0]  # Hog rider
+    monkey_finger_mouth_image = emotion_frames["MONKEY_FINGER_MOUTH"][0][0]  # Shh
+    monkey_finger_raise_image = emotion_frames["MONKEY_FINGER_RAISE"][0][0]  # Pointing
     
     # Animated GIFs - ALL GIFS NOW USED!
-    monkey_mouth_frames = load_gif_frames("images/monkey_mouth.gif")  # Tongue out
-    goblin_crying_frames = load_gif_frames("images/goblin_crying.gif")  # Crying
-    princess_frames = load_gif_frames("images/princess.gif")  # Princess waving
-    princess_kissing_frames = load_gif_frames("images/princess_kissing.gif")  # Kissing
-    pig_dance_frames = load_gif_frames("images/pig-dance-clash-royale.gif")  # Dancing
-    snap_frames = load_gif_frames("images/did-unc-snap-unc.gif")  # Snapping
-    frames_67 = load_gif_frames("images/67.gif")  # Special celebration animation
+    monkey_mouth_frames = emotion_frames["TONGUE_OUT"][0]  # Tongue out
+    goblin_crying_frames = emotion_frames["CRYING"][0]  # Crying
+    princess_frames = emotion_frames["OPEN_PALM"][0]  # Princess waving
+    princess_kissing_frames = emotion_frames["KISSING"][0]  # Kissing
+    pig_dance_frames = emotion_frames["DANCING"][0]  # Dancing
+    snap_frames = emotion_frames["CLAPPING"][0]  # Snapping
+    frames_67 = emotion_frames["VICTORY"][0]  # Special celebration animation
     
     print(f"✅ All emotion images loaded successfully!")
     print(f"   - 11 static images loaded")
@@ -220,18 +227,15 @@ print("💡 TIP #2: Or raise BOTH hands very high for 67.gif celebration! 🎉")
 # Animation tracking variables
 import time
 current_animation = "SMILE"  # Default state
-animation_frame_index = 0
+shown_animation = current_animation  # Animation the playhead belongs to
+animation_frame_index = 0  # Playhead: frames shown since shown_animation started
 last_gif_update = time.time()
 gif_frame_delay = 1.0 / GIF_FPS  # Delay between GIF frames
 
-# Tongue tracking for side-to-side detection
-tongue_x_history = []
+# Hand wave (up-down) and tongue (side-to-side) tracking for the motion rules
 TONGUE_HISTORY_SIZE = 10  # Track last 10 frames
-
-# Hand wave tracking for up-down motion detection
-left_hand_y_history = []
-right_hand_y_history = []
 HAND_HISTORY_SIZE = 8  # Track last 8 frames for wave detection
+rule_state = RuleState(HAND_HISTORY_SIZE, TONGUE_HISTORY_SIZE)
 
 # Gesture history for stability
 gesture_history = []
@@ -243,6 +247,9 @@ gesture_change_cooldown = 0
 transition_alpha = 0
 transition_active = False
 previous_frame = None
+# Per-frame outputs of the render loop (effects, blending, camera window) are written into
+# these instead of new arrays; the emotion frames themselves are read-only and never copied
+render_buffers = {}
 animation_bounce = 0
 animation_direction = 1
 frame_count = 0
@@ -263,8 +270,21 @@ def play_sound(gesture_name):
     except Exception as e:
         pass
 
+def render_buffer(name, shape):
+    """The render loop's reusable buffer for name, reallocated only when the shape changes"""
+    buffer = render_buffers.get(name)
+    if buffer is None or buffer.shape != shape:
+        buffer = render_buffers[name] = np.empty(shape, dtype=np.uint8)
+    return buffer
+
+def animation_frame(frames):
+    """Frame at the playhead; a lazily decoded GIF plays in order and wraps only once its length is known"""
+    if getattr(frames, "total", True) is None:
+        return frames[animation_frame_index]
+    return frames[animation_frame_index % len(frames)]
+
 def apply_animation_effect(frame, effect_type="bounce", intensity=1.0):
-    """Apply visual animation effects to frame"""
+    """Apply visual animation effects to frame, into the reused "effect" buffer"""
     global animation_bounce, animation_direction, frame_count
     
     frame_count += 1
@@ -278,7 +298,7 @@ def apply_animation_effect(frame, effect_type="bounce", intensity=1.0):
         # Create transform matrix for bounce
         h, w = frame.shape[:2]
         M = np.float32([[1, 0, 0], [0, 1, animation_bounce]])
-        frame = cv2.warpAffine(frame, M, (w, h))
+        frame = cv2.warpAffine(frame, M, (w, h), dst=render_buffer("effect", frame.shape))
     
     elif effect_type == "zoom":
         # Zoom pulse effect
@@ -286,7 +306,7 @@ def apply_animation_effect(frame, effect_type="bounce", intensity=1.0):
         h, w = frame.shape[:2]
         center = (w // 2, h // 2)
         M = cv2.getRotationMatrix2D(center, 0, scale)
-        frame = cv2.warpAffine(frame, M, (w, h))
+        frame = cv2.warpAffine(frame, M, (w, h), dst=render_buffer("effect", frame.shape))
     
     elif effect_type == "rotate":
         # Gentle rotation
@@ -294,13 +314,13 @@ def apply_animation_effect(frame, effect_type="bounce", intensity=1.0):
         h, w = frame.shape[:2]
         center = (w // 2, h // 2)
         M = cv2.getRotationMatrix2D(center, angle, 1.0)
-        frame = cv2.warpAffine(frame, M, (w, h))
+        frame = cv2.warpAffine(frame, M, (w, h), dst=render_buffer("effect", frame.shape))
     
     return frame
 
 def blend_frames(frame1, frame2, alpha):
-    """Smooth blend between two frames"""
-    return cv2.addWeighted(frame1, 1 - alpha, frame2, alpha, 0)
+    """Smooth blend between two frames, into the reused "blend" buffer"""
+    return cv2.addWeighted(frame1, 1 - alpha, frame2, alpha, 0, dst=render_buffer("blend", frame1.shape))
 
 def generate_beep_sound(frequency, duration_ms):
     """Generate a simple beep sound"""
@@ -348,453 +368,156 @@ if SOUND_ENABLED:
 else:
     sound_effects = {}
 
-# Helper functions for accurate hand detection
-def calculate_angle(p1, p2, p3):
-    """Calculate angle between three points"""
-    import math
-    radians = math.atan2(p3.y - p2.y, p3.x - p2.x) - math.atan2(p1.y - p2.y, p1.x - p2.x)
-    angle = abs(radians * 180.0 / math.pi)
-    if angle > 180.0:
-        angle = 360 - angle
-    return angle
-
-def calculate_distance(p1, p2):
-    """Calculate Euclidean distance between two points"""
-    return ((p1.x - p2.x)**2 + (p1.y - p2.y)**2)**0.5
-
-def is_finger_extended(tip, pip, mcp, wrist):
-    """Check if a finger is extended using angles and distances"""
-    # Finger is extended if tip is significantly higher than MCP
-    vertical_extension = tip.y < mcp.y - 0.05
-    
-    # Check if finger is straight (angle between joints)
-    angle = calculate_angle(mcp, pip, tip)
-    is_straight = angle > 140  # More than 140 degrees = straight
-    
-    # Distance from tip to wrist should be greater than MCP to wrist
-    tip_to_wrist = calculate_distance(tip, wrist)
-    mcp_to_wrist = calculate_distance(mcp, wrist)
-    is_extended_distance = tip_to_wrist > mcp_to_wrist * 1.1
-    
-    return vertical_extension and (is_straight or is_extended_distance)
-
-def is_finger_curled(tip, pip, mcp, wrist):
-    """Check if a finger is curled"""
-    # Finger is curled if tip is close to or below MCP
-    tip_below_mcp = tip.y >= mcp.y - 0.02
-    
-    # Check angle - curled finger has smaller angle
-    angle = calculate_angle(mcp, pip, tip)
-    is_bent = angle < 120  # Less than 120 degrees = bent
-    
-    # Distance check
-    tip_to_wrist = calculate_distance(tip, wrist)
-    mcp_to_wrist = calculate_distance(mcp, wrist)
-    is_close = tip_to_wrist < mcp_to_wrist * 1.2
-    
-    return tip_below_mcp or (is_bent and is_close)
-
-def get_finger_states(hand_landmarks):
-    """Get the state of all fingers (extended or curled)"""
-    # Get all landmarks
-    thumb_tip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP]
-    thumb_ip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_IP]
-    thumb_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_MCP]
-    
-    index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-    index_pip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP]
-    index_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_MCP]
-    
-    middle_tip = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-    middle_pip = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_PIP]
-    middle_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
-    
-    ring_tip = hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_TIP]
-    ring_pip = hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_PIP]
-    ring_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_MCP]
-    
-    pinky_tip = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP]
-    pinky_pip = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_PIP]
-    pinky_mcp = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_MCP]
-    
-    wrist = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
-    
-    # Check each finger
-    states = {
-        'thumb_extended': thumb_tip.y < thumb_ip.y and thumb_tip.y < wrist.y - 0.05,
-        'index_extended': is_finger_extended(index_tip, index_pip, index_mcp, wrist),
-        'middle_extended': is_finger_extended(middle_tip, middle_pip, middle_mcp, wrist),
-        'ring_extended': is_finger_extended(ring_tip, ring_pip, ring_mcp, wrist),
-        'pinky_extended': is_finger_extended(pinky_tip, pinky_pip, pinky_mcp, wrist),
-        'index_curled': is_finger_curled(index_tip, index_pip, index_mcp, wrist),
-        'middle_curled': is_finger_curled(middle_tip, middle_pip, middle_mcp, wrist),
-        'ring_curled': is_finger_curled(ring_tip, ring_pip, ring_mcp, wrist),
-        'pinky_curled': is_finger_curled(pinky_tip, pinky_pip, pinky_mcp, wrist),
-    }
-    
-    return states
-
-# Instantiate MediaPipe models with higher confidence
-with mp_pose.Pose(min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_tracking_confidence=MIN_TRACKING_CONFIDENCE) as pose, \
-     mp_face_mesh.FaceMesh(max_num_faces=1, min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_tracking_confidence=MIN_TRACKING_CONFIDENCE) as face_mesh, \
-     mp_hands.Hands(min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_tracking_confidence=MIN_TRACKING_CONFIDENCE, max_num_hands=2) as hands:
-
-    while cap.isOpened():
-        success, frame = cap.read()
+# --- PIPELINE STAGES ---
+# Capture, inference and rendering run concurrently. Each stage hands the next one only
+# its newest frame, so the slowest stage alone sets the end-to-end frame rate and the
+# animation window keeps playing at display rate while the models are busy.
+# Mirrored camera frames are pooled: each is held once by each stage, and released by the
+# stage when it is done with it or by its slot when a newer frame replaces it
+frame_pool = FramePool()
+inference_slot = LatestSlot(on_drop=frame_pool.release)
+display_slot = LatestSlot(on_drop=frame_pool.release)
+stop_event = threading.Event()
+motion_gate = MotionGate(MOTION_THRESHOLD, MIN_INFERENCE_HZ, MAX_INFERENCE_HZ)
+# Inference input: 320 wide, resized and color-converted into the inference thread's own buffers
+preprocessor = FramePreprocessor(320)
+
+def capture_loop():
+    """Read camera frames and publish the newest one to the inference and render stages"""
+    raw = None  # Only this thread touches the raw camera frame, so cap.read() refills the same array
+    while not stop_event.is_set() and cap.isOpened():
+        started = time.perf_counter()
+        success, raw = cap.read(raw)
         if not success:
             print("⚠️  Ignoring empty camera frame.")
+            raw = None
             continue
+        stage_metrics.observe("capture", time.perf_counter() - started)
+
+        # Flip the frame horizontally for a mirror-like display; both stages only read it
+        frame = cv2.flip(raw, 1, dst=frame_pool.acquire(raw.shape, holders=2))
+        inference_slot.put(frame)
+        display_slot.put(frame)
+    inference_slot.close()
+    display_slot.close()
+
+def inference_loop(face_mesh, hand_tracker):
+    """Run inference on the newest camera frame, handing each frame back to the pool afterwards"""
+    while True:
+        frame = inference_slot.get()
+        if frame is None:
+            break
+        try:
+            infer_frame(frame, face_mesh, hand_tracker)
+        finally:
+            frame_pool.release(frame)
 
-        # Flip the frame horizontally for a mirror-like display
-        frame = cv2.flip(frame, 1)
-
-        # Resize frame for faster processing
-        small_frame = cv2.resize(frame, (320, 240))
-
-        # Convert the BGR image to RGB for MediaPipe
-        image_rgb = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-        # To improve performance, mark the image as not writeable
-        image_rgb.flags.writeable = False
-
-        # --- DETECTION LOGIC ---
+def infer_frame(frame, face_mesh, hand_tracker):
+    """Run the models and gesture rules on a camera frame and update the stable gesture"""
+    global last_stable_gesture, gesture_change_cooldown, current_animation
 
-        # Process all detections first (on smaller frame for speed)
-        results_pose = pose.process(image_rgb)
-        results_hands = hands.process(image_rgb)
-        results_face = face_mesh.process(image_rgb)
+    # While the scene is still, keep the last landmarks and gesture instead of re-running the models
+    if not motion_gate.should_infer(frame):
+        return
 
-        # Default state
-        detected_state = "SMILE"  # Default to smiling
+    # Resize frame for faster processing and convert the BGR image to RGB for MediaPipe,
+    # marked not writeable so it is passed by reference
+    started = time.perf_counter()
+    image_rgb = preprocessor.to_rgb(frame)
+
+    # --- DETECTION LOGIC ---
+
+    # Run only the models the enabled rules need (on smaller frame for speed):
+    # hands first, then FaceMesh only if a face rule could fire on this frame
+    converted = time.perf_counter()
+    stage_metrics.observe("color", converted - started)
+    results_hands = hand_tracker.process(frame, image_rgb) if hand_tracker is not None else None
+    features = extract_features(results_hands)
+    hands_done = time.perf_counter()
+    stage_metrics.observe("hands", hands_done - converted)
+    ran_face = face_mesh is not None and planner.need_face(features)
+    if ran_face:
+        features.set_face(face_landmarks(face_mesh.process(image_rgb)))
+        stage_metrics.observe("face", time.perf_counter() - hands_done)
+    planner.observe(features, ran_face)
+
+    # GESTURE DETECTION PRIORITY (highest to lowest): the shared rule table, evaluated in
+    # one short-circuiting pass over the frame's features
+    rules_started = time.perf_counter()
+    detected_state = gesture_engine.evaluate(features, rule_state)
+    stage_metrics.observe("rules", time.perf_counter() - rules_started)
+    if recording is not None:
+        recording.append(time.monotonic(), features, detected_state)
+    if gesture_engine.last_rule == "WAVE":
+        print("🌊 Wave detected!")
+
+    # Apply gesture stability - only change if gesture is stable
+    gesture_history.append(detected_state)
+    if len(gesture_history) > GESTURE_HISTORY_SIZE:
+        gesture_history.pop(0)
+    
+    # Check if gesture is stable (same for multiple frames)
+    if len(gesture_history) >= GESTURE_HISTORY_SIZE:
+        if all(g == detected_state for g in gesture_history):
+            if detected_state != last_stable_gesture and gesture_change_cooldown <= 0:
+                # Gesture changed - play sound
+                play_sound(detected_state)
+                last_stable_gesture = detected_state
+                gesture_change_cooldown = GESTURE_COOLDOWN_FRAMES
+                print(f"✅ {detected_state} detected!")
+    
+    # Decrease cooldown
+    if gesture_change_cooldown > 0:
+        gesture_change_cooldown -= 1
+    
+    current_animation = last_stable_gesture
+
+# Instantiate only the MediaPipe models the enabled rules need, with higher confidence
+gesture_engine = GestureEngine(enabled=ENABLED_RULES)
+planner = ModelPlanner(gesture_engine.rules)
+stage_metrics = StageMetrics()
+recording = LandmarkRecording({"source": "emoji_reactor", "rules": sorted(ENABLED_RULES)}) \
+    if RECORD_LANDMARKS_PATH else None
+print(f"🧠 Models in use: {planner.describe()}")
+with ExitStack() as models:
+    hand_tracker = face_mesh = None
+    if planner.uses_hands:
+        # Full-frame detection at 320x240, then crops around the hands from the full-resolution frame
+        hands, roi_hands = (models.enter_context(mp_hands.Hands(min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_tracking_confidence=MIN_TRACKING_CONFIDENCE, max_num_hands=2))
+                            for _ in range(2))
+        hand_tracker = HandRoiTracker(hands, roi_hands, detect_size=(320, 240))
+    if planner.uses_face:
+        face_mesh = models.enter_context(mp_face_mesh.FaceMesh(max_num_faces=1, min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_tracking_confidence=MIN_TRACKING_CONFIDENCE))
+
+    capture_thread = threading.Thread(target=capture_loop, daemon=True)
+    inference_thread = threading.Thread(target=inference_loop, args=(face_mesh, hand_tracker), daemon=True)
+    capture_thread.start()
+    inference_thread.start()
+
+    # Render stage (main thread: OpenCV windows must be driven from here)
+    camera_frame = None
+    while True:
+        frame = display_slot.get(timeout=1.0 / DISPLAY_FPS)
+        if frame is not None:
+            if camera_frame is not None:
+                frame_pool.release(camera_frame)
+            camera_frame = frame
+        elif display_slot.closed:
+            break
+        if camera_frame is None:
+            cv2.waitKey(1)
+            continue
+        composite_started = time.perf_counter()
 
-        # GESTURE DETECTION PRIORITY (highest to lowest)
-        # Enhanced detection with better hand tracking
-        
-        # Track hand movement for additional gestures
-        hand_movement_x = 0
-        hand_movement_y = 0
-        if results_hands.multi_hand_landmarks and len(results_hands.multi_hand_landmarks) > 0:
-            wrist = results_hands.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.WRIST]
-            hand_movement_x = wrist.x
-            hand_movement_y = wrist.y
-        
-        # 1. Check for thumbs up gesture (HIGHLY ACCURATE)
-        if results_hands.multi_hand_landmarks:
-            for hand_landmarks in results_hands.multi_hand_landmarks:
-                finger_states = get_finger_states(hand_landmarks)
-                thumb_tip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP]
-                wrist = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
-                
-                # Thumbs up: ONLY thumb extended, all other fingers curled
-                thumb_up = finger_states['thumb_extended'] and thumb_tip.y < wrist.y - 0.1
-                all_fingers_curled = (finger_states['index_curled'] and 
-                                     finger_states['middle_curled'] and 
-                                     finger_states['ring_curled'] and 
-                                     finger_states['pinky_curled'])
-                
-                if thumb_up and all_fingers_curled:
-                    detected_state = "THUMBS_UP"
-                    break
-        
-        # 2. Check for WAVE MOTION FIRST - Both hands open palms moving up and down (67.gif)
-        # This must be checked BEFORE single open palm to avoid false detection
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-            if len(results_hands.multi_hand_landmarks) >= 2:
-                # Get finger states for both hands
-                hand1_states = get_finger_states(results_hands.multi_hand_landmarks[0])
-                hand2_states = get_finger_states(results_hands.multi_hand_landmarks[1])
-                
-                # Check if both hands have open palms (all fingers extended)
-                hand1_open = (hand1_states['index_extended'] and 
-                            hand1_states['middle_extended'] and 
-                            hand1_states['ring_extended'] and 
-                            hand1_states['pinky_extended'])
-                hand2_open = (hand2_states['index_extended'] and 
-                            hand2_states['middle_extended'] and 
-                            hand2_states['ring_extended'] and 
-                            hand2_states['pinky_extended'])
-                
-                if hand1_open and hand2_open:
-                    # Track hand positions over time
-                    wrist1 = results_hands.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.WRIST]
-                    wrist2 = results_hands.multi_hand_landmarks[1].landmark[mp_hands.HandLandmark.WRIST]
-                    
-                    # Determine which is left and which is right based on x position
-                    if wrist1.x < wrist2.x:
-                        left_wrist = wrist1
-                        right_wrist = wrist2
-                    else:
-                        left_wrist = wrist2
-                        right_wrist = wrist1
-                    
-                    # Add to history
-                    left_hand_y_history.append(left_wrist.y)
-                    right_hand_y_history.append(right_wrist.y)
-                    
-                    # Keep history size limited
-                    if len(left_hand_y_history) > HAND_HISTORY_SIZE:
-                        left_hand_y_history.pop(0)
-                    if len(right_hand_y_history) > HAND_HISTORY_SIZE:
-                        right_hand_y_history.pop(0)
-                    
-                    # Check for up-down movement (wave motion) - EASIER THRESHOLD
-                    if len(left_hand_y_history) >= HAND_HISTORY_SIZE:
-                        # Calculate vertical movement range
-                        left_y_min = min(left_hand_y_history)
-                        left_y_max = max(left_hand_y_history)
-                        left_y_range = left_y_max - left_y_min
-                        
-                        right_y_min = min(right_hand_y_history)
-                        right_y_max = max(right_hand_y_history)
-                        right_y_range = right_y_max - right_y_min
-                        
-                        # Both hands moving up and down significantly (made easier)
-                        both_waving = (left_y_range > 0.06 and right_y_range > 0.06)
-                        
-                        if both_waving:
-                            detected_state = "VICTORY"  # Triggers 67.gif
-                            print(f"🌊 Wave detected! L:{left_y_range:.3f} R:{right_y_range:.3f}")
-                else:
-                    # Clear history if hands are not open
-                    left_hand_y_history.clear()
-                    right_hand_y_history.clear()
-        
-        # 3. Check for peace sign (V sign) - HIGHLY ACCURATE
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-            for hand_landmarks in results_hands.multi_hand_landmarks:
-                finger_states = get_finger_states(hand_landmarks)
-                index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-                middle_tip = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-                
-                # Peace sign: ONLY index and middle extended, others curled, fingers spread apart
-                peace_fingers = (finger_states['index_extended'] and 
-                               finger_states['middle_extended'])
-                other_fingers_down = (finger_states['ring_curled'] and 
-                                    finger_states['pinky_curled'])
-                fingers_spread = calculate_distance(index_tip, middle_tip) > 0.05
-                
-                if peace_fingers and other_fingers_down and fingers_spread:
-                    detected_state = "PEACE"
-                    break
-        
-        # 4. Check for open palm (all fingers extended) - HIGHLY ACCURATE
-        # Only check for SINGLE hand open palm (if two hands, wave motion checked above)
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-            if len(results_hands.multi_hand_landmarks) == 1:  # ONLY single hand
-                hand_landmarks = results_hands.multi_hand_landmarks[0]
-                finger_states = get_finger_states(hand_landmarks)
-                index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-                pinky_tip = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP]
-                
-                # Open palm: ALL fingers extended and spread
-                all_extended = (finger_states['index_extended'] and 
-                              finger_states['middle_extended'] and 
-                              finger_states['ring_extended'] and 
-                              finger_states['pinky_extended'])
-                fingers_spread = calculate_distance(index_tip, pinky_tip) > 0.15
-                
-                if all_extended and fingers_spread:
-                    detected_state = "OPEN_PALM"
-        
-        # 5. Check for fist (all fingers curled) - HIGHLY ACCURATE
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-            for hand_landmarks in results_hands.multi_hand_landmarks:
-                finger_states = get_finger_states(hand_landmarks)
-                
-                # Fist: ALL fingers curled tightly
-                all_curled = (finger_states['index_curled'] and 
-                            finger_states['middle_curled'] and 
-                            finger_states['ring_curled'] and 
-                            finger_states['pinky_curled'])
-                thumb_not_extended = not finger_states['thumb_extended']
-                
-                if all_curled and thumb_not_extended:
-                    detected_state = "FIST"
-                    break
-        
-        # 6. Check for finger to mouth gesture (shh)
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks and results_face.multi_face_landmarks:
-            for hand_landmarks in results_hands.multi_hand_landmarks:
-                index_finger_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-                face_landmarks = results_face.multi_face_landmarks[0]
-                mouth_top = face_landmarks.landmark[13]
-                mouth_bottom = face_landmarks.landmark[14]
-                mouth_center_x = (mouth_top.x + mouth_bottom.x) / 2
-                mouth_center_y = (mouth_top.y + mouth_bottom.y) / 2
-                distance = ((index_finger_tip.x - mouth_center_x)**2 + (index_finger_tip.y - mouth_center_y)**2)**0.5
-                
-                if distance < 0.15:
-                    detected_state = "MONKEY_FINGER_MOUTH"
-                    break
-
-        # 7. Check for raised finger gesture (pointing) - HIGHLY ACCURATE
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-            for hand_landmarks in results_hands.multi_hand_landmarks:
-                finger_states = get_finger_states(hand_landmarks)
-                
-                # Pointing: ONLY index finger extended, all others curled
-                index_only = (finger_states['index_extended'] and 
-                            finger_states['middle_curled'] and 
-                            finger_states['ring_curled'] and 
-                            finger_states['pinky_curled'])
-                
-                if index_only:
-                    detected_state = "MONKEY_FINGER_RAISE"
-                    break
-
-        # 8. Check for mouth wide open (yawning) - HIGHLY ACCURATE
-        if detected_state == "SMILE" and results_face.multi_face_landmarks:
-            face_landmarks = results_face.multi_face_landmarks[0]
-            upper_lip = face_landmarks.landmark[13]
-            lower_lip = face_landmarks.landmark[14]
-            mouth_left = face_landmarks.landmark[61]
-            mouth_right = face_landmarks.landmark[291]
-            
-            # Calculate mouth aspect ratio
-            mouth_height = calculate_distance(upper_lip, lower_lip)
-            mouth_width = calculate_distance(mouth_left, mouth_right)
-            mouth_aspect_ratio = mouth_height / (mouth_width + 0.001)
-            
-            # Yawn: mouth is very open (high aspect ratio)
-            if mouth_aspect_ratio > 0.5:
-                detected_state = "YAWN"
-        
-        # 9. Check for covering face (crying gesture)
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks and results_face.multi_face_landmarks:
-            face_landmarks = results_face.multi_face_landmarks[0]
-            nose = face_landmarks.landmark[1]
-            
-            for hand_landmarks in results_hands.multi_hand_landmarks:
-                palm_center = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
-                distance_to_face = ((palm_center.x - nose.x)**2 + (palm_center.y - nose.y)**2)**0.5
-                
-                if distance_to_face < 0.15:
-                    detected_state = "CRYING"
-                    break
-        
-        # 10. Check for kissing gesture (puckered lips near hand)
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks and results_face.multi_face_landmarks:
-            face_landmarks = results_face.multi_face_landmarks[0]
-            mouth_top = face_landmarks.landmark[13]
-            mouth_bottom = face_landmarks.landmark[14]
-            mouth_center_x = (mouth_top.x + mouth_bottom.x) / 2
-            mouth_center_y = (mouth_top.y + mouth_bottom.y) / 2
-            mouth_height = abs(mouth_top.y - mouth_bottom.y)
-            
-            for hand_landmarks in results_hands.multi_hand_landmarks:
-                index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-                distance = ((index_tip.x - mouth_center_x)**2 + (index_tip.y - mouth_center_y)**2)**0.5
-                
-                # Hand near mouth
-                # Blow kiss - hand moves from mouth outward
-                if distance < 0.25 and distance > 0.12:
-                    detected_state = "KISSING"
-                    break
-        
-        # 11. Check for both hands up (dancing)
-        if detected_state == "SMILE":
-            # Option 1: Both hands raised to middle of screen or higher
-            if results_hands.multi_hand_landmarks:
-                num_hands = len(results_hands.multi_hand_landmarks)
-
-                if num_hands >= 2:
-                    # Get both hands' positions
-                    hand_y_positions = []
-                    for hand_landmarks in results_hands.multi_hand_landmarks:
-                        wrist = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
-                        hand_y_positions.append(wrist.y)
-
-                    # Check if both hands are raised (easier)
-                    both_hands_up = all(y < 0.6 for y in hand_y_positions)
-
-                    if both_hands_up:
-                        detected_state = "DANCING"
-        
-        # 12. Check for clapping motion (hands moving together)
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-            if len(results_hands.multi_hand_landmarks) >= 2:
-                hand1_center = results_hands.multi_hand_landmarks[0].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
-                hand2_center = results_hands.multi_hand_landmarks[1].landmark[mp_hands.HandLandmark.MIDDLE_FINGER_MCP]
-                hands_distance = abs(hand1_center.x - hand2_center.x)
-                
-                # Hands close together (clapping)
-                if hands_distance < 0.15:
-                    detected_state = "CLAPPING"
-        
-        # 13. Check for static victory pose (both hands raised high in V shape)
-        if detected_state == "SMILE" and results_hands.multi_hand_landmarks:
-            if len(results_hands.multi_hand_landmarks) >= 2:
-                hand_y_positions = []
-                for hand_landmarks in results_hands.multi_hand_landmarks:
-                    index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-                    hand_y_positions.append(index_tip.y)
-                
-                # Both hands very high (static victory pose)
-                if all(y < 0.35 for y in hand_y_positions):
-                    detected_state = "VICTORY"
-
-            # 14. Tongue out with side-to-side movement
-            if detected_state == "SMILE" and results_face.multi_face_landmarks:
-                face_landmarks = results_face.multi_face_landmarks[0]
-
-                # Get mouth landmarks - check if mouth is open and detect horizontal movement
-                # Using lips landmarks to detect mouth opening
-                upper_lip = face_landmarks.landmark[13]
-                lower_lip = face_landmarks.landmark[14]
-                mouth_left = face_landmarks.landmark[61]
-                mouth_right = face_landmarks.landmark[291]
-
-                # Calculate mouth opening (vertical distance)
-                mouth_height = abs(upper_lip.y - lower_lip.y)
-
-                # Calculate mouth horizontal center
-                mouth_center_x = (mouth_left.x + mouth_right.x) / 2
-
-                # Track tongue position (approximated by mouth opening position)
-                if mouth_height > 0.02:  # Mouth is open
-                    tongue_x_history.append(mouth_center_x)
-                    if len(tongue_x_history) > TONGUE_HISTORY_SIZE:
-                        tongue_x_history.pop(0)
-
-                    # Check for side-to-side movement
-                    if len(tongue_x_history) >= TONGUE_HISTORY_SIZE:
-                        x_min = min(tongue_x_history)
-                        x_max = max(tongue_x_history)
-                        x_range = x_max - x_min
-
-                        # If there's horizontal movement
-                        if x_range > 0.01:
-                            detected_state = "TONGUE_OUT"
-                else:
-                    # Clear history if mouth is closed
-                    tongue_x_history.clear()
-
-        # Apply gesture stability - only change if gesture is stable
-        gesture_history.append(detected_state)
-        if len(gesture_history) > GESTURE_HISTORY_SIZE:
-            gesture_history.pop(0)
-        
-        # Check if gesture is stable (same for multiple frames)
-        if len(gesture_history) >= GESTURE_HISTORY_SIZE:
-            if all(g == detected_state for g in gesture_history):
-                if detected_state != last_stable_gesture and gesture_change_cooldown <= 0:
-                    # Gesture changed - play sound
-                    play_sound(detected_state)
-                    last_stable_gesture = detected_state
-                    gesture_change_cooldown = GESTURE_COOLDOWN_FRAMES
-                    print(f"✅ {detected_state} detected!")
-        
-        # Decrease cooldown
-        if gesture_change_cooldown > 0:
-            gesture_change_cooldown -= 1
-        
-        current_animation = last_stable_gesture
-        
         # --- DISPLAY LOGIC ---
 
-        # Control GIF frame rate
+        # Control GIF frame rate; a newly shown animation starts from its first frame
         current_time = time.time()
-        if current_time - last_gif_update >= gif_frame_delay:
+        if current_animation != shown_animation:
+            shown_animation = current_animation
+            animation_frame_index = 0
+            last_gif_update = current_time
+        elif current_time - last_gif_update >= gif_frame_delay:
             animation_frame_index += 1
             last_gif_update = current_time
 
@@ -802,64 +525,64 @@ with mp_pose.Pose(min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_trackin
         effect_type = "none"
         
         if current_animation == "THUMBS_UP":
-            display_frame = thumbsup_image.copy()
+            display_frame = thumbsup_image
             state_name = "👍 Thumbs Up - Success!"
             effect_type = "zoom"
         elif current_animation == "PEACE":
-            display_frame = cheer_image.copy()
+            display_frame = cheer_image
             state_name = "✌️ Peace Sign - Cheering!"
             effect_type = "bounce"
         elif current_animation == "OPEN_PALM":
-            display_frame = princess_frames[animation_frame_index % len(princess_frames)].copy()
+            display_frame = animation_frame(princess_frames)
             state_name = "👋 Open Palm - Waving!"
             effect_type = "none"  # GIF already animated
         elif current_animation == "FIST":
-            display_frame = hog_image.copy()
+            display_frame = hog_image
             state_name = "✊ Fist - Hog Rider!"
             effect_type = "rotate"
         elif current_animation == "MONKEY_FINGER_MOUTH":
-            display_frame = monkey_finger_mouth_image.copy()
+            display_frame = monkey_finger_mouth_image
             state_name = "🤫 Shh... Quiet!"
             effect_type = "none"
         elif current_animation == "MONKEY_FINGER_RAISE":
-            display_frame = monkey_finger_raise_image.copy()
+            display_frame = monkey_finger_raise_image
             state_name = "☝️ Pointing Up!"
             effect_type = "bounce"
         elif current_animation == "YAWN":
-            display_frame = yawn_image.copy()
+            display_frame = yawn_image
             state_name = "😮 Yawning - Tired!"
             effect_type = "none"
         elif current_animation == "CRYING":
-            display_frame = goblin_crying_frames[animation_frame_index % len(goblin_crying_frames)].copy()
+            display_frame = animation_frame(goblin_crying_frames)
             state_name = "😢 Crying - Sad!"
             effect_type = "none"  # GIF already animated
         elif current_animation == "KISSING":
-            display_frame = princess_kissing_frames[animation_frame_index % len(princess_kissing_frames)].copy()
+            display_frame = animation_frame(princess_kissing_frames)
             state_name = "💋 Blowing Kiss!"
             effect_type = "none"  # GIF already animated
         elif current_animation == "DANCING":
-            display_frame = pig_dance_frames[animation_frame_index % len(pig_dance_frames)].copy()
+            display_frame = animation_frame(pig_dance_frames)
             state_name = "🕺 Dancing - Party!"
             effect_type = "none"  # GIF already animated
         elif current_animation == "CLAPPING":
-            display_frame = snap_frames[animation_frame_index % len(snap_frames)].copy()
+            display_frame = animation_frame(snap_frames)
             state_name = "👏 Clapping - Snap!"
             effect_type = "none"  # GIF already animated
         elif current_animation == "VICTORY":
-            display_frame = frames_67[animation_frame_index % len(frames_67)].copy()
+            display_frame = animation_frame(frames_67)
             state_name = "🎉 Victory - Celebration!"
             effect_type = "none"  # GIF already animated
         elif current_animation == "TONGUE_OUT":
-            display_frame = monkey_mouth_frames[animation_frame_index % len(monkey_mouth_frames)].copy()
+            display_frame = animation_frame(monkey_mouth_frames)
             state_name = "👅 Tongue Out!"
             effect_type = "none"  # GIF already animated
         elif current_animation == "SMILE":
-            display_frame = smile_image.copy()
+            display_frame = smile_image
             state_name = "😊 Smiling - Happy!"
             effect_type = "zoom"
         else:
             # Default fallback
-            display_frame = plain_image.copy()
+            display_frame = plain_image
             state_name = "😐 Neutral"
             effect_type = "none"
         
@@ -873,11 +596,16 @@ with mp_pose.Pose(min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_trackin
             display_frame = blend_frames(previous_frame, display_frame, transition_alpha)
             if transition_alpha >= 1.0:
                 transition_active = False
+        elif display_frame.flags.writeable:
+            # Effect output is overwritten next frame: keep a copy in a buffer of its own
+            previous_frame = render_buffer("previous", display_frame.shape)
+            np.copyto(previous_frame, display_frame)
         else:
-            previous_frame = display_frame.copy()
+            previous_frame = display_frame
 
-        # Resize camera frame to match window size
-        camera_frame_resized = cv2.resize(frame, (WINDOW_WIDTH, WINDOW_HEIGHT))
+        # Resize camera frame to match window size (the shared camera frame itself is never drawn on)
+        camera_frame_resized = cv2.resize(camera_frame, (WINDOW_WIDTH, WINDOW_HEIGHT),
+                                          dst=render_buffer("camera", (WINDOW_HEIGHT, WINDOW_WIDTH, 3)))
 
         # Add enhanced status text with background
         text = f'STATE: {state_name}'
@@ -890,8 +618,8 @@ with mp_pose.Pose(min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_trackin
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2, cv2.LINE_AA)
 
         # Add instructions text with background
-        instructions = ['Press "q" to quit', 'Try different gestures!']
-        y_offset = WINDOW_HEIGHT - 50
+        instructions = ['Press "q" to quit', 'Try different gestures!', f'Inference: {motion_gate.inference_fps():.1f} fps']
+        y_offset = WINDOW_HEIGHT - 75
         for instruction in instructions:
             text_size = cv2.getTextSize(instruction, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
             cv2.rectangle(camera_frame_resized, (5, y_offset - 20), (text_size[0] + 15, y_offset + 5), (0, 0, 0), -1)
@@ -900,13 +628,38 @@ with mp_pose.Pose(min_detection_confidence=MIN_DETECTION_CONFIDENCE, min_trackin
             y_offset += 25
 
         # Display the camera feed and animation
+        display_started = time.perf_counter()
+        stage_metrics.observe("composite", display_started - composite_started)
         cv2.imshow('Camera Feed', camera_frame_resized)
         cv2.imshow('Animation Output', display_frame)
 
         # Exit loop if 'q' is pressed (increased wait time for smoother video)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
+        key = cv2.waitKey(1) & 0xFF
+        stage_metrics.observe("display", time.perf_counter() - display_started)
+        if key == ord('q'):
             break
 
+    # Stop capture first; inference drains and exits before the models are closed
+    stop_event.set()
+    inference_slot.close()
+    display_slot.close()
+    inference_thread.join()
+    capture_thread.join(timeout=1.0)
+    print(f"📊 Inference skipped {inference_slot.dropped} stale camera frames")
+    print(f"📊 Inference ran on {motion_gate.inferred} frames, skipped {motion_gate.skipped_still} still "
+          f"and {motion_gate.skipped_throttled} over the {MAX_INFERENCE_HZ} Hz cap")
+    print(f"📊 FaceMesh ran on {planner.face_runs} frames, skipped {planner.face_skips}")
+    print("📊 Rules (hits/calls, mean µs): " + ", ".join(
+        f"{name} {r['hits']}/{r['calls']} {r['mean_us']}" for name, r in gesture_engine.stats().items() if r["calls"]))
+    if hand_tracker is not None:
+        print(f"📊 Hands: {hand_tracker.stats()}")
+    print(f"📊 Camera frame buffers: {frame_pool.stats()}")
+    for line in stage_metrics.report():
+        print(f"⏱️  {line}")
+    if recording is not None:
+        recording.save(RECORD_LANDMARKS_PATH)
+        print(f"📼 Saved {len(recording)} frames of landmarks to {RECORD_LANDMARKS_PATH}")
+
 # --- CLEANUP ---
 print("👋 Shutting down...")
 if BACKGROUND_MUSIC_ENABLED:
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Ahead-of-time emotion asset bundle for the desktop emoji reactor
+Every emotion image/GIF is decoded, converted to BGR and resized to the display
+size once, then written into a single file that the runtime memory-maps:
+
+    magic (8 bytes) | header length (uint64 LE) | JSON header | padding | frames
+
+The JSON header maps each gesture to its first frame index, frame count and
+per-frame durations (ms), and records the source file stamps and display size
+so a stale bundle is detected and the regular loaders are used instead.
+Frames are contiguous uint8 arrays of shape (height, width, 3), page aligned.
+
+    python emotion_bundle.py [bundle_path]
+"""
+
+import json
+import os
+import struct
+import sys
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from animation_cache import LazyAnimation
+
+BUNDLE_MAGIC = b"S7HEMOJ1"
+BUNDLE_VERSION = 1
+BUNDLE_PATH = "emotions.bundle"
+DISPLAY_SIZE = (720, 450)  # (width, height) of the animation window
+PAGE_SIZE = 4096
+
+# Gesture -> source image shown for it (plus the extra reactions the app preloads)
+EMOTION_ASSETS = {
+    "THUMBS_UP": "images/thumbsup.png",
+    "SMILE": "images/smile.jpg",
+    "YAWN": "images/yawn.jpg",
+    "NEUTRAL": "images/plain.png",
+    "JOB": "images/job.jpg",
+    "NO_JOB": "images/nojob.webp",
+    "PEACE": "images/cheer.webp",
+    "AIR": "images/air.jpg",
+    "FIST": "images/hog.jpeg",
+    "MONKEY_FINGER_MOUTH": "images/monkey_finger_mouth.jpeg",
+    "MONKEY_FINGER_RAISE": "images/monkey_finger_raise.jpg",
+    "TONGUE_OUT": "images/monkey_mouth.gif",
+    "CRYING": "images/goblin_crying.gif",
+    "OPEN_PALM": "images/princess.gif",
+    "KISSING": "images/princess_kissing.gif",
+    "DANCING": "images/pig-dance-clash-royale.gif",
+    "CLAPPING": "images/did-unc-snap-unc.gif",
+    "VICTORY": "images/67.gif",
+}
+
+
+# --- DECODERS ---
+
+def load_gif_frames(gif_path, size=DISPLAY_SIZE):
+    """Decode every GIF frame to a resized BGR array, plus per-frame durations (ms)"""
+    gif = Image.open(gif_path)
+    frames = []
+    durations = []
+    try:
+        while True:
+            frame = gif.convert('RGB')
+            frame_cv = cv2.cvtColor(np.array(frame), cv2.COLOR_RGB2BGR)
+            frames.append(cv2.resize(frame_cv, size))
+            durations.append(gif.info.get("duration", 100) or 100)
+            gif.seek(gif.tell() + 1)
+    except EOFError:
+        pass
+    return frames, durations
+
+
+def load_static_image(image_path, size=DISPLAY_SIZE):
+    """Load a still image as a resized BGR array"""
+    img = cv2.imread(image_path)
+    if img is None:
+        raise FileNotFoundError(f"{image_path} could not be loaded")
+    return cv2.resize(img, size)
+
+
+def decode_assets(assets=EMOTION_ASSETS, size=DISPLAY_SIZE):
+    """Decode every asset with the regular loaders: gesture -> (frames, durations)"""
+    decoded = {}
+    for gesture, path in assets.items():
+        if path.lower().endswith(".gif"):
+            decoded[gesture] = load_gif_frames(path, size)
+        else:
+            decoded[gesture] = ([load_static_image(path, size)], [0])
+        # Read-only like the bundle's mapped frames, so the display can show them without copying
+        for frame in decoded[gesture][0]:
+            frame.flags.writeable = False
+    return decoded
+
+
+# --- BUNDLE FILE ---
+
+def _source_stamps(assets):
+    stamps = {}
+    for path in assets.values():
+        stat = os.stat(path)
+        stamps[path] = [stat.st_mtime_ns, stat.st_size]
+    return stamps
+
+
+def build_bundle(bundle_path=BUNDLE_PATH, assets=EMOTION_ASSETS, size=DISPLAY_SIZE):
+    """Decode all assets and write them into a bundle file (atomically replaced)"""
+    stamps = _source_stamps(assets)
+    decoded = decode_assets(assets, size)
+    index = {}
+    frame_count = 0
+    for gesture, (frames, durations) in decoded.items():
+        index[gesture] = {
+            "source": assets[gesture],
+            "start": frame_count,
+            "count": len(frames),
+            "durations": durations,
+        }
+        frame_count += len(frames)
+
+    header = {
+        "version": BUNDLE_VERSION,
+        "size": list(size),
+        "frame_count": frame_count,
+        "sources": stamps,
+        "assets": index,
+    }
+    # data_offset depends on the header length, which includes data_offset itself
+    header["data_offset"] = 0
+    while True:
+        encoded = json.dumps(header).encode("utf-8")
+        data_offset = -(-(len(BUNDLE_MAGIC) + 8 + len(encoded)) // PAGE_SIZE) * PAGE_SIZE
+        if data_offset == header["data_offset"]:
+            break
+        header["data_offset"] = data_offset
+
+    tmp_path = bundle_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(BUNDLE_MAGIC)
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        f.write(b"\0" * (data_offset - f.tell()))
+        for gesture in index:
+            for frame in decoded[gesture][0]:
+                f.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+    os.replace(tmp_path, bundle_path)
+    return header
+
+
+def read_header(bundle_path):
+    """Parse a bundle's JSON header, or None if the file is missing or not a bundle"""
+    try:
+        with open(bundle_path, "rb") as f:
+            if f.read(len(BUNDLE_MAGIC)) != BUNDLE_MAGIC:
+                return None
+            (length,) = struct.unpack("<Q", f.read(8))
+            return json.loads(f.read(length).decode("utf-8"))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def is_stale(header, assets=EMOTION_ASSETS, size=DISPLAY_SIZE):
+    """True if the bundle no longer matches the asset table, source files or display size"""
+    if header is None or header.get("version") != BUNDLE_VERSION or header.get("size") != list(size):
+        return True
+    if {g: entry["source"] for g, entry in header["assets"].items()} != dict(assets):
+        return True
+    try:
+        return header["sources"] != _source_stamps(assets)
+    except OSError:
+        return True
+
+
+def open_bundle(bundle_path=BUNDLE_PATH, assets=EMOTION_ASSETS, size=DISPLAY_SIZE):
+    """Memory-map a fresh bundle: gesture -> (frames array, durations); None if missing/stale
+
+    Each frames array is a read-only (count, height, width, 3) view into the
+    page cache; nothing is decoded or copied until a frame is touched.
+    """
+    header = read_header(bundle_path)
+    if is_stale(header, assets, size):
+        return None
+    width, height = size
+    frames = np.memmap(bundle_path, dtype=np.uint8, mode="r", offset=header["data_offset"],
+                       shape=(header["frame_count"], height, width, 3))
+    return {
+        gesture: (frames[entry["start"]:entry["start"] + entry["count"]], entry["durations"])
+        for gesture, entry in header["assets"].items()
+    }
+
+
+def load_emotions(bundle_path=BUNDLE_PATH, assets=EMOTION_ASSETS, size=DISPLAY_SIZE, frame_cache=None):
+    """Frames for every gesture from the bundle, falling back to decoding the images
+
+    Without a bundle and with a frame_cache, GIFs become LazyAnimations that
+    decode only once shown; still images are always decoded up front.
+    Returns (gesture -> (frames, durations), from_bundle).
+    """
+    bundle = open_bundle(bundle_path, assets, size)
+    if bundle is not None:
+        return bundle, True
+    if frame_cache is None:
+        return decode_assets(assets, size), False
+    still = {g: p for g, p in assets.items() if not p.lower().endswith(".gif")}
+    emotions = decode_assets(still, size)
+    for gesture, path in assets.items():
+        if gesture not in still:
+            animation = LazyAnimation(path, size, frame_cache)
+            emotions[gesture] = (animation, animation.durations)
+    return emotions, False
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else BUNDLE_PATH
+    print(f"📦 Building emotion bundle {path}...")
+    built = build_bundle(path)
+    print(f"✅ {len(built['assets'])} assets, {built['frame_count']} frames, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB")
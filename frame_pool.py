@@ -0,0 +1,64 @@
+"""
+Recycled frame buffers for handing frames between pipeline threads
+Each buffer carries an explicit holder count: the producer acquires it for the
+number of consumers it hands the frame to, and every holder (a LatestSlot
+dropping a stale frame, or a consumer done with it) releases it once. At zero
+the buffer goes back to the free list, so the capture thread can write each
+new frame in place without allocating in steady state, and never into a frame
+another stage is still reading.
+"""
+
+import threading
+
+import numpy as np
+
+MAX_BUFFERS = 6  # Enough for capture + both slots + both consumers holding a frame
+
+
+class FramePool:
+    """Hands out same-shaped uint8 buffers and takes them back once every holder has released them"""
+
+    def __init__(self, max_buffers=MAX_BUFFERS):
+        self.max_buffers = max_buffers
+        self._holders = {}  # id(buffer) -> [buffer, holder count] for pooled buffers
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+        self.overflow = 0  # Buffers handed out untracked because every pooled one was in use
+
+    def acquire(self, shape, holders=1):
+        """A writable buffer of shape that holders will each release(); its contents are stale"""
+        with self._lock:
+            while self._free:
+                buffer = self._free.pop()
+                if buffer.shape == shape:
+                    self.reused += 1
+                    self._holders[id(buffer)][1] = holders
+                    return buffer
+                # Resolution changed: drop the old-sized buffer
+                del self._holders[id(buffer)]
+            buffer = np.empty(shape, dtype=np.uint8)
+            if len(self._holders) < self.max_buffers:
+                self._holders[id(buffer)] = [buffer, holders]
+                self.allocated += 1
+            else:
+                self.overflow += 1
+            return buffer
+
+    def release(self, buffer):
+        """Give up one hold on a buffer from acquire(); the last release returns it to the pool"""
+        with self._lock:
+            entry = self._holders.get(id(buffer))
+            if entry is None or entry[0] is not buffer:
+                return  # Untracked overflow buffer: left to the garbage collector
+            if entry[1] <= 0:
+                raise RuntimeError("frame buffer released more often than it was acquired")
+            entry[1] -= 1
+            if not entry[1]:
+                self._free.append(buffer)
+
+    def stats(self):
+        with self._lock:
+            return {"buffers": len(self._holders), "free": len(self._free), "allocated": self.allocated,
+                    "reused": self.reused, "overflow": self.overflow}
@@ -0,0 +1,117 @@
+"""
+Preprocessing fast path between incoming frames and the MediaPipe models
+JPEG uploads wider than the inference width are decoded directly at 1/2, 1/4 or
+1/8 scale (libjpeg DCT scaling via IMREAD_REDUCED_COLOR_*), so the full image is
+never materialized. Remaining downscaling and the BGR->RGB conversion write into
+per-thread preallocated buffers. The RGB image is marked non-writeable so
+MediaPipe wraps it instead of copying.
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+INFERENCE_MAX_WIDTH = 640  # Frames are fed to the models at most this wide (0 = native size)
+# Reduced-scale decode flags, largest reduction first
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                        (2, cv2.IMREAD_REDUCED_COLOR_2), (1, cv2.IMREAD_COLOR))
+# JPEG start-of-frame markers (baseline, extended, progressive, lossless...) carry the image size
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG's header, or None if data is not a readable JPEG"""
+    data = memoryview(data).cast("B")
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1  # Fill byte
+            continue
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7:
+            i += 2  # Markers without a length
+            continue
+        if marker in _SOF_MARKERS:
+            height = data[i + 5] << 8 | data[i + 6]
+            width = data[i + 7] << 8 | data[i + 8]
+            return width, height
+        i += 2 + (data[i + 2] << 8 | data[i + 3])
+    return None
+
+
+def decode_scale(width, max_width):
+    """Largest libjpeg reduction (8, 4, 2 or 1) that keeps the decoded width at least max_width"""
+    if max_width:
+        for scale, flag in REDUCED_DECODE_FLAGS:
+            if width // scale >= max_width:
+                return scale, flag
+    return 1, cv2.IMREAD_COLOR
+
+
+def _interpolation(width, target_width):
+    # Under 2x (what is left after a reduced decode) bilinear is much cheaper than
+    # INTER_AREA at non-integer ratios and aliases no worse
+    return cv2.INTER_LINEAR if width < 2 * target_width else cv2.INTER_AREA
+
+
+class FramePreprocessor:
+    """Decode/downscale/color-convert frames for inference, reusing buffers per thread
+
+    With reuse_buffers the RGB image returned is overwritten by the next call on
+    the same thread, so callers must be done with it (inference finished) first.
+    """
+
+    def __init__(self, max_width=INFERENCE_MAX_WIDTH, reuse_buffers=True):
+        self.max_width = max_width
+        self.reuse_buffers = reuse_buffers
+        self._local = threading.local()
+
+    def target_size(self, width, height):
+        """(w, h) a width x height frame is fed to the models at"""
+        if not self.max_width or width <= self.max_width:
+            return width, height
+        return self.max_width, max(1, round(height * self.max_width / width))
+
+    def decode(self, buffer):
+        """Decode an encoded image (uint8 array) to BGR, at reduced scale for large JPEGs; None if invalid"""
+        size = jpeg_size(buffer) if self.max_width else None
+        flag = decode_scale(size[0], self.max_width)[1] if size else cv2.IMREAD_COLOR
+        return cv2.imdecode(buffer, flag)
+
+    def to_rgb(self, image_bgr):
+        """Downscaled, non-writeable RGB copy of a BGR frame for the models"""
+        height, width = image_bgr.shape[:2]
+        size = self.target_size(width, height)
+        if size != (width, height):
+            image_bgr = cv2.resize(image_bgr, size, dst=self._buffer("resized", size, 3),
+                                   interpolation=_interpolation(width, size[0]))
+        image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB, dst=self._buffer("rgb", size, 3))
+        image_rgb.flags.writeable = False
+        return image_rgb
+
+    def fit_rgb(self, image_rgb):
+        """Downscale an already-RGB frame (e.g. a raw upload) and mark it non-writeable"""
+        height, width = image_rgb.shape[:2]
+        size = self.target_size(width, height)
+        if size != (width, height):
+            image_rgb = cv2.resize(image_rgb, size, dst=self._buffer("rgb", size, 3),
+                                   interpolation=_interpolation(width, size[0]))
+        image_rgb.flags.writeable = False
+        return image_rgb
+
+    def _buffer(self, name, size, channels):
+        """This thread's buffer for name at size, reallocated only when the size changes"""
+        shape = (size[1], size[0], channels)
+        if not self.reuse_buffers:
+            return np.empty(shape, dtype=np.uint8)
+        buffers = self._local.__dict__
+        buffer = buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = buffers[name] = np.empty(shape, dtype=np.uint8)
+        buffer.flags.writeable = True
+        return buffer
@@ -11,10 +11,13 @@ function LiveDetector() {
   const mediaStreamRef = useRef(null)
   const fpsCounterRef = useRef({ frames: 0, last: Date.now() })
   const pollTimerRef = useRef(null)
+  const socketRef = useRef(null)
 
   useEffect(() => {
     // Poll backend for current gesture
     const poll = async () => {
+      // Gesture changes are pushed over the WebSocket while it is open
+      if (socketRef.current?.readyState === WebSocket.OPEN) return
       try {
         const res = await fetch('/api/current_gesture')
         if (!res.ok) return
@@ -23,7 +26,7 @@ function LiveDetector() {
           name: data.name,
           description: data.description,
           emoji: data.name?.split(' ')[0] || '👋',
-          image: `/api/images/${data.image}`,
+          image: `/api/images/${data.image}?size=400`,
           isGif: data.image?.toLowerCase().endsWith('.gif'),
           caption: data.description,
           confidence: 95
@@ -81,45 +84,76 @@ function LiveDetector() {
     // When using browser webcam, periodically capture frames and send to backend for analysis
     if (USE_BACKEND) return
     let interval
+    let socket = null
+    const canvas = document.createElement('canvas')
+
+    const showGesture = (data) => {
+      const mapped = {
+        name: data.name,
+        description: data.description,
+        emoji: data.name?.split(' ')[0] || '👋',
+        image: `/api/images/${data.image}?size=400`,
+        isGif: data.image?.toLowerCase().endsWith('.gif'),
+        caption: data.description,
+        confidence: 95
+      }
+      setCurrentGesture(mapped)
+      setGestureCount((c) => c + 1)
+    }
+
     const sendFrame = async () => {
       const video = videoRef.current
       if (!video || video.readyState < 2) return
+      const viaSocket = socket?.readyState === WebSocket.OPEN
+      // Backpressure: skip this frame if the previous one hasn't left the socket yet
+      if (viaSocket && socket.bufferedAmount > 0) return
       const width = video.videoWidth || 640
       const height = video.videoHeight || 480
-      const canvas = document.createElement('canvas')
       canvas.width = width
       canvas.height = height
       const ctx = canvas.getContext('2d')
       ctx.drawImage(video, 0, 0, width, height)
-      const dataUrl = canvas.toDataURL('image/jpeg', 0.7)
+      // Raw JPEG bytes to the binary endpoint: no base64 data URL, no JSON wrapper
+      const blob = await new Promise((resolve) => canvas.toBlob(resolve, 'image/jpeg', 0.7))
+      if (!blob) return
+      if (viaSocket) {
+        socket.send(blob)
+        return
+      }
       try {
-        const res = await fetch('/api/analyze_frame', {
+        const res = await fetch('/api/analyze_frame_binary', {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ image: dataUrl })
+          headers: { 'Content-Type': 'image/jpeg' },
+          body: blob
         })
         if (!res.ok) return
-        const data = await res.json()
-        const mapped = {
-          name: data.name,
-          description: data.description,
-          emoji: data.name?.split(' ')[0] || '👋',
-          image: `/api/images/${data.image}`,
-          isGif: data.image?.toLowerCase().endsWith('.gif'),
-          caption: data.description,
-          confidence: 95
-        }
-        setCurrentGesture(mapped)
-        setGestureCount((c) => c + 1)
+        showGesture(await res.json())
       } catch (e) {
         // ignore network errors between frames
       }
     }
 
     if (isLive) {
+      // Persistent channel: frames go up, the server pushes only gesture changes.
+      // Falls back to HTTP posts if the socket can't be opened.
+      try {
+        const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws'
+        socket = new WebSocket(`${scheme}://${window.location.host}/api/ws/gesture`)
+        socket.binaryType = 'arraybuffer'
+        socket.onmessage = (event) => {
+          if (typeof event.data === 'string') showGesture(JSON.parse(event.data))
+        }
+        socketRef.current = socket
+      } catch (e) {
+        socket = null
+      }
       interval = setInterval(sendFrame, 400)
     }
-    return () => interval && clearInterval(interval)
+    return () => {
+      interval && clearInterval(interval)
+      if (socket) socket.close()
+      socketRef.current = null
+    }
   }, [isLive])
 
   const startCamera = () => setIsLive(true)
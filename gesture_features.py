@@ -0,0 +1,146 @@
+"""
+Vectorized landmark feature extraction shared by app.py and emoji_reactor.py
+Packs MediaPipe hand and face results into float32 arrays once per frame and
+computes every finger extension/curl, distance and angle predicate in batched NumPy
+"""
+
+import numpy as np
+
+# --- LANDMARK INDICES ---
+# MediaPipe hand landmark ids (same values as mp.solutions.hands.HandLandmark)
+HAND_LANDMARK_COUNT = 21
+WRIST = 0
+THUMB_IP = 3
+THUMB_TIP = 4
+INDEX_FINGER_TIP = 8
+MIDDLE_FINGER_MCP = 9
+MIDDLE_FINGER_TIP = 12
+PINKY_TIP = 20
+
+# Index, middle, ring and pinky (the thumb is handled separately)
+FINGER_TIPS = np.array([8, 12, 16, 20])
+FINGER_PIPS = np.array([6, 10, 14, 18])
+FINGER_MCPS = np.array([5, 9, 13, 17])
+INDEX, MIDDLE, RING, PINKY = range(4)
+
+# Face mesh landmarks used by the gesture rules, packed in this order
+FACE_LANDMARK_IDS = (1, 13, 14, 61, 291)
+NOSE, UPPER_LIP, LOWER_LIP, MOUTH_LEFT, MOUTH_RIGHT = range(len(FACE_LANDMARK_IDS))
+
+# --- PREDICATE THRESHOLDS ---
+EXTENDED_RISE = 0.05  # Tip must be this far above the MCP to count as extended
+EXTENDED_ANGLE = 140  # More than 140 degrees = straight
+EXTENDED_REACH = 1.1  # Tip-to-wrist vs MCP-to-wrist ratio for an extended finger
+CURLED_DROP = 0.02  # Tip at or below MCP (with this slack) counts as curled
+CURLED_ANGLE = 120  # Less than 120 degrees = bent
+CURLED_REACH = 1.2  # Tip-to-wrist vs MCP-to-wrist ratio for a curled finger
+THUMB_RISE = 0.05  # Thumb tip must be this far above the wrist to count as extended
+
+
+def landmarks_to_array(multi_landmarks, ids=None):
+    """Pack a list of MediaPipe landmark lists into an (n, k, 3) float32 array"""
+    count = HAND_LANDMARK_COUNT if ids is None else len(ids)
+    if not multi_landmarks:
+        return np.empty((0, count, 3), dtype=np.float32)
+
+    coords = []
+    for landmarks in multi_landmarks:
+        points = landmarks.landmark
+        if ids is not None:
+            points = [points[i] for i in ids]
+        for p in points:
+            coords.extend((p.x, p.y, p.z))
+    return np.array(coords, dtype=np.float32).reshape(len(multi_landmarks), count, 3)
+
+
+class FrameFeatures:
+    """Per-frame landmark arrays plus every predicate the gesture rules read"""
+
+    def __init__(self, hands, face=None, hand_scores=None):
+        # hands: (num_hands, 21, 3) float32, face: (len(FACE_LANDMARK_IDS), 3) float32 or None
+        self.hands = hands
+        self.num_hands = len(hands)
+        # Per-hand detection confidence (MediaPipe handedness score), None when unknown (e.g. replays)
+        self.hand_scores = hand_scores
+
+        xy = hands[..., :2]
+        self.wrists = xy[:, WRIST]
+        tips = xy[:, FINGER_TIPS]
+        pips = xy[:, FINGER_PIPS]
+        mcps = xy[:, FINGER_MCPS]
+
+        # Angle at the PIP joint between MCP and tip, folded into [0, 180]
+        to_tip = tips - pips
+        to_mcp = mcps - pips
+        radians = np.arctan2(to_tip[..., 1], to_tip[..., 0]) - np.arctan2(to_mcp[..., 1], to_mcp[..., 0])
+        angles = np.abs(np.degrees(radians))
+        self.finger_angles = np.where(angles > 180.0, 360.0 - angles, angles)
+
+        wrists = self.wrists[:, None, :]
+        tip_to_wrist = np.linalg.norm(tips - wrists, axis=-1)
+        mcp_to_wrist = np.linalg.norm(mcps - wrists, axis=-1)
+        tip_y = tips[..., 1]
+        mcp_y = mcps[..., 1]
+
+        # (num_hands, 4) boolean arrays in INDEX, MIDDLE, RING, PINKY order
+        self.extended = (tip_y < mcp_y - EXTENDED_RISE) & (
+            (self.finger_angles > EXTENDED_ANGLE) | (tip_to_wrist > mcp_to_wrist * EXTENDED_REACH))
+        self.curled = (tip_y >= mcp_y - CURLED_DROP) | (
+            (self.finger_angles < CURLED_ANGLE) & (tip_to_wrist < mcp_to_wrist * CURLED_REACH))
+
+        thumb_tip_y = hands[:, THUMB_TIP, 1]
+        self.thumb_extended = (thumb_tip_y < hands[:, THUMB_IP, 1]) & (thumb_tip_y < self.wrists[:, 1] - THUMB_RISE)
+        self.thumb_rise = self.wrists[:, 1] - thumb_tip_y
+
+        self.index_middle_spread = np.linalg.norm(tips[:, INDEX] - tips[:, MIDDLE], axis=-1)
+        self.index_pinky_spread = np.linalg.norm(tips[:, INDEX] - tips[:, PINKY], axis=-1)
+        self.palm_centers = xy[:, MIDDLE_FINGER_MCP]
+        self.index_tips = tips[:, INDEX]
+
+        self.set_face(face)
+
+    def set_face(self, face):
+        """Attach face landmarks (or None) and compute the face and hand-to-face predicates"""
+        self.face = face
+        self.has_face = face is not None
+        if self.has_face:
+            upper_lip = face[UPPER_LIP, :2]
+            lower_lip = face[LOWER_LIP, :2]
+            mouth_left = face[MOUTH_LEFT, :2]
+            mouth_right = face[MOUTH_RIGHT, :2]
+            mouth_center = (upper_lip + lower_lip) / 2
+
+            mouth_gap = float(np.linalg.norm(upper_lip - lower_lip))
+            mouth_width = float(np.linalg.norm(mouth_left - mouth_right))
+            self.nose = face[NOSE, :2]
+            self.mouth_aspect_ratio = mouth_gap / (mouth_width + 0.001)
+            self.mouth_height = abs(float(upper_lip[1] - lower_lip[1]))
+            self.mouth_center_x = float(mouth_left[0] + mouth_right[0]) / 2
+            self.index_to_mouth = np.linalg.norm(self.index_tips - mouth_center, axis=-1)
+            self.palm_to_nose = np.linalg.norm(self.palm_centers - self.nose, axis=-1)
+
+    @property
+    def all_extended(self):
+        """Per-hand: index, middle, ring and pinky all extended"""
+        return self.extended.all(axis=1)
+
+    @property
+    def all_curled(self):
+        """Per-hand: index, middle, ring and pinky all curled"""
+        return self.curled.all(axis=1)
+
+
+def face_landmarks(results_face):
+    """Pack the first face of a FaceMesh result, or None if there is none"""
+    if results_face is None or not results_face.multi_face_landmarks:
+        return None
+    return landmarks_to_array(results_face.multi_face_landmarks[:1], FACE_LANDMARK_IDS)[0]
+
+
+def extract_features(results_hands, results_face=None):
+    """Build FrameFeatures from MediaPipe Hands/FaceMesh results"""
+    hands = landmarks_to_array(results_hands.multi_hand_landmarks if results_hands else None)
+    scores = None
+    if results_hands and results_hands.multi_handedness:
+        scores = np.array([h.classification[0].score for h in results_hands.multi_handedness], dtype=np.float32)
+    return FrameFeatures(hands, face_landmarks(results_face), scores)
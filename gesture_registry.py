@@ -0,0 +1,97 @@
+"""
+Immutable gesture metadata with pre-serialized JSON responses
+Each gesture's /current_gesture payload is built, serialized and hashed once. Polls
+and analyze responses send the stored bytes, and strong ETags let unchanged polls
+end in 304 Not Modified.
+"""
+
+import hashlib
+import json
+import threading
+from types import MappingProxyType
+
+FALLBACK_IMAGE = "smile.jpg"
+
+# gesture -> (display name, description, image under images/)
+GESTURE_INFO = {
+    "THUMBS_UP": ("👍 Thumbs Up", "Success!", "thumbsup.png"),
+    "PEACE": ("✌️ Peace Sign", "Cheering!", "cheer.webp"),
+    "OPEN_PALM": ("👋 Open Palm", "Waving!", "princess.gif"),
+    "FIST": ("✊ Fist", "Power!", "hog.jpeg"),
+    "MONKEY_FINGER_MOUTH": ("🤫 Shh Monkey", "Finger to lips — shhh.", "monkey_finger_mouth.jpeg"),
+    "MONKEY_FINGER_RAISE": ("☝️ Pointing", "Look up!", "monkey_finger_raise.jpg"),
+    "YAWN": ("😮 Yawning", "Tired!", "yawn.jpg"),
+    "CRYING": ("😢 Goblin Tears", "Covering face — crying emote.", "goblin_crying.gif"),
+    "KISSING": ("💋 Kissing", "Love!", "princess_kissing.gif"),
+    "DANCING": ("🕺 Dancing", "Party!", "pig-dance-clash-royale.gif"),
+    "TONGUE_OUT": ("👅 Tongue Out Chaos", "Mouth open + tongue movement.", "monkey_mouth.gif"),
+    "CLAPPING": ("👏 Clapping", "Applause!", "did-unc-snap-unc.gif"),
+    "VICTORY": ("🎉 Victory", "Celebration!", "67.gif"),
+    "SMILE": ("😊 Smiling", "Happy!", "smile.jpg"),
+}
+
+# Text drawn on /video_feed frames; other gestures show their key
+OVERLAY_TEXT = {
+    "THUMBS_UP": "👍 Thumbs Up",
+    "PEACE": "✌️ Peace Sign",
+    "OPEN_PALM": "👋 Open Palm",
+    "FIST": "✊ Fist",
+    "MONKEY_FINGER_MOUTH": "🤫 Shh",
+    "MONKEY_FINGER_RAISE": "☝️ Pointing",
+    "YAWN": "😮 Yawning",
+    "VICTORY": "🎉 Victory!",
+    "SMILE": "😊 Smiling",
+}
+
+
+class GesturePayload:
+    """One gesture's metadata and its ready-to-send JSON body"""
+
+    __slots__ = ("gesture", "name", "description", "image", "overlay", "body", "text", "etag")
+
+    def __init__(self, gesture, name, description, image, overlay):
+        self.gesture = gesture
+        self.name = name
+        self.description = description
+        self.image = image
+        self.overlay = overlay
+        # Same JSON as jsonify: sorted keys, ASCII-escaped
+        self.text = json.dumps(self.as_dict(), sort_keys=True, separators=(",", ":"))
+        self.body = self.text.encode()
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+
+    def __setattr__(self, name, value):
+        if hasattr(self, "etag"):
+            raise AttributeError("GesturePayload is immutable")
+        object.__setattr__(self, name, value)
+
+    def as_dict(self):
+        return {"gesture": self.gesture, "name": self.name, "description": self.description, "image": self.image}
+
+
+class GestureRegistry:
+    """Read-only gesture -> GesturePayload lookup, built once"""
+
+    def __init__(self, info=GESTURE_INFO, overlay_text=OVERLAY_TEXT, fallback_image=FALLBACK_IMAGE):
+        self.fallback_image = fallback_image
+        self._overlay_text = dict(overlay_text)
+        self._payloads = MappingProxyType({
+            gesture: GesturePayload(gesture, name, description, image, self._overlay_text.get(gesture, gesture))
+            for gesture, (name, description, image) in info.items()
+        })
+        # Gestures without metadata (e.g. newly added rules) get a generic payload, built on first use
+        self._unknown = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, gesture):
+        return gesture in self._payloads
+
+    def get(self, gesture):
+        payload = self._payloads.get(gesture) or self._unknown.get(gesture)
+        if payload is None:
+            with self._lock:
+                payload = self._unknown.get(gesture)
+                if payload is None:
+                    payload = self._unknown[gesture] = GesturePayload(
+                        gesture, gesture, "", self.fallback_image, self._overlay_text.get(gesture, gesture))
+        return payload
@@ -0,0 +1,240 @@
+"""
+Declarative gesture rule table shared by app.py and emoji_reactor.py
+Each rule declares its priority, the landmark sources it reads, how many hands
+it needs and a predicate over the frame's FrameFeatures. GestureEngine compiles
+the enabled rules once into a priority-ordered list of cheap gates + predicates
+and evaluates a frame in one short-circuiting pass, with per-rule timing.
+"""
+
+import time
+
+from gesture_features import INDEX, MIDDLE, RING, PINKY
+from rolling_window import RollingWindow
+
+DEFAULT_GESTURE = "SMILE"
+
+# Motion rules: minimum travel over their history window (normalized image units)
+WAVE_MIN_RANGE = 0.06  # Up/down travel of each wrist
+TONGUE_MIN_RANGE = 0.01  # Side-to-side travel of the mouth center
+
+# Landmark sources a rule can read
+HANDS = "hands"
+FACE = "face"
+POSE = "pose"
+
+
+class RuleState:
+    """Motion histories the stateful rules (wave, tongue) keep between frames
+
+    Any object with these RollingWindows works, e.g. a web GestureSession.
+    """
+
+    def __init__(self, hand_history_size=8, tongue_history_size=10):
+        self.left_hand_y_history = RollingWindow(hand_history_size)
+        self.right_hand_y_history = RollingWindow(hand_history_size)
+        self.tongue_x_history = RollingWindow(tongue_history_size)
+
+
+class GestureRule:
+    """One prioritized gesture rule"""
+
+    __slots__ = ("name", "gesture", "priority", "predicate", "sources", "min_hands", "exact_hands", "at_face")
+
+    def __init__(self, name, gesture, priority, predicate, sources=(HANDS,), min_hands=1, exact_hands=None,
+                 at_face=False):
+        self.name = name
+        self.gesture = gesture
+        self.priority = priority
+        self.predicate = predicate  # (features, state) -> bool
+        self.sources = tuple(sources)
+        self.min_hands = min_hands
+        self.exact_hands = exact_hands
+        self.at_face = at_face  # Can only fire with a hand at the face (lets the planner skip FaceMesh)
+
+
+# --- PREDICATES ---
+
+def _thumbs_up(f, state):
+    # Only the thumb extended (and clearly up), all other fingers curled
+    thumb_up = f.thumb_extended & (f.thumb_rise > 0.1)
+    return bool((thumb_up & f.all_curled).any())
+
+
+def _wave(f, state):
+    # Both palms open and moving up and down
+    left_history = state.left_hand_y_history
+    right_history = state.right_hand_y_history
+    if not (f.extended[0].all() and f.extended[1].all()):
+        left_history.clear()
+        right_history.clear()
+        return False
+    wrist1, wrist2 = f.wrists[0], f.wrists[1]
+    left_wrist, right_wrist = (wrist1, wrist2) if wrist1[0] < wrist2[0] else (wrist2, wrist1)
+    left_history.append(float(left_wrist[1]))
+    right_history.append(float(right_wrist[1]))
+    return (left_history.full and left_history.range() > WAVE_MIN_RANGE
+            and right_history.range() > WAVE_MIN_RANGE)
+
+
+def _peace(f, state):
+    # Only index and middle extended and spread apart
+    extended, curled = f.extended, f.curled
+    peace = (extended[:, INDEX] & extended[:, MIDDLE] & curled[:, RING] & curled[:, PINKY]
+             & (f.index_middle_spread > 0.05))
+    return bool(peace.any())
+
+
+def _open_palm(f, state):
+    return bool(f.all_extended[0] and f.index_pinky_spread[0] > 0.15)
+
+
+def _fist(f, state):
+    return bool((f.all_curled & ~f.thumb_extended).any())
+
+
+def _finger_to_mouth(f, state):
+    return bool((f.index_to_mouth < 0.15).any())
+
+
+def _pointing(f, state):
+    # Only the index finger extended
+    extended, curled = f.extended, f.curled
+    return bool((extended[:, INDEX] & curled[:, MIDDLE] & curled[:, RING] & curled[:, PINKY]).any())
+
+
+def _yawn(f, state):
+    return f.mouth_aspect_ratio > 0.5
+
+
+def _crying(f, state):
+    return bool((f.palm_to_nose < 0.15).any())
+
+
+def _kissing(f, state):
+    distance = f.index_to_mouth
+    return bool(((distance < 0.25) & (distance > 0.12)).any())
+
+
+def _dancing(f, state):
+    # Both hands raised to the middle of the screen or higher
+    return bool((f.wrists[:, 1] < 0.6).all())
+
+
+def _clapping(f, state):
+    return abs(f.palm_centers[0, 0] - f.palm_centers[1, 0]) < 0.15
+
+
+def _victory(f, state):
+    # Both hands very high
+    return bool((f.index_tips[:, 1] < 0.35).all())
+
+
+def _tongue_out(f, state):
+    # Open mouth moving side to side (tracked by the mouth center)
+    history = state.tongue_x_history
+    if f.mouth_height <= 0.02:
+        history.clear()
+        return False
+    history.append(f.mouth_center_x)
+    return history.full and history.range() > TONGUE_MIN_RANGE
+
+
+# --- RULE TABLE ---
+# Lower priority fires first. TONGUE_OUT keeps requiring a visible hand, as the
+# original desktop rule chain only checked it when hands were present.
+GESTURE_RULES = (
+    GestureRule("THUMBS_UP", "THUMBS_UP", 1, _thumbs_up),
+    GestureRule("WAVE", "VICTORY", 2, _wave, min_hands=2),
+    GestureRule("PEACE", "PEACE", 3, _peace),
+    GestureRule("OPEN_PALM", "OPEN_PALM", 4, _open_palm, exact_hands=1),
+    GestureRule("FIST", "FIST", 5, _fist),
+    GestureRule("MONKEY_FINGER_MOUTH", "MONKEY_FINGER_MOUTH", 6, _finger_to_mouth, sources=(HANDS, FACE), at_face=True),
+    GestureRule("MONKEY_FINGER_RAISE", "MONKEY_FINGER_RAISE", 7, _pointing),
+    GestureRule("YAWN", "YAWN", 8, _yawn, sources=(FACE,), min_hands=0),
+    GestureRule("CRYING", "CRYING", 9, _crying, sources=(HANDS, FACE), at_face=True),
+    GestureRule("KISSING", "KISSING", 10, _kissing, sources=(HANDS, FACE), at_face=True),
+    GestureRule("DANCING", "DANCING", 11, _dancing, min_hands=2),
+    GestureRule("CLAPPING", "CLAPPING", 12, _clapping, min_hands=2),
+    GestureRule("VICTORY", "VICTORY", 13, _victory, min_hands=2),
+    GestureRule("TONGUE_OUT", "TONGUE_OUT", 14, _tongue_out, sources=(HANDS, FACE)),
+)
+RULE_NAMES = tuple(rule.name for rule in GESTURE_RULES)
+# The web app's default subset (app.py GESTURE_RULES); the desktop reactor enables all of them
+WEB_RULE_NAMES = ("THUMBS_UP", "WAVE", "PEACE", "OPEN_PALM", "FIST", "MONKEY_FINGER_RAISE", "YAWN")
+
+
+class GestureEngine:
+    """The enabled rules compiled into one short-circuiting, priority-ordered pass"""
+
+    def __init__(self, rules=GESTURE_RULES, enabled=None, timing=True):
+        known = {rule.name for rule in rules}
+        if enabled is not None:
+            unknown = set(enabled) - known
+            if unknown:
+                raise ValueError(f"Unknown gesture rules: {', '.join(sorted(unknown))}")
+        self.rules = sorted((r for r in rules if enabled is None or r.name in enabled), key=lambda r: r.priority)
+        # Flat tuples: the per-frame loop touches no attributes beyond the features
+        self._compiled = [
+            (i, rule.gesture, rule.min_hands, rule.exact_hands, FACE in rule.sources, rule.predicate)
+            for i, rule in enumerate(self.rules)
+        ]
+        self.timing = timing
+        self._calls = [0] * len(self.rules)
+        self._hits = [0] * len(self.rules)
+        self._seconds = [0.0] * len(self.rules)
+        self.last_rule = None
+
+    def evaluate(self, features, state):
+        """Gesture of the first rule that fires on this frame, else DEFAULT_GESTURE"""
+        num_hands = features.num_hands
+        has_face = features.has_face
+        for i, gesture, min_hands, exact_hands, needs_face, predicate in self._compiled:
+            if num_hands < min_hands or (exact_hands is not None and num_hands != exact_hands):
+                continue
+            if needs_face and not has_face:
+                continue
+            if self.timing:
+                started = time.perf_counter()
+                fired = predicate(features, state)
+                self._seconds[i] += time.perf_counter() - started
+            else:
+                fired = predicate(features, state)
+            self._calls[i] += 1
+            if fired:
+                self._hits[i] += 1
+                self.last_rule = self.rules[i].name
+                return gesture
+        self.last_rule = None
+        return DEFAULT_GESTURE
+
+    def stats(self):
+        """Per-rule evaluation counts, hits and mean predicate time (µs)"""
+        return {
+            rule.name: {
+                "calls": self._calls[i],
+                "hits": self._hits[i],
+                "mean_us": round(self._seconds[i] / self._calls[i] * 1e6, 2) if self._calls[i] else 0.0,
+            }
+            for i, rule in enumerate(self.rules)
+        }
+
+
+def update_stable_gesture(state, detected, cooldown_frames):
+    """Apply one frame's detection to the stable gesture; True if it changed
+
+    A new gesture becomes current once it fills the whole gesture_history
+    window, after which changes are blocked for cooldown_frames frames.
+    state: any object with gesture_history (a bounded deque),
+    gesture_change_cooldown and current_gesture, e.g. a GestureSession.
+    """
+    history = state.gesture_history
+    history.append(detected)
+    if state.gesture_change_cooldown > 0:
+        state.gesture_change_cooldown -= 1
+        return False
+    if (len(history) == history.maxlen and all(g == detected for g in history)
+            and detected != state.current_gesture):
+        state.current_gesture = detected
+        state.gesture_change_cooldown = cooldown_frames
+        return True
+    return False
@@ -0,0 +1,151 @@
+"""
+Region-of-interest hand inference driven by the previous frame's landmarks
+Once hands are found, Hands runs on a padded crop around them taken from the
+full-resolution frame: fewer pixels than a full-frame pass, more pixels per hand.
+Landmarks are mapped back in place to full-frame normalized coordinates, so the
+feature extraction and gesture rules see the same results as before. A full-frame
+pass runs whenever the crop loses the hands, and periodically to pick up new ones.
+"""
+
+import cv2
+import numpy as np
+
+# Padding on each side, as a fraction of the hands' bounding box size. The palm detector
+# needs context: crops where the hand fills more than about a third miss it
+ROI_PADDING = 1.0
+ROI_MIN_SIDE = 96  # Smallest crop side in pixels
+ROI_FULL_FRAME_EVERY = 30  # Full-frame detection at least once every this many frames
+ROI_KEEP_MARGIN = 0.1  # Reuse the crop while the hands stay this far (of its side) inside it
+ROI_RETRY_FRAMES = 3  # Keep trying the last crop this many frames after both passes miss
+
+
+class HandRoiTracker:
+    """Wraps MediaPipe Hands with previous-landmark ROI cropping
+
+    Full frames and crops go to separate Hands instances: MediaPipe tracks in
+    the coordinates of the images it is fed, so one instance alternating
+    between the two would lose its track on every switch.
+    """
+
+    def __init__(self, hands, roi_hands, detect_size=None, padding=ROI_PADDING, min_side=ROI_MIN_SIDE,
+                 full_frame_every=ROI_FULL_FRAME_EVERY, keep_margin=ROI_KEEP_MARGIN,
+                 retry_frames=ROI_RETRY_FRAMES):
+        self.hands = hands
+        self.roi_hands = roi_hands
+        self.detect_size = detect_size  # (w, h) the full-frame pass runs at, None for native size
+        self.padding = padding
+        self.min_side = min_side
+        self.full_frame_every = full_frame_every
+        self.keep_margin = keep_margin
+        self.retry_frames = retry_frames
+        self._roi = None  # (x0, y0, x1, y1) in full-frame pixels
+        self._misses = 0
+        self._since_full = 0
+        self.full_frames = 0
+        self.roi_frames = 0
+        self.track_losses = 0
+        self.roi_pixels = 0
+
+    def process(self, frame_bgr, detect_rgb=None):
+        """Hands results for a full BGR frame, normalized to that frame
+
+        detect_rgb is the RGB image for a full-frame pass (e.g. already downscaled
+        for other models); it is derived from frame_bgr when not given.
+        """
+        height, width = frame_bgr.shape[:2]
+        results = None
+        if self._roi is not None:
+            results = self._process_roi(frame_bgr, width, height)
+            if results is None:
+                self.track_losses += 1
+            elif self._since_full >= self.full_frame_every:
+                # Periodic full-frame pass to pick up new hands; it must not drop the
+                # tracked ones that are too small for low-resolution detection
+                full = self._process_full(frame_bgr, detect_rgb)
+                if len(full.multi_hand_landmarks or ()) > len(results.multi_hand_landmarks):
+                    results = full
+        if results is None:
+            results = self._process_full(frame_bgr, detect_rgb)
+        self._update_roi(results, width, height)
+        return results
+
+    def _process_full(self, frame_bgr, detect_rgb):
+        if detect_rgb is None:
+            small = cv2.resize(frame_bgr, self.detect_size) if self.detect_size else frame_bgr
+            detect_rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+            detect_rgb.flags.writeable = False
+        self.full_frames += 1
+        self._since_full = 0
+        return self.hands.process(detect_rgb)
+
+    def _process_roi(self, frame_bgr, width, height):
+        """Run Hands on the crop; None if it found no hands there"""
+        x0, y0, x1, y1 = self._roi
+        crop = frame_bgr[y0:y1, x0:x1]
+        budget = self.detect_size[0] * self.detect_size[1] if self.detect_size else width * height
+        area = crop.shape[0] * crop.shape[1]
+        if area > budget:
+            # Never spend more pixels than a full-frame pass; resizing keeps normalized coordinates
+            scale = (budget / area) ** 0.5
+            crop = cv2.resize(crop, (max(1, int(crop.shape[1] * scale)), max(1, int(crop.shape[0] * scale))),
+                              interpolation=cv2.INTER_AREA)
+        crop_rgb = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+        crop_rgb.flags.writeable = False
+        self.roi_frames += 1
+        self.roi_pixels += crop_rgb.shape[0] * crop_rgb.shape[1]
+        self._since_full += 1
+
+        results = self.roi_hands.process(crop_rgb)
+        if not results.multi_hand_landmarks:
+            return None
+        crop_w, crop_h = x1 - x0, y1 - y0
+        for hand_landmarks in results.multi_hand_landmarks:
+            for lm in hand_landmarks.landmark:
+                lm.x = (x0 + lm.x * crop_w) / width
+                lm.y = (y0 + lm.y * crop_h) / height
+                lm.z = lm.z * crop_w / width
+        return results
+
+    def _update_roi(self, results, width, height):
+        if not results.multi_hand_landmarks:
+            # Small hands can be lost for a frame and be too small for the full-frame pass
+            # to re-detect, so give the crop a few more chances first
+            self._misses += 1
+            if self._misses > self.retry_frames:
+                self._roi = None
+            return
+        self._misses = 0
+        points = np.array([(lm.x, lm.y) for hand_landmarks in results.multi_hand_landmarks
+                           for lm in hand_landmarks.landmark], dtype=np.float32) * (width, height)
+        bx0, by0 = points.min(axis=0)
+        bx1, by1 = points.max(axis=0)
+
+        if self._roi is not None:
+            # Keep the crop steady while the hands stay well inside it, so MediaPipe's own
+            # tracking (in crop coordinates) stays valid between frames
+            x0, y0, x1, y1 = self._roi
+            margin = self.keep_margin * (x1 - x0)
+            inside = bx0 >= x0 + margin and by0 >= y0 + margin and bx1 <= x1 - margin and by1 <= y1 - margin
+            # ...and have not shrunk to much less than the share of the crop they started at
+            min_fill = 0.6 / (1 + 2 * self.padding)
+            if inside and max(bx1 - bx0, by1 - by0) > min_fill * (x1 - x0):
+                return
+
+        # Square crop (hands rotate) around the hands, shifted rather than shrunk at frame edges
+        side = int(max(max(bx1 - bx0, by1 - by0) * (1 + 2 * self.padding), self.min_side))
+        if side >= min(width, height):
+            # Hands span most of the frame: cropping would save nothing
+            self._roi = None
+            return
+        cx, cy = (bx0 + bx1) / 2, (by0 + by1) / 2
+        x0 = int(min(max(cx - side / 2, 0), width - side))
+        y0 = int(min(max(cy - side / 2, 0), height - side))
+        self._roi = (x0, y0, x0 + side, y0 + side)
+
+    def stats(self):
+        return {
+            "full_frames": self.full_frames,
+            "roi_frames": self.roi_frames,
+            "track_losses": self.track_losses,
+            "avg_roi_pixels": round(self.roi_pixels / self.roi_frames) if self.roi_frames else 0,
+        }
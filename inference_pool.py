@@ -0,0 +1,300 @@
+"""
+Micro-batched inference scheduler for the web app
+Collects frames that arrive within a short window and fans them out to a pool
+of model workers, each owning its own MediaPipe Hands/FaceMesh pair.
+Sessions are pinned to one worker while active so MediaPipe stays in its
+cheap tracking mode instead of re-detecting on every interleaved frame
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from gesture_features import extract_features
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when more than max_queue_depth frames are already waiting"""
+
+
+class LatencyStats:
+    """Running count/mean/max of a latency measured in seconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self):
+        mean = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "mean_ms": round(mean * 1000, 3), "max_ms": round(self.max * 1000, 3)}
+
+
+class ModelWorker:
+    """One Hands/FaceMesh pair served by its own thread"""
+
+    mode = "thread"
+
+    def __init__(self, index, model_factory, scheduler):
+        self.index = index
+        self.inbox = queue.Queue()
+        self.outstanding = 0
+        self.pinned_sessions = 0
+        # Whose frame this instance saw last, and what it found, to tell tracking from detection
+        self.last_session = None
+        self.last_had_hands = False
+        self.last_had_face = False
+        self._model_factory = model_factory
+        self._models = None
+        self._scheduler = scheduler
+        self._thread = threading.Thread(target=self._run, name=f"inference-worker-{index}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    @property
+    def ready(self):
+        return self._models is not None
+
+    def setup(self):
+        """Create the models; runs on the worker thread before the first frame"""
+        self._models = self._model_factory()
+
+    def release(self):
+        """Free the models after the instance has been idle; setup() runs again on demand"""
+        for model in self._models:
+            model.close()
+        self._models = None
+
+    def infer(self, image_rgb):
+        """Run both models on an RGB frame and return its FrameFeatures"""
+        hands, face_mesh = self._models
+        started = time.perf_counter()
+        results_hands = hands.process(image_rgb)
+        hands_done = time.perf_counter()
+        results_face = face_mesh.process(image_rgb)
+        self._scheduler.observe_stage("hands", hands_done - started)
+        self._scheduler.observe_stage("face", time.perf_counter() - hands_done)
+        return extract_features(results_hands, results_face)
+
+    def _run(self):
+        while True:
+            try:
+                batch = self.inbox.get(timeout=self._scheduler.instance_idle_seconds)
+            except queue.Empty:
+                if self.ready:
+                    self.release()
+                    self._scheduler._record_lifecycle(self, "released")
+                continue
+            if not self.ready:
+                try:
+                    self.setup()
+                except Exception as e:
+                    print(f"⚠️  Inference worker {self.index} failed to create its models: {e}")
+                    self._fail_batch(batch, e)
+                    continue
+                self._scheduler._record_lifecycle(self, "created")
+            for image_rgb, future, enqueued_at, session_id in batch:
+                started = time.perf_counter()
+                result = None
+                try:
+                    result = self.infer(image_rgb)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+                self._scheduler._record(self, session_id, result, enqueued_at, started, time.perf_counter())
+
+    def _fail_batch(self, batch, error):
+        """Fail every frame of a batch that could not be served, freeing its queue slots and pins"""
+        for image_rgb, future, enqueued_at, session_id in batch:
+            future.set_exception(error)
+            now = time.perf_counter()
+            self._scheduler._record(self, session_id, None, enqueued_at, now, now)
+            # Let the session's next frame try a (possibly healthy) other worker
+            if session_id is not None:
+                self._scheduler.release_session(session_id)
+
+
+class InferenceScheduler:
+    """Batches incoming frames and dispatches them to a pool of model workers"""
+
+    def __init__(self, model_factory, pool_size=2, max_batch_wait=0.01, max_queue_depth=64,
+                 worker_class=ModelWorker, pin_idle_seconds=10.0, instance_idle_seconds=300.0,
+                 stage_metrics=None):
+        self.pool_size = max(1, pool_size)
+        self.max_batch_wait = max_batch_wait
+        self.max_queue_depth = max_queue_depth
+        self.pin_idle_seconds = pin_idle_seconds
+        self.instance_idle_seconds = instance_idle_seconds
+        # Optional StageMetrics fed with queue wait and per-model times
+        self.stage_metrics = stage_metrics
+        # session_id -> [worker, last_dispatch_time]
+        self._pins = {}
+        self._session_switches = 0
+        self._tracking = {"hands": [0, 0], "face": [0, 0]}  # [detection, tracking]
+        self._lifecycle = {"created": 0, "released": 0}
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._rejected = 0
+        self._batches = LatencyStats()
+        self._queue_wait = LatencyStats()
+        self._service_time = LatencyStats()
+        self._batch_items = 0
+        self.worker_class = worker_class
+        self._workers = [worker_class(i, model_factory, self) for i in range(self.pool_size)]
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="inference-dispatcher", daemon=True)
+        self._started = False
+
+    def start(self):
+        """Spawn the dispatcher and worker threads (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for worker in self._workers:
+            worker.start()
+        self._dispatcher.start()
+
+    def submit(self, image_rgb, session_id=None):
+        """Queue an RGB frame; returns a Future resolving to its FrameFeatures"""
+        self.start()
+        with self._lock:
+            if self._depth >= self.max_queue_depth:
+                self._rejected += 1
+                raise InferenceQueueFull(f"{self._depth} frames already queued")
+            self._depth += 1
+        future = Future()
+        self._pending.put((image_rgb, future, time.perf_counter(), session_id))
+        return future
+
+    def _collect_batch(self):
+        """Block for one frame, then gather whatever else arrives within the window"""
+        batch = [self._pending.get()]
+        deadline = time.perf_counter() + self.max_batch_wait
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            chunks = {}
+            with self._lock:
+                self._expire_pins(started)
+                for item in batch:
+                    worker = self._assign(item[3], started)
+                    worker.outstanding += 1
+                    chunks.setdefault(worker, []).append(item)
+                self._batch_items += len(batch)
+                self._batches.add(started - batch[0][2])
+            for worker, items in chunks.items():
+                worker.inbox.put(items)
+
+    def _assign(self, session_id, now):
+        """Pick a worker: the session's pinned one, else pin it to the least busy"""
+        if session_id is None:
+            # Least-loaded worker first so a burst spreads over the whole pool
+            return min(self._workers, key=lambda w: w.outstanding)
+        pin = self._pins.get(session_id)
+        if pin is None:
+            worker = min(self._workers, key=lambda w: (w.pinned_sessions, w.outstanding))
+            worker.pinned_sessions += 1
+            pin = self._pins[session_id] = [worker, now]
+        pin[1] = now
+        return pin[0]
+
+    def _expire_pins(self, now):
+        cutoff = now - self.pin_idle_seconds
+        for session_id in [s for s, (_, last) in self._pins.items() if last < cutoff]:
+            self._unpin(session_id)
+
+    def _unpin(self, session_id):
+        pin = self._pins.pop(session_id, None)
+        if pin is not None:
+            pin[0].pinned_sessions -= 1
+
+    def observe_stage(self, stage, seconds):
+        if self.stage_metrics is not None:
+            self.stage_metrics.observe(stage, seconds)
+
+    def release_session(self, session_id):
+        """Drop a session's worker pin (e.g. when its session state is evicted)"""
+        with self._lock:
+            self._unpin(session_id)
+
+    def _record(self, worker, session_id, result, enqueued_at, started, finished):
+        with self._lock:
+            worker.outstanding -= 1
+            self._depth -= 1
+            self._queue_wait.add(started - enqueued_at)
+            self._service_time.add(finished - started)
+
+            # MediaPipe only tracks from the previous frame's landmarks when that frame
+            # was the same person's and something was found; anything else is a full detection
+            same_session = session_id is not None and worker.last_session == session_id
+            if worker.last_session is not None and not same_session:
+                self._session_switches += 1
+            self._tracking["hands"][same_session and worker.last_had_hands] += 1
+            self._tracking["face"][same_session and worker.last_had_face] += 1
+            worker.last_session = session_id
+            worker.last_had_hands = result is not None and result.num_hands > 0
+            worker.last_had_face = result is not None and result.has_face
+        self.observe_stage("queue_wait", started - enqueued_at)
+
+    def _record_lifecycle(self, worker, event):
+        with self._lock:
+            self._lifecycle[event] += 1
+            if event == "released":
+                worker.last_session = None
+                worker.last_had_hands = worker.last_had_face = False
+
+    def metrics(self):
+        """Snapshot of queue depth, batch sizes, queue-wait and service time"""
+        with self._lock:
+            batches = self._batches.count
+            return {
+                "pool_size": self.pool_size,
+                "worker_mode": self.worker_class.mode,
+                "max_batch_wait_ms": self.max_batch_wait * 1000,
+                "max_queue_depth": self.max_queue_depth,
+                "queue_depth": self._depth,
+                "rejected": self._rejected,
+                "batches": batches,
+                "mean_batch_size": round(self._batch_items / batches, 3) if batches else 0.0,
+                "batch_window": self._batches.snapshot(),
+                "queue_wait": self._queue_wait.snapshot(),
+                "service_time": self._service_time.snapshot(),
+                "worker_outstanding": [w.outstanding for w in self._workers],
+                "pinned_sessions": len(self._pins),
+                "session_switches": self._session_switches,
+                "instances_live": sum(w.ready for w in self._workers),
+                "instances_created": self._lifecycle["created"],
+                "instances_released": self._lifecycle["released"],
+                "hands": self._tracking_snapshot("hands"),
+                "face": self._tracking_snapshot("face"),
+            }
+
+    def _tracking_snapshot(self, model):
+        detection, tracking = self._tracking[model]
+        total = detection + tracking
+        return {
+            "detection_frames": detection,
+            "tracking_frames": tracking,
+            "tracking_ratio": round(tracking / total, 3) if total else 0.0,
+        }
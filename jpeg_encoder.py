@@ -0,0 +1,132 @@
+"""
+JPEG encoding stage for the MJPEG /video_feed stream
+Frames are downscaled to a maximum width and encoded with libjpeg-turbo (PyTurboJPEG)
+when it is installed, else with cv2.imencode. Quality is fixed, or with a byte budget
+per frame it steps between a floor and the configured ceiling. submit() encodes on
+the encoder's own thread, so a stream encodes one frame while it captures and runs
+inference on the next.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+except ImportError:
+    TurboJPEG = None
+
+JPEG_QUALITY = 80  # Quality ceiling (cv2.imencode's default is 95)
+MIN_JPEG_QUALITY = 50  # Floor when adapting to TARGET_BYTES
+MAX_WIDTH = 640  # Wider frames are downscaled before encoding (0 = keep native size)
+TARGET_BYTES = 0  # Per-frame byte budget that quality adapts to (0 = fixed quality)
+QUALITY_STEP = 5
+BYTES_SMOOTHING = 0.2  # Weight of the newest frame in the average frame size
+
+_turbo = None
+_turbo_lock = threading.Lock()
+
+
+def turbo_jpeg():
+    """Shared TurboJPEG handle, or None when the bindings or libturbojpeg are missing"""
+    global _turbo
+    if TurboJPEG is None:
+        return None
+    with _turbo_lock:
+        if _turbo is None:
+            try:
+                _turbo = TurboJPEG()
+            except (OSError, RuntimeError):
+                _turbo = False
+    return _turbo or None
+
+
+class JpegEncoder:
+    """Encodes BGR frames to JPEG under a quality/resolution policy and keeps size/time stats"""
+
+    def __init__(self, quality=JPEG_QUALITY, min_quality=MIN_JPEG_QUALITY, max_width=MAX_WIDTH,
+                 target_bytes=TARGET_BYTES, backend="auto", stage_metrics=None):
+        self._turbo = turbo_jpeg() if backend in ("auto", "turbojpeg") else None
+        if backend == "turbojpeg" and self._turbo is None:
+            print("⚠️ libjpeg-turbo not available, encoding with OpenCV")
+        self.backend = "turbojpeg" if self._turbo is not None else "opencv"
+        self.max_quality = quality
+        self.min_quality = min(min_quality, quality)
+        self.quality = quality
+        self.max_width = max_width
+        self.target_bytes = target_bytes
+        self.stage_metrics = stage_metrics
+        self._executor = None
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.total_bytes = 0
+        self.last_bytes = 0
+        self.mean_bytes = 0.0
+        self.encode_seconds = 0.0
+
+    def resize(self, frame):
+        """Downscale to max_width, keeping the aspect ratio"""
+        height, width = frame.shape[:2]
+        if not self.max_width or width <= self.max_width:
+            return frame
+        size = (self.max_width, max(1, round(height * self.max_width / width)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame):
+        """JPEG bytes for one BGR frame"""
+        started = time.perf_counter()
+        frame = self.resize(frame)
+        quality = self.quality
+        if self._turbo is not None:
+            data = self._turbo.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420)
+        else:
+            ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                raise ValueError("JPEG encoding failed")
+            data = buffer.tobytes()
+        self._record(len(data), time.perf_counter() - started)
+        return data
+
+    def submit(self, frame):
+        """Encode on the encoder thread; returns a Future of the JPEG bytes.
+        The frame must not be modified afterwards."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jpeg-encoder")
+        return self._executor.submit(self.encode, frame)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _record(self, size, seconds):
+        with self._lock:
+            self.frames += 1
+            self.total_bytes += size
+            self.last_bytes = size
+            self.encode_seconds += seconds
+            self.mean_bytes = size if self.frames == 1 else \
+                self.mean_bytes + BYTES_SMOOTHING * (size - self.mean_bytes)
+            if self.target_bytes:
+                # Step quality towards the budget, with slack so it does not flip every frame
+                if size > self.target_bytes * 1.1:
+                    self.quality = max(self.min_quality, self.quality - QUALITY_STEP)
+                elif size < self.target_bytes * 0.8:
+                    self.quality = min(self.max_quality, self.quality + QUALITY_STEP)
+        if self.stage_metrics is not None:
+            self.stage_metrics.observe("encode", seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "quality": self.quality,
+                "max_width": self.max_width,
+                "frames": self.frames,
+                "last_bytes": self.last_bytes,
+                "mean_bytes": round(self.mean_bytes),
+                "total_bytes": self.total_bytes,
+                "mean_encode_ms": round(self.encode_seconds / self.frames * 1000, 3) if self.frames else 0.0,
+            }
@@ -0,0 +1,150 @@
+"""
+Compact per-frame landmark recordings for replaying the gesture rules offline
+A recording is one .npz file of fixed-shape arrays, so a long session stays small
+and loads in one read:
+
+    timestamps (n,) float64 | hands (n, 2, 21, 3) float32, NaN-padded | num_hands (n,) uint8
+    face (n, 5, 3) float32 (FACE_LANDMARK_IDS only) | has_face (n,) bool
+    labels (n,) str, optional reference gesture per frame | meta: JSON string
+
+Replaying rebuilds the exact FrameFeatures the rules saw, without MediaPipe.
+"""
+
+import json
+
+import numpy as np
+
+from gesture_features import FrameFeatures, HAND_LANDMARK_COUNT, FACE_LANDMARK_IDS
+
+RECORDING_VERSION = 1
+MAX_HANDS = 2
+PACK_ROWS = 4096  # Appended frames are packed into the arrays in chunks of this many
+
+
+class LandmarkRecording:
+    """Per-frame hand/face landmarks, timestamps and optional reference labels"""
+
+    def __init__(self, meta=None):
+        self.meta = dict(meta or {})
+        self._rows = []  # (timestamp, hands, face, label) until packed
+        self._arrays = None
+
+    @classmethod
+    def from_arrays(cls, timestamps, hands, num_hands, face, has_face, labels=None, meta=None):
+        recording = cls(meta)
+        recording._arrays = {
+            "timestamps": np.asarray(timestamps, dtype=np.float64),
+            "hands": np.asarray(hands, dtype=np.float32),
+            "num_hands": np.asarray(num_hands, dtype=np.uint8),
+            "face": np.asarray(face, dtype=np.float32),
+            "has_face": np.asarray(has_face, dtype=bool),
+            "labels": None if labels is None else np.asarray(labels, dtype=str),
+        }
+        return recording
+
+    def append(self, timestamp, features, label=None):
+        """Record one frame's FrameFeatures (plus its reference gesture, if known)"""
+        self._rows.append((timestamp, features.hands[:MAX_HANDS].copy(),
+                           None if features.face is None else features.face.copy(), label))
+        if len(self._rows) >= PACK_ROWS:
+            self._flush()
+
+    def __len__(self):
+        return len(self.arrays["timestamps"])
+
+    @property
+    def arrays(self):
+        """The recording as fixed-shape arrays (packing any appended frames first)"""
+        self._flush()
+        if self._arrays is None:
+            self._arrays = self._pack_rows([])
+        return self._arrays
+
+    @property
+    def labels(self):
+        return self.arrays["labels"]
+
+    def _flush(self):
+        if self._rows:
+            self._arrays = self._concat(self._arrays, self._pack_rows(self._rows))
+            self._rows = []
+
+    @staticmethod
+    def _pack_rows(rows):
+        n = len(rows)
+        hands = np.full((n, MAX_HANDS, HAND_LANDMARK_COUNT, 3), np.nan, dtype=np.float32)
+        num_hands = np.zeros(n, dtype=np.uint8)
+        face = np.full((n, len(FACE_LANDMARK_IDS), 3), np.nan, dtype=np.float32)
+        has_face = np.zeros(n, dtype=bool)
+        for i, (_, frame_hands, frame_face, _) in enumerate(rows):
+            num_hands[i] = len(frame_hands)
+            hands[i, :len(frame_hands)] = frame_hands
+            if frame_face is not None:
+                face[i] = frame_face
+                has_face[i] = True
+        labels = [row[3] for row in rows]
+        return {
+            "timestamps": np.array([row[0] for row in rows], dtype=np.float64),
+            "hands": hands,
+            "num_hands": num_hands,
+            "face": face,
+            "has_face": has_face,
+            "labels": np.array(labels, dtype=str) if n and all(label is not None for label in labels) else None,
+        }
+
+    @staticmethod
+    def _concat(first, second):
+        if first is None or not len(first["timestamps"]):
+            return second
+        merged = {name: np.concatenate([first[name], second[name]])
+                  for name in first if name != "labels"}
+        both_labeled = first["labels"] is not None and second["labels"] is not None
+        merged["labels"] = np.concatenate([first["labels"], second["labels"]]) if both_labeled else None
+        return merged
+
+    def features(self, index):
+        """Rebuild frame index's FrameFeatures"""
+        arrays = self.arrays
+        hands = arrays["hands"][index, :arrays["num_hands"][index]]
+        face = arrays["face"][index] if arrays["has_face"][index] else None
+        return FrameFeatures(hands, face)
+
+    def frames(self):
+        """Yield (timestamp, FrameFeatures) for every frame in order"""
+        timestamps = self.arrays["timestamps"]
+        for i in range(len(timestamps)):
+            yield float(timestamps[i]), self.features(i)
+
+    # --- FILES ---
+
+    def save(self, path):
+        arrays = {name: value for name, value in self.arrays.items() if value is not None}
+        meta = dict(self.meta, version=RECORDING_VERSION)
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != RECORDING_VERSION:
+                raise ValueError(f"{path}: unsupported recording version {meta.get('version')}")
+            return cls.from_arrays(
+                data["timestamps"], data["hands"], data["num_hands"], data["face"], data["has_face"],
+                labels=data["labels"] if "labels" in data.files else None, meta=meta)
+
+
+def from_labels_jsonl(path, source=None):
+    """Recordings from batch_label.py output, one per source; labels are the gestures it detected"""
+    recordings = {}
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            if source is not None and record["source"] != source:
+                continue
+            recording = recordings.get(record["source"])
+            if recording is None:
+                recording = recordings[record["source"]] = LandmarkRecording({"source": record["source"]})
+            hands = np.array(record["hands"], dtype=np.float32).reshape(-1, HAND_LANDMARK_COUNT, 3)
+            face = None if record["face"] is None else np.array(record["face"], dtype=np.float32)
+            recording.append(record["time"], FrameFeatures(hands, face), record["gesture"])
+    return recordings
@@ -0,0 +1,54 @@
+"""
+Single-item, latest-value-wins handoff between threads
+A producer never blocks: putting into a full slot replaces the stale item,
+so a slow consumer skips frames instead of building a queue
+"""
+
+import threading
+
+
+class LatestSlot:
+    """Holds at most one pending item; newer puts overwrite older ones"""
+
+    def __init__(self, on_drop=None):
+        self._cond = threading.Condition()
+        # Called with each discarded item (e.g. to release a pooled buffer), outside the lock
+        self.on_drop = on_drop
+        self._item = None
+        self._has_item = False
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        """Publish an item, discarding any item the consumer has not taken yet"""
+        with self._cond:
+            stale = self._item if self._has_item else None
+            if self._has_item:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+        if stale is not None and self.on_drop is not None:
+            self.on_drop(stale)
+
+    def get(self, timeout=None):
+        """Take the newest item; returns None on close or timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._has_item or self._closed, timeout):
+                return None
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def close(self):
+        """Wake any waiting consumer; later gets return None once drained"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
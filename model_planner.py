@@ -0,0 +1,62 @@
+"""
+Per-frame model-dependency planning for the gesture rules
+Each rule in gesture_rules declares the landmark sources it reads; only models
+needed by the enabled rules are created, and FaceMesh is skipped on frames where
+none of the enabled face rules could fire
+"""
+
+import numpy as np
+
+from gesture_rules import HANDS, FACE, POSE
+
+FACE_PROXIMITY = 0.35  # Hand within this distance of the last seen nose counts as near the face
+FACE_REFRESH_FRAMES = 15  # Re-locate the face at least this often while hands are visible
+
+
+class ModelPlanner:
+    """Decides which MediaPipe models the enabled gesture rules need, frame by frame"""
+
+    def __init__(self, rules, face_proximity=FACE_PROXIMITY, face_refresh_frames=FACE_REFRESH_FRAMES):
+        # rules: the enabled GestureRules (each declares its sources)
+        self.uses_hands = any(HANDS in r.sources for r in rules)
+        self.uses_face = any(FACE in r.sources for r in rules)
+        self.uses_pose = any(POSE in r.sources for r in rules)
+        # Face rules that run without hands, and hand+face rules that don't need the hand at the face
+        self._face_always = any(FACE in r.sources and HANDS not in r.sources for r in rules)
+        self._face_with_hands = any(FACE in r.sources and HANDS in r.sources and not r.at_face for r in rules)
+        self._face_at_hand = any(r.at_face for r in rules)
+        self.face_proximity = face_proximity
+        self.face_refresh_frames = face_refresh_frames
+        self._last_nose = None
+        self._frames_since_face = 0
+        self.face_runs = 0
+        self.face_skips = 0
+
+    def need_face(self, features):
+        """Whether FaceMesh must run, given this frame's hand-only FrameFeatures"""
+        if not self.uses_face:
+            return False
+        if self._face_always:
+            return True
+        if not features.num_hands:
+            return False
+        if self._face_with_hands:
+            return True
+        if self._last_nose is None or self._frames_since_face >= self.face_refresh_frames:
+            return True
+        points = np.concatenate([features.index_tips, features.palm_centers])
+        return bool((np.linalg.norm(points - self._last_nose, axis=-1) < self.face_proximity).any())
+
+    def observe(self, features, ran_face):
+        """Record whether FaceMesh ran this frame and where it found the face"""
+        if ran_face:
+            self.face_runs += 1
+            self._frames_since_face = 0
+            self._last_nose = features.nose.copy() if features.has_face else None
+        else:
+            self.face_skips += 1
+            self._frames_since_face += 1
+
+    def describe(self):
+        models = [name for name, used in ((HANDS, self.uses_hands), (FACE, self.uses_face), (POSE, self.uses_pose)) if used]
+        return ", ".join(models) or "none"
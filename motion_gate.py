@@ -0,0 +1,93 @@
+"""
+Motion-gated, rate-bounded inference scheduling for live camera loops
+A tiny grayscale thumbnail of each frame is compared with the one inference last
+ran on; while the scene is still, the caller keeps its last landmarks and gesture
+instead of re-running the models. Inference rate is kept between a floor (so a
+held pose is still re-checked) and a ceiling (so capture/display keep full rate).
+"""
+
+import threading
+import time
+from collections import deque
+
+import cv2
+
+MOTION_THRESHOLD = 0.02  # Mean absolute thumbnail difference (0-1) that counts as motion
+MIN_INFERENCE_HZ = 2.0  # Re-run at least this often even when nothing moves (0 = never forced)
+MAX_INFERENCE_HZ = 15.0  # Never run more often than this (0 = no ceiling)
+PROBE_SIZE = (32, 24)
+FPS_WINDOW_SECONDS = 2.0
+
+
+class MotionGate:
+    """Decides per captured frame whether the hand/face models need to run again"""
+
+    def __init__(self, threshold=MOTION_THRESHOLD, min_hz=MIN_INFERENCE_HZ, max_hz=MAX_INFERENCE_HZ,
+                 probe_size=PROBE_SIZE):
+        self.threshold = threshold
+        self.min_interval = 1.0 / min_hz if min_hz > 0 else float("inf")
+        self.max_interval = 1.0 / max_hz if max_hz > 0 else 0.0
+        self.probe_size = probe_size
+        self._reference = None  # Thumbnail of the frame inference last ran on
+        self._last_run = None
+        self._runs = deque()
+        self.frames = 0
+        self.inferred = 0
+        self.skipped_still = 0
+        self.skipped_throttled = 0
+        self.last_motion = 0.0
+        # The camera thread updates the counters while request threads read stats()
+        self._lock = threading.Lock()
+
+    def probe(self, frame_bgr):
+        """Downscaled grayscale thumbnail used for frame differencing"""
+        small = cv2.resize(frame_bgr, self.probe_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def should_infer(self, frame_bgr, now=None):
+        """True if inference should run on this frame (and records that it will)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._should_infer(frame_bgr, now)
+
+    def _should_infer(self, frame_bgr, now):
+        self.frames += 1
+        elapsed = None if self._last_run is None else now - self._last_run
+        if elapsed is not None and elapsed < self.max_interval:
+            self.skipped_throttled += 1
+            return False
+
+        probe = self.probe(frame_bgr)
+        if elapsed is not None and elapsed < self.min_interval:
+            self.last_motion = float(cv2.absdiff(probe, self._reference).mean()) / 255.0
+            if self.last_motion < self.threshold:
+                self.skipped_still += 1
+                return False
+
+        self._reference = probe
+        self._last_run = now
+        self._runs.append(now)
+        self.inferred += 1
+        return True
+
+    def inference_fps(self, now=None):
+        """Effective inference rate over the last few seconds"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._inference_fps(now)
+
+    def _inference_fps(self, now):
+        while self._runs and self._runs[0] < now - FPS_WINDOW_SECONDS:
+            self._runs.popleft()
+        return len(self._runs) / FPS_WINDOW_SECONDS
+
+    def stats(self):
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "inferred": self.inferred,
+                "skipped_still": self.skipped_still,
+                "skipped_throttled": self.skipped_throttled,
+                "inference_fps": round(self._inference_fps(time.monotonic()), 2),
+                "last_motion": round(self.last_motion, 4),
+            }
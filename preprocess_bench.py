@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Decode + color-conversion benchmark for the inference preprocessing stage
+Times JPEG decoding at full, 1/2, 1/4 and 1/8 scale followed by BGR->RGB
+conversion, then the old full-size path against FramePreprocessor at each
+inference width. Uses the given JPEGs, or synthetic camera-sized frames.
+
+    python preprocess_bench.py                      # synthetic 640x480, 1280x720, 1920x1080
+    python preprocess_bench.py upload.jpg --repeat 200 --widths 320,640 --json
+"""
+
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from frame_preprocess import FramePreprocessor, REDUCED_DECODE_FLAGS, jpeg_size
+
+SYNTHETIC_SIZES = ((640, 480), (1280, 720), (1920, 1080))
+JPEG_QUALITY = 85
+
+
+def synthetic_jpeg(width, height, seed=0):
+    """A camera-like frame (smooth gradients, shapes and sensor noise) encoded as JPEG"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.dstack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(255 - y, (height, width))])
+    frame = frame.astype(np.uint8)
+    for _ in range(12):
+        center = (int(rng.integers(width)), int(rng.integers(height)))
+        cv2.circle(frame, center, int(rng.integers(10, height // 4)), rng.integers(0, 255, 3).tolist(), -1)
+    frame = cv2.add(frame, rng.integers(0, 12, frame.shape, dtype=np.uint8))
+    return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])[1]
+
+
+def timed(function, repeat):
+    """Mean and p95 milliseconds of function() over repeat runs (after one warm-up), and its last result"""
+    result = function()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {"mean_ms": round(sum(samples) / len(samples), 3),
+            "p95_ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 3)}, result
+
+
+def bench_source(name, data, repeat, widths):
+    width, height = jpeg_size(data)
+    report = {"source": name, "size": [width, height], "bytes": int(data.size), "scales": [], "paths": []}
+    for scale, flag in reversed(REDUCED_DECODE_FLAGS):
+        decode, image = timed(lambda: cv2.imdecode(data, flag), repeat)
+        convert, _ = timed(lambda: cv2.cvtColor(image, cv2.COLOR_BGR2RGB), repeat)
+        report["scales"].append({"scale": scale, "decoded": [image.shape[1], image.shape[0]],
+                                 "decode": decode, "convert": convert})
+
+    def full_path():
+        return cv2.cvtColor(cv2.imdecode(data, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+    stats, image = timed(full_path, repeat)
+    report["paths"].append({"path": "imdecode + cvtColor (full size)", "output": [image.shape[1], image.shape[0]],
+                            **stats})
+    for max_width in widths:
+        preprocessor = FramePreprocessor(max_width)
+        stats, image = timed(lambda: preprocessor.to_rgb(preprocessor.decode(data)), repeat)
+        report["paths"].append({"path": f"FramePreprocessor(max_width={max_width})",
+                                "output": [image.shape[1], image.shape[0]], **stats})
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark reduced-scale JPEG decoding and color conversion")
+    parser.add_argument("images", nargs="*", help="JPEG files (default: synthetic frames)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--widths", default="320,640", help="comma-separated inference widths to compare")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    widths = [int(w) for w in args.widths.split(",") if w]
+
+    sources = []
+    for path in args.images:
+        data = np.fromfile(path, dtype=np.uint8)
+        if jpeg_size(data) is None:
+            parser.error(f"{path} is not a JPEG")
+        sources.append((path, data))
+    if not sources:
+        sources = [(f"synthetic {w}x{h}", synthetic_jpeg(w, h)) for w, h in SYNTHETIC_SIZES]
+
+    reports = [bench_source(name, data, args.repeat, widths) for name, data in sources]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for report in reports:
+        width, height = report["size"]
+        print(f"🖼️  {report['source']}: {width}x{height}, {report['bytes'] // 1024} KB")
+        for row in report["scales"]:
+            w, h = row["decoded"]
+            total = row["decode"]["mean_ms"] + row["convert"]["mean_ms"]
+            print(f"   1/{row['scale']} → {w}x{h}: decode {row['decode']['mean_ms']} ms "
+                  f"(p95 {row['decode']['p95_ms']}), convert {row['convert']['mean_ms']} ms, total {total:.3f} ms")
+        for row in report["paths"]:
+            w, h = row["output"]
+            print(f"   ⏱️  {row['path']} → {w}x{h}: {row['mean_ms']} ms (p95 {row['p95_ms']})")
+
+
+if __name__ == "__main__":
+    main()
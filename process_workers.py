@@ -0,0 +1,180 @@
+"""
+Process-backed inference workers so MediaPipe escapes the GIL
+Each worker process owns its own Hands/FaceMesh pair, reads frames from a shared
+memory segment and runs the models plus landmark feature extraction; only the
+compact FrameFeatures arrays (and model timings) come back. The gesture rules
+(finish_analysis) still run in the parent, under the session's lock.
+"""
+
+import atexit
+import multiprocessing as mp
+import sys
+import time
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from gesture_features import extract_features
+from inference_pool import ModelWorker
+
+# Initial shared-memory slot size per worker; grows if a larger frame arrives
+DEFAULT_SLOT_BYTES = 1280 * 720 * 3
+# A child that takes longer than this to answer is killed and respawned; its first
+# answer also covers starting the interpreter and creating the models
+FRAME_TIMEOUT_SECONDS = 10.0
+STARTUP_TIMEOUT_SECONDS = 60.0
+
+# Spawn (not fork) so children never inherit MediaPipe graphs or Flask threads
+_context = mp.get_context("spawn")
+
+
+@contextmanager
+def _main_module_hidden():
+    """Keep spawn from re-running the parent's __main__ script (e.g. all of app.py) in the child
+
+    The child only needs _worker_main and the model factory, which it imports by
+    module name. spawn decides from __main__'s __spec__/__file__ at start().
+    """
+    main = sys.modules["__main__"]
+    saved = {name: main.__dict__[name] for name in ("__spec__", "__file__") if name in main.__dict__}
+    main.__spec__ = None
+    main.__dict__.pop("__file__", None)
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+
+def _worker_main(conn, model_factory):
+    """Child process loop: frame in via shared memory, FrameFeatures out via the pipe"""
+    hands, face_mesh = model_factory()
+    segment = None
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        name, shape = message
+        if segment is None or segment.name != name:
+            if segment is not None:
+                segment.close()
+            # The parent owns the segment and unlinks it; the child only attaches
+            segment = shared_memory.SharedMemory(name=name)
+        image_rgb = np.ndarray(shape, dtype=np.uint8, buffer=segment.buf)
+        image_rgb.flags.writeable = False
+        try:
+            started = time.perf_counter()
+            results_hands = hands.process(image_rgb)
+            hands_done = time.perf_counter()
+            results_face = face_mesh.process(image_rgb)
+            timings = {"hands": hands_done - started, "face": time.perf_counter() - hands_done}
+            conn.send((True, (extract_features(results_hands, results_face), timings)))
+        except Exception as e:
+            conn.send((False, repr(e)))
+        # Drop the view before the segment can be swapped for a bigger one
+        del image_rgb
+    if segment is not None:
+        segment.close()
+
+
+class ProcessModelWorker(ModelWorker):
+    """ModelWorker whose models live in a child process fed through shared memory"""
+
+    mode = "process"
+
+    def __init__(self, index, model_factory, scheduler):
+        super().__init__(index, model_factory, scheduler)
+        self._segment = None
+        self._conn = None
+        self._process = None
+        self._starting = False  # No answer from the current child yet
+        atexit.register(self.close)
+
+    @property
+    def ready(self):
+        return self._process is not None
+
+    def setup(self):
+        self._allocate(DEFAULT_SLOT_BYTES)
+        self._spawn()
+
+    def release(self):
+        """Stop the idle child process; setup() spawns a fresh one on demand"""
+        self.close()
+
+    def _allocate(self, size):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+        self._segment = shared_memory.SharedMemory(create=True, size=size)
+
+    def _spawn(self):
+        self._stop_process()
+        parent_conn, child_conn = _context.Pipe()
+        self._process = _context.Process(
+            target=_worker_main,
+            args=(child_conn, self._model_factory),
+            name=f"inference-process-{self.index}",
+            daemon=True
+        )
+        if getattr(self._model_factory, "__module__", "__main__") == "__main__":
+            self._process.start()
+        else:
+            with _main_module_hidden():
+                self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._starting = True
+
+    def _stop_process(self, timeout=1):
+        """Close the pipe and reap the child, killing it if it does not exit"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            self._process.join(timeout=timeout)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+            self._process = None
+
+    def infer(self, image_rgb):
+        if image_rgb.nbytes > self._segment.size:
+            self._allocate(image_rgb.nbytes)
+        if not self._process.is_alive():
+            self._spawn()
+
+        slot = np.ndarray(image_rgb.shape, dtype=np.uint8, buffer=self._segment.buf)
+        np.copyto(slot, image_rgb)
+        del slot
+        timeout = STARTUP_TIMEOUT_SECONDS if self._starting else FRAME_TIMEOUT_SECONDS
+        try:
+            self._conn.send((self._segment.name, image_rgb.shape))
+            if not self._conn.poll(timeout):
+                # Wedged: replace it rather than block every session pinned here
+                self._spawn()
+                raise RuntimeError(f"inference process {self.index} did not answer within {timeout:g}s")
+            ok, payload = self._conn.recv()
+        except (EOFError, OSError) as e:
+            # The child died mid-frame; it is respawned on the next call
+            raise RuntimeError(f"inference process {self.index} exited") from e
+        self._starting = False
+        if not ok:
+            raise RuntimeError(payload)
+        features, timings = payload
+        for stage, seconds in timings.items():
+            self._scheduler.observe_stage(stage, seconds)
+        return features
+
+    def close(self):
+        """Stop the child process and release the shared memory slot"""
+        if self._conn is not None:
+            try:
+                self._conn.send(None)
+            except (OSError, ValueError):
+                pass
+        self._stop_process()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+            self._segment = None
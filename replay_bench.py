@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Headless replay and benchmark suite for the gesture rules
+Recorded landmarks (landmark_recording.py .npz files, or batch_label.py JSONL)
+are fed through the rule engine and the web app's stability/cooldown logic
+without MediaPipe or a camera. Reports rule-evaluation cost per frame,
+gesture-switch latency in frames and agreement with the recording's labels.
+--synthetic replays a built-in scripted session, so it runs anywhere.
+
+    python replay_bench.py session.npz --stability-frames 4 --set WAVE_MIN_RANGE=0.08
+    python replay_bench.py --synthetic --json
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+import gesture_features
+import gesture_rules
+from gesture_features import FrameFeatures, HAND_LANDMARK_COUNT, FACE_LANDMARK_IDS
+from gesture_rules import GestureEngine, RULE_NAMES, DEFAULT_GESTURE, update_stable_gesture
+from landmark_recording import LandmarkRecording, from_labels_jsonl
+from session_state import GestureSession
+
+# Defaults match app.py
+GESTURE_STABILITY_FRAMES = 3
+GESTURE_COOLDOWN_FRAMES = 5
+HAND_HISTORY_SIZE = 8
+TONGUE_HISTORY_SIZE = 10
+
+
+# --- REPLAY ---
+
+def replay(recording, engine, stability_frames=GESTURE_STABILITY_FRAMES, cooldown_frames=GESTURE_COOLDOWN_FRAMES,
+           hand_history_size=HAND_HISTORY_SIZE, tongue_history_size=TONGUE_HISTORY_SIZE):
+    """Run a recording through the rules and stability logic, timing each stage per frame"""
+    arrays = recording.arrays
+    count = len(recording)
+    session = GestureSession("replay", hand_history_size=hand_history_size,
+                             tongue_history_size=tongue_history_size, stability_frames=stability_frames)
+    detected = []
+    stable = []
+    feature_seconds = np.empty(count)
+    rule_seconds = np.empty(count)
+    for i in range(count):
+        hands = arrays["hands"][i, :arrays["num_hands"][i]]
+        face = arrays["face"][i] if arrays["has_face"][i] else None
+        started = time.perf_counter()
+        features = FrameFeatures(hands, face)
+        built = time.perf_counter()
+        gesture = engine.evaluate(features, session)
+        feature_seconds[i] = built - started
+        rule_seconds[i] = time.perf_counter() - built
+        update_stable_gesture(session, gesture, cooldown_frames)
+        detected.append(gesture)
+        stable.append(session.current_gesture)
+    return {"detected": detected, "stable": stable, "feature_seconds": feature_seconds,
+            "rule_seconds": rule_seconds}
+
+
+def switch_latencies(labels, stable):
+    """Frames from each label change until the stable gesture follows, or None if it never does"""
+    latencies = []
+    change = None
+    for i in range(1, len(labels) + 1):
+        if i == len(labels) or labels[i] != labels[i - 1]:
+            # Close the segment that started at the previous change
+            if change is not None:
+                reached = next((j for j in range(change, i) if stable[j] == labels[change]), None)
+                latencies.append(None if reached is None else reached - change)
+            change = i
+    return latencies
+
+
+def summarize(result, labels=None):
+    frames = len(result["detected"])
+    summary = {
+        "frames": frames,
+        "features_us": _timing(result["feature_seconds"]),
+        "rules_us": _timing(result["rule_seconds"]),
+        "stable_switches": sum(1 for a, b in zip(result["stable"], result["stable"][1:]) if a != b),
+    }
+    if labels is not None and frames:
+        labels = [str(label) for label in labels]
+        summary["raw_agreement"] = round(sum(map(str.__eq__, result["detected"], labels)) / frames, 4)
+        summary["stable_agreement"] = round(sum(map(str.__eq__, result["stable"], labels)) / frames, 4)
+        latencies = switch_latencies(labels, result["stable"])
+        reached = [latency for latency in latencies if latency is not None]
+        summary["switch_latency_frames"] = {
+            "switches": len(latencies),
+            "missed": len(latencies) - len(reached),
+            "mean": round(float(np.mean(reached)), 2) if reached else None,
+            "p95": round(float(np.percentile(reached, 95)), 2) if reached else None,
+            "max": max(reached) if reached else None,
+        }
+    return summary
+
+
+def _timing(seconds):
+    if not len(seconds):
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0}
+    micros = seconds * 1e6
+    return {"mean": round(float(micros.mean()), 2),
+            "p50": round(float(np.percentile(micros, 50)), 2),
+            "p95": round(float(np.percentile(micros, 95)), 2)}
+
+
+# --- SYNTHETIC SESSION ---
+
+# Finger offsets from the palm center (index, middle, ring, pinky)
+_FINGER_OFFSETS = np.array([-0.05, -0.017, 0.017, 0.05])
+_FINGER_BASES = (5, 9, 13, 17)  # MCP landmark of each finger; PIP, DIP and tip follow
+
+# Scripted poses: (hands, fingers extended (index..pinky), thumb up, mouth gap)
+SYNTHETIC_POSES = {
+    DEFAULT_GESTURE: (0, (0, 0, 0, 0), False, 0.01),
+    "THUMBS_UP": (1, (0, 0, 0, 0), True, 0.01),
+    "FIST": (1, (0, 0, 0, 0), False, 0.01),
+    "PEACE": (1, (1, 1, 0, 0), False, 0.01),
+    "OPEN_PALM": (1, (1, 1, 1, 1), False, 0.01),
+    "MONKEY_FINGER_RAISE": (1, (1, 0, 0, 0), False, 0.01),
+    "VICTORY": (2, (1, 1, 1, 1), False, 0.01),  # Both palms waving up and down
+    "YAWN": (0, (0, 0, 0, 0), False, 0.07),
+}
+
+
+def synthetic_hand(center_x, wrist_y, extended, thumb_up):
+    """21 hand landmarks for a scripted pose (image coordinates, y down)"""
+    hand = np.zeros((HAND_LANDMARK_COUNT, 3), dtype=np.float32)
+    hand[0] = (center_x, wrist_y, 0)
+    hand[1] = (center_x - 0.04, wrist_y - 0.03, 0)
+    hand[2] = (center_x - 0.07, wrist_y - 0.06, 0)
+    if thumb_up:
+        hand[3] = (center_x - 0.08, wrist_y - 0.12, 0)
+        hand[4] = (center_x - 0.08, wrist_y - 0.18, 0)
+    else:
+        hand[3] = (center_x - 0.06, wrist_y - 0.08, 0)
+        hand[4] = (center_x - 0.03, wrist_y - 0.06, 0)
+    mcp_y = wrist_y - 0.12
+    for offset, base, straight in zip(_FINGER_OFFSETS, _FINGER_BASES, extended):
+        mcp_x = center_x + offset
+        hand[base] = (mcp_x, mcp_y, 0)
+        if straight:
+            # Straight up and fanned out
+            for k, rise in enumerate((0.06, 0.10, 0.14), 1):
+                hand[base + k] = (mcp_x + offset * rise / 0.14, mcp_y - rise, 0)
+        else:
+            hand[base + 1] = (mcp_x, mcp_y - 0.03, 0)
+            hand[base + 2] = (mcp_x, mcp_y - 0.01, 0)
+            hand[base + 3] = (mcp_x, mcp_y + 0.01, 0)
+    return hand
+
+
+def synthetic_face(mouth_gap):
+    """The FACE_LANDMARK_IDS points (nose, lips, mouth corners), kept clear of the hands"""
+    face = np.zeros((len(FACE_LANDMARK_IDS), 3), dtype=np.float32)
+    face[0] = (0.5, 0.15, 0)
+    face[1] = (0.5, 0.22, 0)
+    face[2] = (0.5, 0.22 + mouth_gap, 0)
+    face[3] = (0.45, 0.22 + mouth_gap / 2, 0)
+    face[4] = (0.55, 0.22 + mouth_gap / 2, 0)
+    return face
+
+
+def synthetic_recording(segments=60, seed=0, fps=30.0, jitter=0.002, dropout=0.02):
+    """A labeled scripted session: random gesture segments with landmark jitter and tracking dropouts"""
+    rng = np.random.default_rng(seed)
+    names = list(SYNTHETIC_POSES)
+    recording = LandmarkRecording({"source": "synthetic", "seed": seed})
+    frame = 0
+    previous = None
+    for _ in range(segments):
+        label = rng.choice([name for name in names if name != previous])
+        previous = label
+        num_hands, extended, thumb_up, mouth_gap = SYNTHETIC_POSES[label]
+        for k in range(int(rng.integers(20, 46))):
+            if num_hands == 2:
+                # Wrists move up and down together, 0.1 peak to peak, over 8 frames
+                wrist_y = 0.8 + 0.05 * math.sin(2 * math.pi * k / 8)
+                hands = [synthetic_hand(0.3, wrist_y, extended, thumb_up),
+                         synthetic_hand(0.7, wrist_y, extended, thumb_up)]
+            else:
+                hands = [synthetic_hand(0.5, 0.85, extended, thumb_up)] * num_hands
+            hands = np.array(hands, dtype=np.float32).reshape(-1, HAND_LANDMARK_COUNT, 3)
+            if len(hands) and rng.random() < dropout:
+                hands = hands[:0]
+            hands = hands + rng.normal(0, jitter, hands.shape).astype(np.float32)
+            face = synthetic_face(mouth_gap) + rng.normal(0, jitter / 4, (len(FACE_LANDMARK_IDS), 3))
+            recording.append(frame / fps, FrameFeatures(hands, face.astype(np.float32)), str(label))
+            frame += 1
+    return recording
+
+
+# --- CLI ---
+
+def apply_overrides(assignments):
+    """NAME=VALUE threshold overrides for gesture_rules / gesture_features module constants"""
+    for assignment in assignments:
+        name, _, value = assignment.partition("=")
+        for module in (gesture_rules, gesture_features):
+            if name.isupper() and hasattr(module, name):
+                setattr(module, name, type(getattr(module, name))(value))
+                break
+        else:
+            raise ValueError(f"Unknown threshold {name}")
+
+
+def load_recordings(paths):
+    recordings = []
+    for path in paths:
+        if path.endswith(".jsonl"):
+            recordings.extend((f"{path}:{source}", recording)
+                              for source, recording in from_labels_jsonl(path).items())
+        else:
+            recordings.append((path, LandmarkRecording.load(path)))
+    return recordings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded landmarks through the gesture rules")
+    parser.add_argument("recordings", nargs="*", help=".npz recordings or batch_label.py .jsonl files")
+    parser.add_argument("--synthetic", action="store_true", help="also replay the built-in scripted session")
+    parser.add_argument("--rules", default=",".join(RULE_NAMES), help="comma-separated rule names")
+    parser.add_argument("--stability-frames", type=int, default=GESTURE_STABILITY_FRAMES)
+    parser.add_argument("--cooldown-frames", type=int, default=GESTURE_COOLDOWN_FRAMES)
+    parser.add_argument("--hand-history", type=int, default=HAND_HISTORY_SIZE)
+    parser.add_argument("--tongue-history", type=int, default=TONGUE_HISTORY_SIZE)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a rule/feature threshold, e.g. WAVE_MIN_RANGE=0.08")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.recordings and not args.synthetic:
+        parser.error("give recordings and/or --synthetic")
+    try:
+        apply_overrides(args.set)
+        engine = GestureEngine(enabled=[r for r in args.rules.split(",") if r])
+    except ValueError as e:
+        parser.error(str(e))
+
+    recordings = load_recordings(args.recordings)
+    if args.synthetic:
+        recordings.append(("synthetic", synthetic_recording()))
+
+    report = {}
+    for name, recording in recordings:
+        result = replay(recording, engine, args.stability_frames, args.cooldown_frames,
+                        args.hand_history, args.tongue_history)
+        report[name] = summarize(result, recording.labels)
+    report["rules"] = engine.stats()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    for name, summary in report.items():
+        if name == "rules":
+            continue
+        print(f"📼 {name}: {summary['frames']} frames, {summary['stable_switches']} stable switches")
+        print(f"   ⏱️  features {summary['features_us']['mean']} µs/frame, "
+              f"rules {summary['rules_us']['mean']} µs/frame (p95 {summary['rules_us']['p95']})")
+        if "raw_agreement" in summary:
+            latency = summary["switch_latency_frames"]
+            print(f"   🎯 agreement: raw {summary['raw_agreement']:.1%}, stable {summary['stable_agreement']:.1%}")
+            print(f"   🔁 switch latency: mean {latency['mean']} frames, p95 {latency['p95']}, "
+                  f"max {latency['max']}, missed {latency['missed']}/{latency['switches']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
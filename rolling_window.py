@@ -0,0 +1,141 @@
+"""
+Fixed-size sliding-window statistics for the temporal gesture detectors
+A NumPy ring buffer holds the last N samples; min/max come from monotonic
+deques, mean/variance from running sums and zero crossings from a running
+count of sign changes, so every query is O(1) and each append amortized O(1)
+whatever the window length.
+"""
+
+from collections import deque
+
+import numpy as np
+
+
+class RollingWindow:
+    """Last maxlen samples of a scalar signal with O(1) window statistics
+
+    Drop-in for the deque(maxlen=n) histories: append/extend/clear, len() and
+    iteration (oldest first) behave the same.
+    """
+
+    def __init__(self, maxlen, center=0.0, iterable=()):
+        if maxlen < 1:
+            raise ValueError("RollingWindow maxlen must be at least 1")
+        self.maxlen = maxlen
+        self.center = center  # Level zero crossings are counted around
+        self._values = np.zeros(maxlen, dtype=np.float64)
+        self._above = np.zeros(maxlen, dtype=bool)
+        self.clear()
+        self.extend(iterable)
+
+    def clear(self):
+        self._seq = 0  # Samples appended since the last clear; slot = seq % maxlen
+        self._len = 0
+        self._min = deque()  # (seq, value), values increasing: front is the window min
+        self._max = deque()  # (seq, value), values decreasing: front is the window max
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._crossings = 0
+        self._since_resum = 0
+
+    def append(self, value):
+        value = float(value)
+        maxlen = self.maxlen
+        seq = self._seq
+        slot = seq % maxlen
+        above = value >= self.center
+
+        if self._len == maxlen:
+            # Evict the oldest sample, which lives in the slot about to be overwritten
+            old = self._values[slot]
+            self._sum -= old
+            self._sum_sq -= old * old
+            if self._above[slot] != self._above[(slot + 1) % maxlen]:
+                self._crossings -= 1
+        else:
+            self._len += 1
+        if self._len > 1 and above != self._above[(slot - 1) % maxlen]:
+            self._crossings += 1
+
+        self._values[slot] = value
+        self._above[slot] = above
+        self._sum += value
+        self._sum_sq += value * value
+        self._seq = seq + 1
+
+        oldest = seq - maxlen
+        min_q, max_q = self._min, self._max
+        while min_q and min_q[-1][1] >= value:
+            min_q.pop()
+        min_q.append((seq, value))
+        if min_q[0][0] <= oldest:
+            min_q.popleft()
+        while max_q and max_q[-1][1] <= value:
+            max_q.pop()
+        max_q.append((seq, value))
+        if max_q[0][0] <= oldest:
+            max_q.popleft()
+
+        # Running sums drift with float error; re-sum once per window turnover (amortized O(1))
+        self._since_resum += 1
+        if self._since_resum >= maxlen:
+            window = self._values[:self._len]
+            self._sum = float(window.sum())
+            self._sum_sq = float(np.dot(window, window))
+            self._since_resum = 0
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return iter(self.values().tolist())
+
+    def __repr__(self):
+        return f"RollingWindow({self.values().tolist()}, maxlen={self.maxlen})"
+
+    @property
+    def full(self):
+        return self._len == self.maxlen
+
+    def values(self):
+        """Window contents as a new array, oldest first"""
+        if self._len < self.maxlen:
+            return self._values[:self._len].copy()
+        return np.roll(self._values, -(self._seq % self.maxlen))
+
+    # --- STATISTICS (O(1)) ---
+
+    def min(self):
+        if not self._len:
+            raise ValueError("min() of an empty RollingWindow")
+        return self._min[0][1]
+
+    def max(self):
+        if not self._len:
+            raise ValueError("max() of an empty RollingWindow")
+        return self._max[0][1]
+
+    def range(self):
+        """max() - min(), the peak-to-peak travel over the window"""
+        return self.max() - self.min()
+
+    def mean(self):
+        if not self._len:
+            raise ValueError("mean() of an empty RollingWindow")
+        return self._sum / self._len
+
+    def var(self):
+        """Population variance of the window"""
+        mean = self.mean()
+        return max(self._sum_sq / self._len - mean * mean, 0.0)
+
+    def std(self):
+        return self.var() ** 0.5
+
+    def zero_crossings(self):
+        """Times consecutive samples cross the center level within the window"""
+        return self._crossings
@@ -0,0 +1,232 @@
+"""
+Per-client gesture tracking state for the web app
+Each browser session gets its own smoothing windows, wave/tongue tracks and
+cooldown counters; idle sessions are evicted by TTL and the store is LRU-bounded
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+from gesture_rules import DEFAULT_GESTURE
+from rolling_window import RollingWindow
+
+
+class GestureSession:
+    """All mutable gesture state that belongs to one client"""
+
+    def __init__(self, session_id, hand_history_size=8, tongue_history_size=10,
+                 stability_frames=3, analyze_history_size=5):
+        self.session_id = session_id
+        # Called with the new gesture whenever it changes (e.g. to answer long-polls)
+        self._gesture_listeners = []
+        self._current_gesture = DEFAULT_GESTURE
+        self.gesture_change_cooldown = 0
+        # Bounded ring buffers: memory per session is fixed regardless of uptime
+        self.gesture_history = deque(maxlen=stability_frames)
+        self.analyze_gesture_history = deque(maxlen=analyze_history_size)
+        self.left_hand_y_history = RollingWindow(hand_history_size)
+        self.right_hand_y_history = RollingWindow(hand_history_size)
+        self.tongue_x_history = RollingWindow(tongue_history_size)
+        # Latest detection numbers for the stats card: hand confidence (0-1), hands, frames per second
+        self.detection_stats = {"confidence": 0.0, "hands": 0, "fps": 0.0}
+        self._last_frame_at = None
+        self.last_seen = time.time()
+        # Backend version this state was last loaded from or saved as (None = never synced)
+        self.version = None
+        # Serializes updates from concurrent requests of the same client
+        self.lock = threading.Lock()
+
+    def touch(self):
+        self.last_seen = time.time()
+
+    @property
+    def current_gesture(self):
+        return self._current_gesture
+
+    @current_gesture.setter
+    def current_gesture(self, gesture):
+        if gesture != self._current_gesture:
+            self._current_gesture = gesture
+            for listener in tuple(self._gesture_listeners):
+                listener(gesture)
+
+    def add_gesture_listener(self, listener):
+        """Call listener(gesture) on every gesture change, from whichever thread makes it; keep it cheap"""
+        self._gesture_listeners.append(listener)
+
+    def remove_gesture_listener(self, listener):
+        self._gesture_listeners.remove(listener)
+
+    def record_frame(self, features=None, now=None):
+        """Count a processed frame toward the FPS estimate; features (if inferred) update hands/confidence"""
+        now = time.monotonic() if now is None else now
+        stats = self.detection_stats
+        if self._last_frame_at is not None and now > self._last_frame_at:
+            # Exponential moving average of the instantaneous rate
+            stats["fps"] = round(0.9 * stats["fps"] + 0.1 / (now - self._last_frame_at), 2)
+        self._last_frame_at = now
+        if features is not None:
+            scores = features.hand_scores
+            stats["hands"] = features.num_hands
+            stats["confidence"] = round(float(scores.max()), 3) if scores is not None and len(scores) else 0.0
+
+    def to_dict(self):
+        return {
+            "current_gesture": self.current_gesture,
+            "gesture_change_cooldown": self.gesture_change_cooldown,
+            "gesture_history": list(self.gesture_history),
+            "analyze_gesture_history": list(self.analyze_gesture_history),
+            "left_hand_y_history": list(self.left_hand_y_history),
+            "right_hand_y_history": list(self.right_hand_y_history),
+            "tongue_x_history": list(self.tongue_x_history),
+            "detection_stats": dict(self.detection_stats),
+            "last_seen": self.last_seen,
+        }
+
+    def load_dict(self, state):
+        """Restore state saved by to_dict (e.g. by another worker process)"""
+        self.current_gesture = state.get("current_gesture", DEFAULT_GESTURE)
+        self.gesture_change_cooldown = state.get("gesture_change_cooldown", 0)
+        for name in ("gesture_history", "analyze_gesture_history", "left_hand_y_history",
+                     "right_hand_y_history", "tongue_x_history"):
+            history = getattr(self, name)
+            history.clear()
+            history.extend(state.get(name, ()))
+        self.detection_stats.update(state.get("detection_stats", {}))
+        self.last_seen = state.get("last_seen", self.last_seen)
+
+
+class SqliteSessionBackend:
+    """Local key-value backend so several worker processes on one host share sessions
+
+    Writes are last-writer-wins per session; requests for the same session
+    landing on two processes at the same instant may drop one history sample.
+    Every save stamps a new version, so readers only reload rows another writer changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(id TEXT PRIMARY KEY, state TEXT, last_seen REAL, version INTEGER)")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+            if "version" not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id, known_version=None):
+        """(state, version) of a session, or None if it is missing or still at known_version"""
+        row = self._connect().execute(
+            "SELECT state, version FROM sessions WHERE id = ? AND version IS NOT ?", (session_id, known_version)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save(self, session_id, state):
+        """Store state and return the version it was saved as"""
+        version = time.time_ns()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sessions (id, state, last_seen, version) VALUES (?, ?, ?, ?)",
+            (session_id, json.dumps(state), state["last_seen"], version)
+        )
+        return version
+
+    def delete(self, session_id):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def evict_idle(self, cutoff):
+        self._connect().execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,))
+
+
+class SessionStore:
+    """Session-keyed GestureSession store with TTL and LRU eviction"""
+
+    def __init__(self, max_sessions=1000, ttl_seconds=300, backend=None, session_options=None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._session_options = session_options or {}
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+        self._eviction_listeners = []
+
+    def add_eviction_listener(self, callback):
+        """Call callback(session_id) whenever a session is evicted"""
+        self._eviction_listeners.append(callback)
+
+    def get(self, session_id):
+        """Return the session for session_id, creating it if needed"""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = GestureSession(session_id, **self._session_options)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            # Refreshed before the TTL sweep, so a client returning after a long pause isn't evicted
+            # by its own request while it is handed the session
+            session.touch()
+            evicted = self._evict(now)
+        if self.backend is not None:
+            # Only adopt the shared row if another process saved since this one last synced;
+            # checked under the lock so a concurrent update here is never overwritten by it
+            with session.lock:
+                loaded = self.backend.load(session_id, session.version)
+                if loaded is not None:
+                    state, session.version = loaded
+                    session.load_dict(state)
+                    # load_dict brings back the saving process's last_seen
+                    session.touch()
+        self._notify(evicted)
+        return session
+
+    def save(self, session):
+        """Persist a session to the shared backend, if one is configured
+
+        Call with session.lock held, in the same critical section as the update,
+        so exactly that state is saved and no concurrent get() can revert it first.
+        """
+        if self.backend is not None:
+            session.version = self.backend.save(session.session_id, session.to_dict())
+
+    def _evict(self, now):
+        """Drop sessions idle past the TTL, then the least recently used over capacity"""
+        evicted = []
+        cutoff = now - self.ttl_seconds
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            evicted.append(session_id)
+        self._evicted += len(evicted)
+        return evicted
+
+    def _notify(self, evicted):
+        for session_id in evicted:
+            for callback in self._eviction_listeners:
+                callback(session_id)
+        if evicted and self.backend is not None:
+            self.backend.evict_idle(time.time() - self.ttl_seconds)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl_seconds,
+                "evicted": self._evicted,
+                "backend": type(self.backend).__name__ if self.backend else "memory",
+            }
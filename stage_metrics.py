@@ -0,0 +1,140 @@
+"""
+Per-stage latency instrumentation with fixed-memory rolling percentiles
+Every stage (capture, decode, color conversion, each model, rules, compositing,
+encode, send...) feeds a log-bucketed histogram: 8 buckets per doubling from
+1 µs to 100 s, so percentiles are within ~5% and memory never grows. Two
+windows rotate every window_seconds; percentiles cover the current and the
+previous window. Snapshots are JSON-ready; prometheus() renders text format.
+"""
+
+import math
+import threading
+import time
+
+MIN_SECONDS = 1e-6
+MAX_SECONDS = 100.0
+BUCKETS_PER_DOUBLING = 8
+BUCKET_COUNT = int(math.ceil(math.log2(MAX_SECONDS / MIN_SECONDS) * BUCKETS_PER_DOUBLING)) + 1
+WINDOW_SECONDS = 60.0
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _bucket(seconds):
+    if seconds <= MIN_SECONDS:
+        return 0
+    return min(int(math.log2(seconds / MIN_SECONDS) * BUCKETS_PER_DOUBLING) + 1, BUCKET_COUNT - 1)
+
+
+def _bucket_value(index):
+    """Representative value of a bucket: the geometric middle of its bounds"""
+    if index == 0:
+        return MIN_SECONDS
+    return MIN_SECONDS * 2 ** ((index - 0.5) / BUCKETS_PER_DOUBLING)
+
+
+class StageHistogram:
+    """Rolling log-bucket histogram of one stage's durations (seconds)"""
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, now=None):
+        self.window_seconds = window_seconds
+        self._current = [0] * BUCKET_COUNT
+        self._previous = [0] * BUCKET_COUNT
+        self._window_started = time.monotonic() if now is None else now
+        self._previous_started = self._window_started
+        self.count = 0  # Lifetime, for Prometheus _count/_sum
+        self.total = 0.0
+
+    def add(self, seconds, now):
+        if now - self._window_started >= self.window_seconds:
+            self._rotate(now)
+        self._current[_bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def _rotate(self, now):
+        if now - self._window_started >= 2 * self.window_seconds:
+            # Idle for more than a whole window: nothing recent is left
+            self._previous = [0] * BUCKET_COUNT
+            self._previous_started = now
+        else:
+            self._previous = self._current
+            self._previous_started = self._window_started
+        self._current = [0] * BUCKET_COUNT
+        self._window_started = now
+
+    def quantiles(self, now, quantiles=QUANTILES):
+        """Recent durations at each quantile (None before any sample), and the recent sample count"""
+        if now - self._window_started >= self.window_seconds:
+            self._rotate(now)
+        counts = [a + b for a, b in zip(self._current, self._previous)]
+        recent = sum(counts)
+        if not recent:
+            return [None] * len(quantiles), 0
+        values = []
+        for q in quantiles:
+            rank = max(1, math.ceil(q * recent))
+            seen = 0
+            for index, count in enumerate(counts):
+                seen += count
+                if seen >= rank:
+                    values.append(_bucket_value(index))
+                    break
+        return values, recent
+
+    def rate(self, now, recent):
+        """Samples per second over the rolling window"""
+        elapsed = now - self._previous_started
+        return recent / elapsed if elapsed > 0 else 0.0
+
+
+class StageMetrics:
+    """Thread-safe registry of per-stage histograms"""
+
+    def __init__(self, window_seconds=WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        now = time.monotonic()
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = StageHistogram(self.window_seconds, now)
+            histogram.add(seconds, now)
+
+    def snapshot(self):
+        """stage -> count, mean and p50/p95/p99 (ms), recent rate (Hz)"""
+        now = time.monotonic()
+        stats = {}
+        with self._lock:
+            for stage, histogram in self._stages.items():
+                (p50, p95, p99), recent = histogram.quantiles(now)
+                stats[stage] = {
+                    "count": histogram.count,
+                    "mean_ms": round(histogram.total / histogram.count * 1000, 3) if histogram.count else 0.0,
+                    "p50_ms": None if p50 is None else round(p50 * 1000, 3),
+                    "p95_ms": None if p95 is None else round(p95 * 1000, 3),
+                    "p99_ms": None if p99 is None else round(p99 * 1000, 3),
+                    "rate_hz": round(histogram.rate(now, recent), 2),
+                }
+        return stats
+
+    def prometheus(self, prefix="s7h"):
+        """Prometheus text exposition: one summary per stage, labeled by stage"""
+        now = time.monotonic()
+        name = f"{prefix}_stage_seconds"
+        lines = [f"# HELP {name} Duration of each pipeline stage (rolling quantiles).", f"# TYPE {name} summary"]
+        with self._lock:
+            for stage, histogram in sorted(self._stages.items()):
+                values, _ = histogram.quantiles(now)
+                for q, value in zip(QUANTILES, values):
+                    lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {"NaN" if value is None else f"{value:.9f}"}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.total:.9f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """One line per stage for console summaries"""
+        return [f"{stage}: p50 {s['p50_ms']} ms, p95 {s['p95_ms']} ms, p99 {s['p99_ms']} ms ({s['count']} samples)"
+                for stage, s in self.snapshot().items()]
@@ -1,55 +1,90 @@
 // Main JavaScript for Instagram Emoji Reaction Web App
 
-// Update gesture display in real-time
-function updateGestureDisplay() {
-    fetch('/current_gesture')
-        .then(response => response.json())
+// Long-poll the current gesture: the server answers as soon as it changes, or with 304 after the wait
+let gestureEtag = null;
+
+function pollGesture() {
+    const headers = gestureEtag ? {'If-None-Match': gestureEtag} : {};
+    fetch('/current_gesture?wait=25', {headers: headers, cache: 'no-store'})
+        .then(response => {
+            if (response.status === 304) {
+                return null;
+            }
+            gestureEtag = response.headers.get('ETag');
+            return response.json();
+        })
         .then(data => {
-            // Update gesture image and text
-            const gestureImage = document.getElementById('gestureImage');
-            const gestureName = document.getElementById('gestureName');
-            const gestureDescription = document.getElementById('gestureDescription');
-            
-            // Update image if changed
-            const newImageSrc = '/images/' + data.image;
-            if (gestureImage.src !== window.location.origin + newImageSrc) {
-                gestureImage.src = newImageSrc;
-                gestureImage.style.animation = 'none';
-                setTimeout(() => {
-                    gestureImage.style.animation = 'scaleIn 0.5s ease';
-                }, 10);
+            if (data) {
+                updateGestureDisplay(data);
             }
-            
-            gestureName.textContent = data.name;
-            gestureDescription.textContent = data.description;
+            pollGesture();
         })
-        .catch(error => console.error('Error fetching gesture:', error));
+        .catch(error => {
+            console.error('Error fetching gesture:', error);
+            setTimeout(pollGesture, 1000);
+        });
 }
 
-// Update stats
-function updateStats() {
-    // Simulate stats update (in real app, fetch from backend)
-    const confidence = Math.floor(Math.random() * 20) + 70;
-    const progressFill = document.querySelector('.progress-fill');
-    const statValue = document.querySelector('.stat-value');
+// Update gesture image and text
+function updateGestureDisplay(data) {
+    const gestureImage = document.getElementById('gestureImage');
+    const gestureName = document.getElementById('gestureName');
+    const gestureDescription = document.getElementById('gestureDescription');
     
-    if (progressFill) {
-        progressFill.style.width = confidence + '%';
-    }
-    if (statValue) {
-        statValue.textContent = confidence + '%';
+    // Update image if changed
+    const newImageSrc = '/images/' + data.image + '?size=400';
+    if (gestureImage.src !== window.location.origin + newImageSrc) {
+        gestureImage.src = newImageSrc;
+        gestureImage.style.animation = 'none';
+        setTimeout(() => {
+            gestureImage.style.animation = 'scaleIn 0.5s ease';
+        }, 10);
     }
+    
+    gestureName.textContent = data.name;
+    gestureDescription.textContent = data.description;
+}
+
+// Update stats from the server's measurements for this session
+function updateStats() {
+    fetch('/detection_stats')
+        .then(response => response.json())
+        .then(data => {
+            const confidence = Math.round(data.confidence * 100);
+            const progressFill = document.getElementById('confidenceFill');
+            const confidenceValue = document.getElementById('confidenceValue');
+            const fpsValue = document.getElementById('fpsValue');
+            const handsDetected = document.getElementById('handsDetected');
+            const latencyValue = document.getElementById('latencyValue');
+            
+            if (progressFill) {
+                progressFill.style.width = confidence + '%';
+            }
+            if (confidenceValue) {
+                confidenceValue.textContent = data.hands ? confidence + '%' : '–';
+            }
+            if (fpsValue) {
+                fpsValue.textContent = Math.round(data.fps);
+            }
+            if (handsDetected) {
+                handsDetected.textContent = data.hands;
+            }
+            if (latencyValue) {
+                latencyValue.textContent = data.latency_ms === null ? '–' : Math.round(data.latency_ms) + ' ms';
+            }
+        })
+        .catch(error => console.error('Error fetching stats:', error));
 }
 
 // Initialize
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Instagram Emoji Reaction - Web App Loaded');
     
-    // Update gesture every 500ms
-    setInterval(updateGestureDisplay, 500);
+    // Follow the gesture with long-polls instead of polling every 500ms
+    pollGesture();
     
-    // Update stats every 2 seconds
-    setInterval(updateStats, 2000);
+    // Update stats every second
+    setInterval(updateStats, 1000);
     
     // Add hover effects to gesture cards
     const gestureCards = document.querySelectorAll('.gesture-card');
@@ -99,28 +134,3 @@ document.querySelectorAll('a[href^="#"]').forEach(anchor => {
         }
     });
 });
-
-// Performance monitoring
-let frameCount = 0;
-let lastTime = Date.now();
-
-function updateFPS() {
-    frameCount++;
-    const currentTime = Date.now();
-    const elapsed = currentTime - lastTime;
-    
-    if (elapsed >= 1000) {
-        const fps = Math.round((frameCount * 1000) / elapsed);
-        const fpsElement = document.querySelectorAll('.stat-value')[1];
-        if (fpsElement) {
-            fpsElement.textContent = fps;
-        }
-        frameCount = 0;
-        lastTime = currentTime;
-    }
-    
-    requestAnimationFrame(updateFPS);
-}
-
-// Start FPS monitoring
-requestAnimationFrame(updateFPS);
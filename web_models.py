@@ -0,0 +1,27 @@
+"""
+MediaPipe model settings of the web app's inference pool
+Kept free of import-time side effects: process-mode workers unpickle
+create_models by reference, so a spawned child imports only this module
+instead of re-running app.py (Flask, pygame, scheduler, caches, sessions).
+"""
+
+import mediapipe as mp
+
+# Slightly relaxed to improve recall, while smoothing handles stability later
+MIN_DETECTION_CONFIDENCE = 0.6
+MIN_TRACKING_CONFIDENCE = 0.6
+
+
+def create_models():
+    """Create one Hands/FaceMesh pair configured for the web app"""
+    hands = mp.solutions.hands.Hands(
+        min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+        min_tracking_confidence=MIN_TRACKING_CONFIDENCE,
+        max_num_hands=2
+    )
+    face_mesh = mp.solutions.face_mesh.FaceMesh(
+        max_num_faces=1,
+        min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+        min_tracking_confidence=MIN_TRACKING_CONFIDENCE
+    )
+    return hands, face_mesh